@@ -17,16 +17,54 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import logging
+import threading
 import time
 import traceback
 
 import full_activity_dump
+import full_activity_dump_reader
 import util
 
+# Maximum number of dump files downloaded concurrently, over all the dumps
+# being processed. Each file transfer holds the download semaphore.
+_max_concurrent_downloads = 4
+_download_semaphore = threading.BoundedSemaphore(_max_concurrent_downloads)
 
-def getFullActivityDumpSasUut(sas, sas_admin, ssl_cert=None, ssl_key=None):
+
+def setMaxConcurrentDownloads(max_concurrent_downloads):
+  """Sets the maximum number of FAD files downloaded concurrently.
+
+  Shall not be called while dumps are being processed.
+
+  Args:
+    max_concurrent_downloads: The maximum number of concurrent downloads. A
+      value of 1 makes all downloads sequential.
+  """
+  global _max_concurrent_downloads, _download_semaphore
+  _max_concurrent_downloads = max(1, int(max_concurrent_downloads))
+  _download_semaphore = threading.BoundedSemaphore(_max_concurrent_downloads)
+
+
+def _mapConcurrently(fn, items):
+  """Returns `[fn(item) for item in items]`, computed in a bounded thread pool.
+
+  The results are in the order of `items`. The first exception raised by `fn`
+  (in item order) is re-raised once all the calls are done.
+  """
+  items = list(items)
+  num_workers = min(_max_concurrent_downloads, len(items))
+  if num_workers <= 1:
+    return [fn(item) for item in items]
+  with ThreadPoolExecutor(max_workers=num_workers) as executor:
+    futures = [executor.submit(fn, item) for item in items]
+  return [future.result() for future in futures]
+
+
+def getFullActivityDumpSasUut(sas, sas_admin, ssl_cert=None, ssl_key=None,
+                              cbsd_collector=None):
   """Returns a FullActivityDump object from the SAS UUT in its current state.
 
   Args:
@@ -34,12 +72,14 @@ def getFullActivityDumpSasUut(sas, sas_admin, ssl_cert=None, ssl_key=None):
     sas_admin: SasAdminInterface to trigger FAD creation over.
     ssl_cert: Optional. ssl certificate to use when making get/post requests.
     ssl_key: Optional. ssl key to use when making get/post requests.
+    cbsd_collector: Optional. A |full_activity_dump_reader.CbsdGrantCollector|
+      to which the CBSD records are streamed (see `_processDump()`).
   Returns:
     A Full Activity Dump object containing FAD data from the given SAS.
   """
   dump = _triggerFullActivityDumpAndWaitUntilComplete(sas, sas_admin, ssl_cert,
                                                       ssl_key)
-  return _processDump(sas, dump, ssl_cert, ssl_key)
+  return _processDump(sas, dump, ssl_cert, ssl_key, cbsd_collector)
 
 
 def getFullActivityDumpSasTestHarness(sas):
@@ -64,6 +104,30 @@ def getFullActivityDumpSasTestHarness(sas):
     raise util.TestComponentError('SAS Test Harness Failed')
 
 
+def getFullActivityDumpSasTestHarnesses(sases):
+  """Returns the FullActivityDump objects of several SAS test harnesses.
+
+  The dump files of all the test harnesses are downloaded concurrently (see
+  `setMaxConcurrentDownloads()`).
+
+  Args:
+    sases: A list of SasInterface to request FAD data from.
+  Returns:
+    A list of Full Activity Dump objects, in the order of `sases`.
+  Raises:
+    TestComponentError: if any of the test harness FAD fails.
+  """
+  try:
+    dumps = [(sas, sas.GetFullActivityDump(), None, None, None)
+             for sas in sases]
+    return _processDumps(dumps)
+  except Exception as e:
+    # Any exception caused in reading and processing a FAD from a test
+    # harness is not the fault of the SAS UUT.
+    traceback.print_exc()
+    raise util.TestComponentError('SAS Test Harness Failed')
+
+
 def _triggerFullActivityDumpAndWaitUntilComplete(sas, sas_admin, ssl_cert,
                                                  ssl_key):
   """Triggers generation and loading of dump files from the SAS UUT.
@@ -99,15 +163,23 @@ def _triggerFullActivityDumpAndWaitUntilComplete(sas, sas_admin, ssl_cert,
   return dump_message
 
 
-def _processDump(sas, dump, ssl_cert=None, ssl_key=None):
+def _processDump(sas, dump, ssl_cert=None, ssl_key=None, cbsd_collector=None):
   """Clears any existing dump data and downloads current data.
 
+  The dump files are downloaded concurrently (see `setMaxConcurrentDownloads()`)
+  and merged in the order of the dump message.
+
   Args:
     sas: A SasInterface object to request
     dump: The https://base_url/version/dump message response, used to extract
       the files to be downloaded.
     ssl_cert: Optional. ssl certificate to use when making get requests.
     ssl_key: Optional. ssl key to use when making get requests.
+    cbsd_collector: Optional. A |full_activity_dump_reader.CbsdGrantCollector|.
+      If set, the CBSD dump files are streamed and parsed incrementally, each
+      CBSD record being passed to the collector instead of being held in memory.
+      The CBSD records of the returned FAD are then the records kept by the
+      collector (if any).
   Returns:
     A Full Activity Dump with the FAD data from the given SAS as a dictionary
     with the fields: cbsd, esc_sensor, zone. Each field is a list of the
@@ -116,18 +188,97 @@ def _processDump(sas, dump, ssl_cert=None, ssl_key=None):
     AssertError: The FAD response does not match the expected schema or a
       request does not return 200.
   """
-  util.assertContainsRequiredFields('FullActivityDump.schema.json', dump)
-  dump_data = {'cbsd': [], 'esc_sensor': [], 'zone': []}
-  for dump_file in dump['files']:
-    if dump_file['recordType'] == 'coordination':
+  return _processDumps([(sas, dump, ssl_cert, ssl_key, cbsd_collector)])[0]
+
+
+def _processDumps(dumps):
+  """Downloads the data of several dumps, with a single bounded thread pool.
+
+  Args:
+    dumps: A list of tuple (sas, dump, ssl_cert, ssl_key, cbsd_collector) of
+      the arguments of `_processDump()` for each dump.
+  Returns:
+    A list of Full Activity Dump, in the order of `dumps`.
+  Raises:
+    AssertError: A FAD response does not match the expected schema or a
+      request does not return 200.
+  """
+  # All the files to download, as tuples (dump index, dump file).
+  files = []
+  for dump_idx, (_, dump, _, _, _) in enumerate(dumps):
+    util.assertContainsRequiredFields('FullActivityDump.schema.json', dump)
+    dump_files = [dump_file for dump_file in dump['files']
+                  if dump_file['recordType'] != 'coordination']
+    if len(dump_files) < len(dump['files']):
       logging.debug(
           'Coordination event record skipped in downloading Full Activity Dump')
-      continue
-    util.assertContainsRequiredFields('ActivityDumpFile.schema.json', dump_file)
-    dump_data[dump_file['recordType']].extend(
-        sas.DownloadFile(dump_file['url'], ssl_cert=ssl_cert,
-                         ssl_key=ssl_key)['recordData'])
+    util.assertAllContainRequiredFields('ActivityDumpFile.schema.json',
+                                        dump_files)
+    files.extend((dump_idx, dump_file) for dump_file in dump_files)
+  num_files = len(files)
+  progress = {'files': 0, 'bytes': 0}
+  progress_lock = threading.Lock()
+  start_time = time.time()
+
+  def downloadFile(index):
+    """Downloads a dump file, returning its records or its CBSD collector."""
+    dump_idx, dump_file = files[index]
+    sas, _, ssl_cert, ssl_key, cbsd_collector = dumps[dump_idx]
+    num_bytes = [0]
+    with _download_semaphore:
+      file_start_time = time.time()
+      if cbsd_collector is not None and dump_file['recordType'] == 'cbsd':
+        # Each file is parsed as it arrives into its own collector, merged
+        # later in file order.
+        result = cbsd_collector.fork()
+        parser = full_activity_dump_reader.RecordDataParser(
+            result.addCbsdRecord)
+        def feed(chunk):
+          num_bytes[0] += len(chunk)
+          parser.feed(chunk)
+        sas.DownloadFileStream(dump_file['url'], feed,
+                               ssl_cert=ssl_cert, ssl_key=ssl_key)
+        parser.close()
+        num_records = parser.num_records
+      else:
+        result = sas.DownloadFile(dump_file['url'], ssl_cert=ssl_cert,
+                                  ssl_key=ssl_key)['recordData']
+        num_records = len(result)
+      elapsed = max(time.time() - file_start_time, 1e-6)
+    with progress_lock:
+      progress['files'] += 1
+      progress['bytes'] += num_bytes[0]
+      num_done = progress['files']
+    if num_bytes[0]:
+      logging.info('FAD file %d/%d (%s) downloaded [%d done]: %d records, '
+                   '%.1f kB in %.2fs (%.1f kB/s)',
+                   index + 1, num_files, dump_file['recordType'], num_done,
+                   num_records, num_bytes[0] / 1e3, elapsed,
+                   num_bytes[0] / 1e3 / elapsed)
+    else:
+      logging.info('FAD file %d/%d (%s) downloaded [%d done]: %d records '
+                   'in %.2fs', index + 1, num_files, dump_file['recordType'],
+                   num_done, num_records, elapsed)
+    return result
+
+  results = _mapConcurrently(downloadFile, range(num_files))
+  elapsed = max(time.time() - start_time, 1e-6)
+  logging.info('FAD downloaded: %d files in %.2fs (%.1f files/s, %.1f kB '
+               'streamed)', num_files, elapsed, num_files / elapsed,
+               progress['bytes'] / 1e3)
+
+  dumps_data = [{'cbsd': [], 'esc_sensor': [], 'zone': []} for _ in dumps]
+  for (dump_idx, dump_file), result in zip(files, results):
+    cbsd_collector = dumps[dump_idx][4]
+    if cbsd_collector is not None and dump_file['recordType'] == 'cbsd':
+      cbsd_collector.merge(result)
+    else:
+      dumps_data[dump_idx][dump_file['recordType']].extend(result)
     logging.debug('%s record added to Full Activity Dump',
                   dump_file['recordType'])
-
-  return full_activity_dump.FullActivityDump(dump_data)
+  fads = []
+  for (_, _, _, _, cbsd_collector), dump_data in zip(dumps, dumps_data):
+    if cbsd_collector is not None:
+      dump_data['cbsd'] = cbsd_collector.getCbsdRecords()
+    fads.append(full_activity_dump.FullActivityDump(dump_data))
+  return fads
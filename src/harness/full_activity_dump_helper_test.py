@@ -21,6 +21,9 @@ from datetime import datetime
 import unittest
 import logging
 import copy
+import json
+import threading
+import time
 
 try:
   from unittest import mock
@@ -28,11 +31,34 @@ except ImportError:
   import mock
 
 import full_activity_dump_helper
+import util
+
+
+class _RecordCollector(object):
+  """Minimal CBSD collector, keeping the records in order."""
+
+  def __init__(self):
+    self.records = []
+
+  def addCbsdRecord(self, record):
+    self.records.append(record)
+
+  def fork(self):
+    return _RecordCollector()
+
+  def merge(self, other):
+    self.records.extend(other.records)
+
+  def getCbsdRecords(self):
+    return list(self.records)
 
 
 class FullActivityDumpHelperTest(unittest.TestCase):
   """Full Activity Dump Helper unit tests."""
 
+  def tearDown(self):
+    full_activity_dump_helper.setMaxConcurrentDownloads(4)
+
   @staticmethod
   def getFullActivityDumpHelper(ssl_cert=None, ssl_key=None):
     """Provides a generic dump to use for tests. Setting the generation date to
@@ -84,11 +110,20 @@ class FullActivityDumpHelperTest(unittest.TestCase):
     else:
       raise ValueError('unsupported URL: %s' % url)
 
+  @staticmethod
+  def downloadFileStreamHelper(url, write_fn, ssl_cert=None, ssl_key=None):
+    """Helper to stream test dump content, byte per byte."""
+    content = json.dumps(
+        FullActivityDumpHelperTest.downloadFileHelper(url, ssl_cert, ssl_key))
+    for char in content.encode('utf-8'):
+      write_fn(bytes(bytearray([char])))
+
   @staticmethod
   def getMockSasInterface():
     sas_interface = mock.MagicMock()
     sas_interface.GetFullActivityDump.side_effect = FullActivityDumpHelperTest.getFullActivityDumpHelper
     sas_interface.DownloadFile.side_effect = FullActivityDumpHelperTest.downloadFileHelper
+    sas_interface.DownloadFileStream.side_effect = FullActivityDumpHelperTest.downloadFileStreamHelper
     return sas_interface
 
   def test_create_fad_for_sas_uut(self):
@@ -120,6 +155,79 @@ class FullActivityDumpHelperTest(unittest.TestCase):
             'zone': [{'g': 1}]
         })
 
+  def test_create_fad_with_streamed_cbsds(self):
+    """Tests that the CBSD records can be streamed to a collector."""
+    mock_sas = FullActivityDumpHelperTest.getMockSasInterface()
+    mock_sas_admin = mock.MagicMock()
+    cbsd_collector = _RecordCollector()
+    fad = full_activity_dump_helper.getFullActivityDumpSasUut(
+        mock_sas, mock_sas_admin, cbsd_collector=cbsd_collector)
+    self.assertEqual(mock_sas.DownloadFileStream.call_count, 2)
+    self.assertListEqual(cbsd_collector.records,
+                         [{'a': 1, 'b': 2}, {'c': 3}, {'j': 1}])
+    self.assertDictEqual(
+        fad.getData(), {
+            'cbsd': [{'a': 1, 'b': 2}, {'c': 3}, {'j': 1}],
+            'esc_sensor': [{'d': 1}],
+            'zone': [{'g': 1}]
+        })
+
+  def test_concurrent_downloads_merged_in_order(self):
+    """Tests that concurrent downloads are merged in the dump file order."""
+    def slowDownloadFile(url, ssl_cert=None, ssl_key=None):
+      # The first files complete last.
+      if url.startswith('cbsd'):
+        time.sleep(0.05)
+      return FullActivityDumpHelperTest.downloadFileHelper(url)
+
+    for max_concurrent_downloads in [1, 2, 8]:
+      full_activity_dump_helper.setMaxConcurrentDownloads(
+          max_concurrent_downloads)
+      mock_sases = [FullActivityDumpHelperTest.getMockSasInterface()
+                    for _ in range(3)]
+      for mock_sas in mock_sases:
+        mock_sas.DownloadFile.side_effect = slowDownloadFile
+      fads = full_activity_dump_helper.getFullActivityDumpSasTestHarnesses(
+          mock_sases)
+      self.assertEqual(len(fads), 3)
+      for fad in fads:
+        self.assertDictEqual(
+            fad.getData(), {
+                'cbsd': [{'a': 1, 'b': 2}, {'c': 3}, {'j': 1}],
+                'esc_sensor': [{'d': 1}],
+                'zone': [{'g': 1}]
+            })
+
+  def test_concurrent_downloads_limit(self):
+    """Tests that the concurrency limit holds over all the test harnesses."""
+    num_active = [0, 0]  # Current and maximum
+    lock = threading.Lock()
+    def slowDownloadFile(url, ssl_cert=None, ssl_key=None):
+      with lock:
+        num_active[0] += 1
+        num_active[1] = max(num_active)
+      time.sleep(0.01)
+      with lock:
+        num_active[0] -= 1
+      return FullActivityDumpHelperTest.downloadFileHelper(url)
+
+    full_activity_dump_helper.setMaxConcurrentDownloads(3)
+    mock_sases = [FullActivityDumpHelperTest.getMockSasInterface()
+                  for _ in range(4)]
+    for mock_sas in mock_sases:
+      mock_sas.DownloadFile.side_effect = slowDownloadFile
+    fads = full_activity_dump_helper.getFullActivityDumpSasTestHarnesses(
+        mock_sases)
+    self.assertEqual(len(fads), 4)
+    self.assertEqual(num_active[1], 3)
+
+  def test_concurrent_download_failure(self):
+    """Tests that a failed download of a test harness is reported."""
+    mock_sases = [FullActivityDumpHelperTest.getMockSasInterface()
+                  for _ in range(2)]
+    mock_sases[1].DownloadFile.side_effect = ValueError('failed')
+    with self.assertRaises(util.TestComponentError):
+      full_activity_dump_helper.getFullActivityDumpSasTestHarnesses(mock_sases)
 
 if __name__ == '__main__':
   unittest.main()
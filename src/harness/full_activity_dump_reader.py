@@ -0,0 +1,268 @@
+#    Copyright 2018 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""Streaming reader of Full Activity Dump files.
+
+A FAD dump file holds all its records in its 'recordData' array, and can be
+very large for a SAS managing hundreds of thousands of CBSDs. Instead of
+decoding the whole file, the `RecordDataParser` parses it incrementally as
+chunks of the body are received, and passes each record to a callback as soon
+as it is complete.
+
+The `CbsdGrantCollector` is such a callback for the CBSD dump files: it
+validates each CBSD record and builds directly the |data.CbsdGrantInfo| of its
+grants, optionally keeping a compact copy of the records holding only the
+fields needed by the pre-IAP purges.
+
+Typical usage:
+  collector = CbsdGrantCollector(is_managing_sas=True, keep_records=True)
+  parser = RecordDataParser(collector.addCbsdRecord)
+  sas.DownloadFileStream(url, parser.feed)
+  parser.close()
+  grant_table = collector.getGrantTable()
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import codecs
+import json
+import re
+
+from reference_models.common import data
+import util2
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Parser states.
+_START, _KEY, _COLON, _VALUE, _AFTER_VALUE, _ARRAY_START, _RECORD, \
+    _AFTER_RECORD, _DONE = range(9)
+
+
+class RecordDataParser(object):
+  """Incremental parser of the records of a dump file.
+
+  The dump file is a JSON object, whose 'recordData' array is streamed record
+  by record, while its other (small) fields are kept in `fields`.
+
+  Attributes:
+    fields: A dictionary of the other fields of the dump file.
+    num_records: The number of records parsed so far.
+  """
+
+  def __init__(self, record_fn, array_key='recordData'):
+    """Initializes the parser.
+
+    Args:
+      record_fn: A function called with each record of the array.
+      array_key: The key of the streamed array.
+    """
+    self._record_fn = record_fn
+    self._array_key = array_key
+    self._json_decoder = json.JSONDecoder()
+    self._utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+    self._buffer = ''
+    self._state = _START
+    self._key = None
+    self.fields = {}
+    self.num_records = 0
+
+  def feed(self, chunk):
+    """Parses a new chunk (bytes or string) of the dump file."""
+    if isinstance(chunk, bytes):
+      chunk = self._utf8_decoder.decode(chunk)
+    self._buffer += chunk
+    self._parse(final=False)
+
+  def close(self):
+    """Ends the parsing.
+
+    Raises:
+      ValueError: if the dump file is invalid or truncated.
+    """
+    self._buffer += self._utf8_decoder.decode(b'', final=True)
+    self._parse(final=True)
+    if self._state != _DONE:
+      raise ValueError('Truncated dump file')
+
+  def _decodeValue(self, pos, final):
+    """Returns the (value, end) of the JSON value at `pos`, or None if incomplete.
+
+    A value ending the buffer is considered as incomplete, unless final, as
+    scalars (for example numbers) could be continued in the next chunk.
+    """
+    try:
+      value, end = self._json_decoder.raw_decode(self._buffer, pos)
+    except ValueError:
+      if final:
+        raise
+      return None
+    if end == len(self._buffer) and not final:
+      return None
+    return value, end
+
+  def _parse(self, final):
+    """Parses the buffer as much as possible."""
+    pos = 0
+    while True:
+      pos = _WHITESPACE.match(self._buffer, pos).end()
+      if pos == len(self._buffer):
+        break
+      char = self._buffer[pos]
+      if self._state == _DONE:
+        raise ValueError('Unexpected data after the dump file: %r'
+                         % self._buffer[pos:pos+20])
+      elif self._state in (_START, _COLON, _ARRAY_START):
+        expected = {_START: '{', _COLON: ':', _ARRAY_START: '['}[self._state]
+        if char != expected:
+          raise ValueError('Expected %r in dump file at %r'
+                           % (expected, self._buffer[pos:pos+20]))
+        pos += 1
+        if self._state == _START:
+          self._state = _KEY
+        elif self._state == _COLON:
+          self._state = (_ARRAY_START if self._key == self._array_key
+                         else _VALUE)
+        else:
+          self._state = _RECORD
+      elif self._state in (_AFTER_VALUE, _AFTER_RECORD):
+        end_char = '}' if self._state == _AFTER_VALUE else ']'
+        if char == ',':
+          self._state = _KEY if self._state == _AFTER_VALUE else _RECORD
+        elif char == end_char:
+          self._state = _DONE if self._state == _AFTER_VALUE else _AFTER_VALUE
+        else:
+          raise ValueError('Expected %r or %r in dump file at %r'
+                           % (',', end_char, self._buffer[pos:pos+20]))
+        pos += 1
+      elif self._state == _KEY and char == '}':
+        # Empty object (or trailing comma, tolerated).
+        pos += 1
+        self._state = _DONE
+      elif self._state == _RECORD and char == ']':
+        # Empty array (or trailing comma, tolerated).
+        pos += 1
+        self._state = _AFTER_VALUE
+      else:
+        decoded = self._decodeValue(pos, final)
+        if decoded is None:
+          break
+        value, pos = decoded
+        if self._state == _KEY:
+          self._key = value
+          self._state = _COLON
+        elif self._state == _VALUE:
+          self.fields[self._key] = value
+          self._state = _AFTER_VALUE
+        else:
+          self.num_records += 1
+          self._record_fn(value)
+          self._state = _AFTER_RECORD
+    self._buffer = self._buffer[pos:]
+
+
+def compactCbsdRecord(cbsd_record):
+  """Returns a copy of a CBSD record with only the fields used by the purges.
+
+  The pre-IAP purges and the grant construction only use the CBSD id, category
+  and installation parameters, and the grants ids and operation parameters.
+
+  Args:
+    cbsd_record: A |CbsdData| record.
+  """
+  registration = cbsd_record['registration']
+  compact_registration = {'cbsdCategory': registration['cbsdCategory'],
+                          'installationParam': registration['installationParam']}
+  compact_grants = []
+  for grant in cbsd_record['grants']:
+    compact_grant = {'id': grant['id']}
+    for key in ('operationParam', 'requestedOperationParam'):
+      if key in grant:
+        compact_grant[key] = grant[key]
+    compact_grants.append(compact_grant)
+  return {'id': cbsd_record['id'],
+          'registration': compact_registration,
+          'grants': compact_grants}
+
+
+class CbsdGrantCollector(object):
+  """Collects the grants of streamed CBSD records.
+
+  Each CBSD record is validated and converted into the |data.CbsdGrantInfo| of
+  its grants, the record itself being then dropped, unless `keep_records` is
+  set in which case its compact form (see `compactCbsdRecord()`) is kept.
+  Note that the collected grants do not reflect any later purge done on the kept
+  records.
+  """
+
+  def __init__(self, is_managing_sas=True, keep_records=False,
+               schema_filename='CbsdData.schema.json'):
+    """Initializes the collector.
+
+    Args:
+      is_managing_sas: Flag indicating if the CBSD records are from the
+        managing SAS (True) or a peer SAS (False).
+      keep_records: If True, keeps the compact CBSD records.
+      schema_filename: The schema of the CBSD records, or None for no
+        validation.
+    """
+    self._is_managing_sas = is_managing_sas
+    self._keep_records = keep_records
+    self._schema_filename = schema_filename
+    self._grants = []
+    self._cbsd_records = []
+    self.cbsd_ids = []
+
+  def addCbsdRecord(self, cbsd_record):
+    """Adds a CBSD record.
+
+    Raises:
+      jsonschema.ValidationError: if the record does not match the schema.
+    """
+    if self._schema_filename is not None:
+      util2.assertContainsRequiredFields(self._schema_filename, cbsd_record)
+    for grant in cbsd_record['grants']:
+      self._grants.append(data.constructCbsdGrantInfo(
+          cbsd_record['registration'], grant,
+          is_managing_sas=self._is_managing_sas))
+      self.cbsd_ids.append(cbsd_record['id'])
+    if self._keep_records:
+      self._cbsd_records.append(compactCbsdRecord(cbsd_record))
+
+  def fork(self):
+    """Returns a new empty collector with the same configuration.
+
+    Used to collect separately the records of several dump files (for example
+    downloaded concurrently), before merging them in order with `merge()`.
+    """
+    return CbsdGrantCollector(self._is_managing_sas, self._keep_records,
+                              self._schema_filename)
+
+  def merge(self, other):
+    """Appends the grants and records collected by another collector."""
+    self._grants.extend(other._grants)
+    self._cbsd_records.extend(other._cbsd_records)
+    self.cbsd_ids.extend(other.cbsd_ids)
+
+  def getGrants(self):
+    """Returns the list of collected |data.CbsdGrantInfo|."""
+    return list(self._grants)
+
+  def getGrantTable(self):
+    """Returns the collected grants as a |data.GrantTable|."""
+    return data.GrantTable(self._grants)
+
+  def getCbsdRecords(self):
+    """Returns the kept compact CBSD records (empty if not kept)."""
+    return list(self._cbsd_records)
@@ -0,0 +1,135 @@
+#    Copyright 2018 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""Tests for the streaming Full Activity Dump reader."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import copy
+import json
+import os
+import unittest
+
+import jsonschema
+
+import full_activity_dump_reader
+import util2
+from reference_models.common import data
+
+
+def _loadSchemaExample(filename):
+  with open(os.path.join(util2._getSchemaDir(), filename)) as fd:
+    return json.load(fd)
+
+
+def _makeCbsdRecord(index, num_grants=1):
+  registration = _loadSchemaExample('CbsdRecordDataExample.json')
+  registration['installationParam']['latitude'] += index * 0.01
+  grants = []
+  for k in range(num_grants):
+    grant = _loadSchemaExample('GrantRecordExample.json')
+    grant['id'] = 'sas1/grant%d_%d' % (index, k)
+    grants.append(grant)
+  return {'id': 'cbsd/abc123/%d' % index,
+          'registration': registration,
+          'grants': grants}
+
+
+class RecordDataParserTest(unittest.TestCase):
+
+  def _parse(self, content, chunk_size):
+    records = []
+    parser = full_activity_dump_reader.RecordDataParser(records.append)
+    for k in range(0, len(content), chunk_size):
+      parser.feed(content[k:k+chunk_size])
+    parser.close()
+    return records, parser
+
+  def test_parse_in_chunks(self):
+    dump_file = {'version': 12345, 'name': u'café',
+                 'recordData': [{'a': 1, 'b': [2, 3.5]}, {'c': u'été'},
+                                {}, {'d': None}],
+                 'endOfFile': True}
+    content = json.dumps(dump_file, indent=1).encode('utf-8')
+    for chunk_size in [1, 2, 7, 100, len(content)]:
+      records, parser = self._parse(content, chunk_size)
+      self.assertListEqual(records, dump_file['recordData'])
+      self.assertEqual(parser.num_records, 4)
+      self.assertDictEqual(parser.fields, {'version': 12345, 'name': u'café',
+                                           'endOfFile': True})
+
+  def test_empty_records(self):
+    records, _ = self._parse(b'{"recordData": []}', 3)
+    self.assertListEqual(records, [])
+
+  def test_invalid_dump_file(self):
+    for content in [b'{"recordData": [{"a": 1}, {"b"',
+                    b'{"recordData": [{"a": 1}]} {}',
+                    b'["recordData"]']:
+      with self.assertRaises(ValueError):
+        self._parse(content, 5)
+
+
+class CbsdGrantCollectorTest(unittest.TestCase):
+
+  def test_collect_grants(self):
+    cbsd_records = [_makeCbsdRecord(0, 2), _makeCbsdRecord(1, 1)]
+    content = json.dumps({'recordData': cbsd_records}).encode('utf-8')
+    collector = full_activity_dump_reader.CbsdGrantCollector(
+        is_managing_sas=False, keep_records=True)
+    parser = full_activity_dump_reader.RecordDataParser(collector.addCbsdRecord)
+    for k in range(0, len(content), 64):
+      parser.feed(content[k:k+64])
+    parser.close()
+
+    expected_grants = data.getAllGrantInfoFromCbsdDataDump(cbsd_records, False)
+    self.assertListEqual(collector.getGrants(), expected_grants)
+    self.assertEqual(len(collector.getGrantTable()), 3)
+    self.assertListEqual(collector.cbsd_ids, ['cbsd/abc123/0', 'cbsd/abc123/0',
+                                              'cbsd/abc123/1'])
+    # The compact records give the same grants.
+    compact_records = collector.getCbsdRecords()
+    self.assertListEqual(
+        data.getAllGrantInfoFromCbsdDataDump(compact_records, False),
+        expected_grants)
+    self.assertNotIn('callSign', compact_records[0]['registration'])
+    self.assertNotIn('channelType', compact_records[0]['grants'][0])
+
+  def test_fork_and_merge(self):
+    cbsd_records = [_makeCbsdRecord(k, 2) for k in range(3)]
+    collector = full_activity_dump_reader.CbsdGrantCollector(keep_records=True)
+    forks = [collector.fork() for _ in cbsd_records]
+    for fork, cbsd_record in reversed(list(zip(forks, cbsd_records))):
+      fork.addCbsdRecord(cbsd_record)
+    for fork in forks:
+      collector.merge(fork)
+    self.assertListEqual(collector.getGrants(),
+                         data.getAllGrantInfoFromCbsdDataDump(cbsd_records))
+    self.assertListEqual([record['id'] for record in collector.getCbsdRecords()],
+                         [record['id'] for record in cbsd_records])
+
+  def test_invalid_record(self):
+    collector = full_activity_dump_reader.CbsdGrantCollector()
+    cbsd_record = _makeCbsdRecord(0)
+    collector.addCbsdRecord(cbsd_record)
+    cbsd_record = copy.deepcopy(cbsd_record)
+    del cbsd_record['id']
+    with self.assertRaises(jsonschema.ValidationError):
+      collector.addCbsdRecord(cbsd_record)
+    self.assertListEqual(collector.getCbsdRecords(), [])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -13,12 +13,29 @@
 #    limitations under the License.
 
 """Cache engine.
+
+Provides:
+  - a memoizing LRU cache context manager (in-memory, per process).
+  - an optional persistent cache, stored in a SQLite file, which is shared by
+    all processes (main and workers) and survives across contexts and runs.
+    Configure it with `ConfigurePersistentCache()`.
 """
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from collections import namedtuple
+import hashlib
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
 import six
+from six.moves import cPickle as pickle
 
 try:  # Python3
   from functools import lru_cache
@@ -27,9 +44,17 @@ except ImportError:  # Python2
   from functools32 import lru_cache
 
 # Note: for now only use the lru_cache from functools, backported to Python 2.7 as
-# functools32. A better cache engine needs to be implemented that:
-# 1) supports sharing across process (optionally)
-# 2) ...
+# functools32. Sharing across processes is provided by the `PersistentCache`.
+
+# The cache statistics
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# Number of digits kept for float arguments when building the persistent keys.
+_KEY_FLOAT_DIGITS = 9
+# Number of insertions in a process between checks of the persistent cache size.
+_EVICTION_CHECK_PERIOD = 100
+# Number of hits in a process between writes of their access time.
+_ACCESS_FLUSH_PERIOD = 100
 
 
 # A cache decorator
@@ -47,6 +72,240 @@ def LruCache(maxsize=None):
   return wrapper
 
 
+def _QuantizeArg(value):
+  """Returns a hashable and quantized version of an argument."""
+  if isinstance(value, (float, np.floating)):
+    return round(float(value), _KEY_FLOAT_DIGITS)
+  if isinstance(value, np.integer):
+    return int(value)
+  if isinstance(value, (list, tuple, np.ndarray)):
+    return tuple(_QuantizeArg(v) for v in value)
+  if isinstance(value, dict):
+    return tuple(sorted((k, _QuantizeArg(v)) for k, v in six.iteritems(value)))
+  return value
+
+
+class PersistentCache(object):
+  """A persistent cache stored in a SQLite file.
+
+  The cache is shared by all processes using the same file, including the
+  worker processes, and persists across runs. Its size is bounded: the least
+  recently used entries are evicted once the number of entries goes beyond
+  `maxsize` (this check is done periodically).
+
+  The access times of the hits, used for the LRU eviction, are written in
+  batches: every `_ACCESS_FLUSH_PERIOD` hits, before an eviction and in
+  `FlushStats()`.
+
+  The number of hits and misses are counted in each process, and accumulated
+  in the file when calling `FlushStats()`.
+
+  Usage:
+    store = PersistentCache('/tmp/pathloss.sqlite', maxsize=1000000,
+                            fingerprint_fn=drive.DataFingerprint)
+    cached_fn = store.Memoize(my_function)
+  """
+  def __init__(self, db_path, maxsize=None, fingerprint_fn=None):
+    """Initializes the persistent cache.
+
+    Args:
+      db_path: The path of the SQLite file. Created if not existing.
+      maxsize: The maximum number of entries, or None for unlimited size.
+      fingerprint_fn: An optional module level function returning a string
+        fingerprint of the data and configuration used by the memoized
+        functions (for example |drive.DataFingerprint|). It is part of the
+        keys, so that the results obtained with other data are not reused.
+    """
+    self.db_path = db_path
+    self.maxsize = maxsize
+    self.fingerprint_fn = fingerprint_fn
+    self._lock = threading.Lock()
+    self._conn = None
+    self._pid = None
+    self._num_puts = 0
+    self._accesses = {}
+    self.hits = 0
+    self.misses = 0
+    self._Connection()
+
+  def __getstate__(self):
+    # Only configuration is sent to other processes.
+    return {'db_path': self.db_path, 'maxsize': self.maxsize,
+            'fingerprint_fn': self.fingerprint_fn}
+
+  def __setstate__(self, state):
+    self.__init__(state['db_path'], state['maxsize'], state['fingerprint_fn'])
+
+  def _Connection(self):
+    """Returns the connection of current process (created if required)."""
+    if self._conn is None or self._pid != os.getpid():
+      # Note: connections shall not be shared across forked processes.
+      self._pid = os.getpid()
+      self._num_puts = 0
+      self._accesses = {}
+      self.hits = 0
+      self.misses = 0
+      self._conn = sqlite3.connect(self.db_path, timeout=120,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+      self._conn.execute('PRAGMA journal_mode=WAL')
+      # Safe in WAL mode: a power loss can only lose the last transactions,
+      # which is fine for a cache.
+      self._conn.execute('PRAGMA synchronous=NORMAL')
+      self._conn.execute('CREATE TABLE IF NOT EXISTS cache '
+                         '(key TEXT PRIMARY KEY, value BLOB, access REAL)')
+      self._conn.execute('CREATE INDEX IF NOT EXISTS cache_access '
+                         'ON cache (access)')
+      self._conn.execute('CREATE TABLE IF NOT EXISTS stats '
+                         '(name TEXT PRIMARY KEY, value INTEGER)')
+    return self._conn
+
+  def Get(self, key):
+    """Returns the value stored for a key, or None if not in the cache."""
+    with self._lock:
+      conn = self._Connection()
+      row = conn.execute('SELECT value FROM cache WHERE key=?',
+                         (key,)).fetchone()
+      if row is None:
+        self.misses += 1
+        return None
+      self.hits += 1
+      self._accesses[key] = time.time()
+      if len(self._accesses) >= _ACCESS_FLUSH_PERIOD:
+        self._FlushAccesses(conn)
+    return pickle.loads(bytes(row[0]))
+
+  def _FlushAccesses(self, conn):
+    """Writes the pending access times of the hits, in a single transaction."""
+    if not self._accesses:
+      return
+    conn.execute('BEGIN')
+    try:
+      conn.executemany('UPDATE cache SET access=? WHERE key=?',
+                       [(access, key)
+                        for key, access in six.iteritems(self._accesses)])
+      conn.execute('COMMIT')
+    except Exception:
+      conn.execute('ROLLBACK')
+      raise
+    self._accesses = {}
+
+  def Put(self, key, value):
+    """Stores a value for a key, evicting the LRU entries if required."""
+    blob = sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    with self._lock:
+      conn = self._Connection()
+      conn.execute('INSERT OR REPLACE INTO cache (key, value, access) '
+                   'VALUES (?, ?, ?)', (key, blob, time.time()))
+      self._num_puts += 1
+      if self.maxsize is not None and self._num_puts % _EVICTION_CHECK_PERIOD == 0:
+        self._Evict(conn)
+
+  def _Evict(self, conn):
+    self._FlushAccesses(conn)
+    num_entries = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+    if num_entries > self.maxsize:
+      conn.execute('DELETE FROM cache WHERE key IN '
+                   '(SELECT key FROM cache ORDER BY access LIMIT ?)',
+                   (num_entries - self.maxsize,))
+
+  def Memoize(self, fn):
+    """Returns a memoizing version of a function, using the persistent cache.
+
+    The key is built from the function name, the data fingerprint and the
+    quantized arguments, so that any call with same arguments (up to 1e-9 for
+    floats) will reuse the stored result. Only use it for functions that are
+    deterministic.
+    The data fingerprint is evaluated once here, and so shall not change during
+    the use of the returned function.
+    """
+    fn_id = '%s.%s' % (fn.__module__, fn.__name__)
+    fingerprint = self.fingerprint_fn() if self.fingerprint_fn else None
+    def wrapper(*args, **kwargs):
+      call_args = inspect.getcallargs(fn, *args, **kwargs)
+      key = hashlib.sha1(repr(
+          (fn_id, fingerprint,
+           _QuantizeArg(call_args))).encode('utf-8')).hexdigest()
+      result = self.Get(key)
+      if result is None:
+        result = fn(*args, **kwargs)
+        self.Put(key, result)
+      return result
+    wrapper.__name__ = fn.__name__
+    wrapper.__module__ = fn.__module__
+    return wrapper
+
+  def FlushStats(self):
+    """Accumulates the hits/misses counters of current process in the file.
+
+    The pending access times of the hits are also written.
+    """
+    with self._lock:
+      conn = self._Connection()
+      self._FlushAccesses(conn)
+      for name, value in (('hits', self.hits), ('misses', self.misses)):
+        conn.execute('INSERT OR IGNORE INTO stats (name, value) VALUES (?, 0)',
+                     (name,))
+        conn.execute('UPDATE stats SET value=value+? WHERE name=?', (value, name))
+      self.hits = 0
+      self.misses = 0
+
+  def cache_info(self):
+    """Returns the cache statistics of all processes as a |CacheInfo|.
+
+    Note that for other processes, only the flushed counters are accounted for.
+    """
+    with self._lock:
+      conn = self._Connection()
+      stats = dict(conn.execute('SELECT name, value FROM stats').fetchall())
+      currsize = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+      return CacheInfo(hits=stats.get('hits', 0) + self.hits,
+                       misses=stats.get('misses', 0) + self.misses,
+                       maxsize=self.maxsize,
+                       currsize=currsize)
+
+  def clear(self):
+    """Clears all the entries and statistics of the cache."""
+    with self._lock:
+      conn = self._Connection()
+      conn.execute('DELETE FROM cache')
+      conn.execute('DELETE FROM stats')
+      self._accesses = {}
+      self.hits = 0
+      self.misses = 0
+
+
+# The global persistent cache
+_persistent_cache = None
+
+
+def ConfigurePersistentCache(db_path=None, maxsize=None, fingerprint_fn=None):
+  """Configures the global persistent cache.
+
+  Shall be called in the main process and in each worker process, for example
+  using `mpool.RunOnEachWorkerProcess(cache.ConfigurePersistentCache, ...)`,
+  unless the worker processes are created after this call.
+
+  Args:
+    db_path: The path of the SQLite file. If None, the persistent cache is disabled.
+    maxsize: The maximum number of entries, or None for unlimited size.
+    fingerprint_fn: An optional module level function returning a fingerprint
+      of the data used by the memoized functions (see |PersistentCache|),
+      typically |drive.DataFingerprint| for the propagation models.
+  """
+  global _persistent_cache
+  if db_path is None:
+    _persistent_cache = None
+  else:
+    _persistent_cache = PersistentCache(db_path, maxsize, fingerprint_fn)
+    logging.info('Persistent cache configured in %s (maxsize=%s)', db_path, maxsize)
+
+
+def GetPersistentCache():
+  """Returns the global persistent cache, or None if not configured."""
+  return _persistent_cache
+
+
 # Cache management
 class CacheManager(object):
   """Cache context manager.
@@ -58,24 +317,43 @@ class CacheManager(object):
     - get repeatable results of function with random component:
     the function results will be the same within one 'with' context.
 
+  Optionally the global persistent cache (see `ConfigurePersistentCache()`) can
+  be used as a second level cache, in which case the results are kept across
+  contexts and shared between processes. Only use it for deterministic functions.
+
   Usage:
     #  Temporarily install a LRU memoizing cache on some function.
     with CacheManager(my_function, maxsize=None) as cm:
       # run the code using my_function
   """
-  def __init__(self, fn, maxsize=None):
+  def __init__(self, fn, maxsize=None, persistent=False):
+    """Initializes the cache manager.
+
+    Args:
+      fn: The module function to be memoized.
+      maxsize: The maximum in-memory cache size, or None for unlimited size.
+      persistent: If True, also uses the global persistent cache if configured.
+    """
     self._fn = fn
     self._wrapper_fn = None
     self._maxsize = maxsize
+    self._persistent_cache = None
+    if persistent:
+      self._persistent_cache = _persistent_cache
 
   def __enter__(self):
-    self._wrapper_fn = lru_cache(maxsize=self._maxsize)(self._fn)
+    fn = self._fn
+    if self._persistent_cache is not None:
+      fn = self._persistent_cache.Memoize(fn)
+    self._wrapper_fn = lru_cache(maxsize=self._maxsize)(fn)
     self._overrideModuleFunctionWith(self._wrapper_fn)
     return self
 
   def __exit__(self, *args):
     self.clear()
     self._overrideModuleFunctionWith(self._fn)
+    if self._persistent_cache is not None:
+      self._persistent_cache.FlushStats()
 
   def clear(self):
     if self._wrapper_fn:
@@ -0,0 +1,139 @@
+#    Copyright 2018 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from reference_models.common import cache
+
+_num_calls = 0
+_fingerprint = 'data1'
+
+
+def Fingerprint():
+  return _fingerprint
+
+
+def SomeFunction(lat, lon, height, reliability=-1, region='RURAL'):
+  global _num_calls
+  _num_calls += 1
+  return (lat + lon + height + np.sum(reliability), region)
+
+
+class TestCache(unittest.TestCase):
+
+  def setUp(self):
+    global _num_calls
+    _num_calls = 0
+    self.tmp_dir = tempfile.mkdtemp()
+    self.db_path = os.path.join(self.tmp_dir, 'cache.sqlite')
+
+  def tearDown(self):
+    cache.ConfigurePersistentCache(None)
+    shutil.rmtree(self.tmp_dir)
+
+  def test_lru_cache_manager(self):
+    with cache.CacheManager(SomeFunction):
+      SomeFunction(1, 2, 3)
+      SomeFunction(1, 2, 3)
+      self.assertEqual(_num_calls, 1)
+    SomeFunction(1, 2, 3)
+    self.assertEqual(_num_calls, 2)
+
+  def test_persistent_memoize(self):
+    store = cache.PersistentCache(self.db_path)
+    fn = store.Memoize(SomeFunction)
+    res1 = fn(10., -80., 5., reliability=[0.1, 0.5])
+    res2 = fn(10., -80., 5., [0.1, 0.5])
+    res3 = fn(10. + 1e-12, -80., 5., reliability=np.array([0.1, 0.5]))
+    self.assertEqual(res1, res2)
+    self.assertEqual(res1, res3)
+    self.assertEqual(_num_calls, 1)
+    fn(10., -80., 5., reliability=[0.1, 0.5], region='URBAN')
+    fn(10.001, -80., 5., reliability=[0.1, 0.5])
+    self.assertEqual(_num_calls, 3)
+    self.assertEqual((store.hits, store.misses), (2, 3))
+
+    # Another instance on same file (as in another process)
+    store2 = cache.PersistentCache(self.db_path)
+    self.assertEqual(store2.Memoize(SomeFunction)(10., -80., 5., [0.1, 0.5]),
+                     res1)
+    self.assertEqual(_num_calls, 3)
+    store.FlushStats()
+    store2.FlushStats()
+    info = store.cache_info()
+    self.assertEqual((info.hits, info.misses, info.currsize), (3, 3, 3))
+
+  def test_persistent_cache_manager(self):
+    cache.ConfigurePersistentCache(self.db_path)
+    module = sys.modules[__name__]
+    for _ in range(2):
+      with cache.CacheManager(SomeFunction, persistent=True):
+        module.SomeFunction(1., 2., 3.)
+        module.SomeFunction(1., 2., 3.)
+    self.assertEqual(_num_calls, 1)
+    info = cache.GetPersistentCache().cache_info()
+    self.assertEqual((info.hits, info.misses), (1, 1))
+
+  def test_persistent_fingerprint(self):
+    global _fingerprint
+    self.addCleanup(globals().__setitem__, '_fingerprint', 'data1')
+    store = cache.PersistentCache(self.db_path, fingerprint_fn=Fingerprint)
+    store.Memoize(SomeFunction)(1., 2., 3.)
+    store.Memoize(SomeFunction)(1., 2., 3.)
+    self.assertEqual(_num_calls, 1)
+    # Results obtained with other data are not reused.
+    _fingerprint = 'data2'
+    store.Memoize(SomeFunction)(1., 2., 3.)
+    self.assertEqual(_num_calls, 2)
+    cache.PersistentCache(self.db_path).Memoize(SomeFunction)(1., 2., 3.)
+    self.assertEqual(_num_calls, 3)
+
+  def test_persistent_access_batching(self):
+    store = cache.PersistentCache(self.db_path)
+    fn = store.Memoize(SomeFunction)
+    fn(1., 2., 3.)
+    conn = store._Connection()
+    def AccessTime():
+      return conn.execute('SELECT access FROM cache').fetchone()[0]
+    conn.execute('UPDATE cache SET access=0')
+    fn(1., 2., 3.)
+    self.assertEqual(AccessTime(), 0)
+    store.FlushStats()
+    self.assertGreater(AccessTime(), 0)
+    self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+
+  def test_persistent_eviction(self):
+    store = cache.PersistentCache(self.db_path, maxsize=50)
+    fn = store.Memoize(SomeFunction)
+    for k in range(cache._EVICTION_CHECK_PERIOD):
+      fn(k, 0, 0)
+    self.assertEqual(store.cache_info().currsize, 50)
+    # Least recently used are evicted
+    fn(cache._EVICTION_CHECK_PERIOD - 1, 0, 0)
+    self.assertEqual(store.hits, 1)
+    fn(0, 0, 0)
+    self.assertEqual(store.hits, 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -81,6 +81,188 @@ class CbsdGrantInfo(namedtuple('CbsdGrantInfo',
     """Returns unique CBSD key (ie key based on installation params only)."""
     return self[0:8]
 
+
+# The columns of a |GrantTable|, with their dtype.
+_GRANT_TABLE_COLUMNS = [
+    ('latitude', float), ('longitude', float), ('height_agl', float),
+    ('indoor_deployment', bool), ('cbsd_category', 'U1'),
+    ('antenna_azimuth', float), ('antenna_gain', float),
+    ('antenna_beamwidth', float), ('max_eirp', float),
+    ('low_frequency', float), ('high_frequency', float),
+    ('is_managed_grant', bool)]
+
+
+def _GrantColumn(grants, field, dtype):
+  """Returns the column of a grant field, with None as NaN in float columns."""
+  values = [getattr(g, field) for g in grants]
+  if dtype is float:
+    values = [np.nan if v is None else v for v in values]
+  return np.array(values, dtype=dtype)
+
+
+class GrantTable(object):
+  """GrantTable.
+
+  Holds a list of CBSD grants in a columnar form, for vectorized processing.
+  Each grant is identified by an integer id, being its index in the original
+  list of |CbsdGrantInfo|. Subsets of the grants (for example move lists) can
+  then be represented as boolean masks or index arrays, and converted back
+  into |CbsdGrantInfo| with `Grants()`.
+
+  Attributes:
+    ids: The grant ids (ndarray of int).
+    latitude, longitude: The CBSD locations (degrees).
+    height_agl: The CBSD heights above ground level (meters).
+    indoor_deployment: The CBSD indoor flags (ndarray of bool).
+    cbsd_category: The CBSD categories, either 'A' or 'B'.
+    is_cat_b: True for Cat B CBSDs (ndarray of bool).
+    antenna_azimuth: The antenna azimuths (degrees, NaN if unspecified).
+    antenna_gain: The antenna gains (dBi, NaN if unspecified).
+    antenna_beamwidth: The antenna beamwidths (degrees, NaN if unspecified).
+    max_eirp: The maximum EIRP (dBm per MHz, NaN if unspecified).
+    low_frequency, high_frequency: The grant frequency ranges (Hz).
+    is_managed_grant: True for grants of the managing SAS (ndarray of bool).
+  """
+
+  def __init__(self, grants):
+    """Initializes the table from an iterable of |CbsdGrantInfo|."""
+    self._grants = list(grants)
+    self._freq_masks = {}
+    self.ids = np.arange(len(self._grants))
+    # Increasing row keys, unchanged by `Updated()`, and the keys of each grant
+    # (built on first use).
+    self._keys = np.arange(len(self._grants))
+    self._next_key = len(self._grants)
+    self._keys_per_grant = None
+    for field, dtype in _GRANT_TABLE_COLUMNS:
+      setattr(self, field, _GrantColumn(self._grants, field, dtype))
+    self.is_cat_b = self.cbsd_category == 'B'
+
+  def __len__(self):
+    return len(self._grants)
+
+  def Grant(self, grant_id):
+    """Returns the |CbsdGrantInfo| of a given grant id."""
+    return self._grants[grant_id]
+
+  def Grants(self, selection=None):
+    """Returns a list of |CbsdGrantInfo| for a selection of grants.
+
+    Args:
+      selection: Either a boolean mask or a sequence of grant ids. If None, all
+        grants are returned.
+    """
+    if selection is None:
+      return list(self._grants)
+    selection = np.asarray(selection)
+    if selection.dtype == bool:
+      selection = np.flatnonzero(selection)
+    return [self._grants[k] for k in selection]
+
+  def Ids(self, grants):
+    """Returns the ids of the table grants present in `grants`.
+
+    Args:
+      grants: An iterable of |CbsdGrantInfo|. All the table grants equal to one
+        of them are returned, while grants not in the table are ignored.
+    """
+    if self._keys_per_grant is None:
+      self._keys_per_grant = {}
+      for key, grant in zip(self._keys, self._grants):
+        self._keys_per_grant.setdefault(grant, []).append(key)
+    keys = [key for grant in grants
+            for key in self._keys_per_grant.get(grant, ())]
+    return np.searchsorted(self._keys, np.array(keys, dtype=int))
+
+  def Mask(self, grants):
+    """Returns the boolean mask of the table grants present in `grants`.
+
+    Args:
+      grants: An iterable of |CbsdGrantInfo|. All the table grants equal to one
+        of them are set in the mask, while grants not in the table are ignored.
+    """
+    mask = np.zeros(len(self._grants), dtype=bool)
+    mask[self.Ids(grants)] = True
+    return mask
+
+  def FreqOverlapMask(self, low_freq, high_freq):
+    """Returns the mask of grants overlapping a frequency range.
+
+    The masks are computed once per frequency range and then reused, so that
+    the per-channel filtering is a simple lookup.
+
+    Args:
+      low_freq: The low frequency of the range (Hz).
+      high_freq: The high frequency of the range (Hz).
+    """
+    key = (low_freq, high_freq)
+    mask = self._freq_masks.get(key)
+    if mask is None:
+      mask = _FreqOverlap(self.low_frequency, self.high_frequency,
+                          low_freq, high_freq)
+      self._freq_masks[key] = mask
+    return mask
+
+  def Updated(self, added_grants, removed_ids):
+    """Returns a new table with some grants removed and others appended.
+
+    The columns and cached masks are copied with vectorized operations, and
+    only the added grants are processed one by one. The grants after a removed
+    one have their id shifted, so a mask over this table converts to the new
+    table by removing the `removed_ids` entries (see `np.delete()`) and
+    appending the entries of the added grants.
+
+    Args:
+      added_grants: An iterable of |CbsdGrantInfo| to append.
+      removed_ids: A sequence of the ids of the grants to remove.
+    """
+    added_grants = list(added_grants)
+    removed_ids = np.unique(np.asarray(removed_ids, dtype=int))
+    table = GrantTable([])
+    table._grants = list(self._grants)
+    for grant_id in removed_ids[::-1]:
+      del table._grants[grant_id]
+    table._grants.extend(added_grants)
+    table.ids = np.arange(len(table._grants))
+    for field, dtype in _GRANT_TABLE_COLUMNS:
+      setattr(table, field, np.concatenate((
+          np.delete(getattr(self, field), removed_ids),
+          _GrantColumn(added_grants, field, dtype))))
+    table.is_cat_b = table.cbsd_category == 'B'
+
+    added_keys = self._next_key + np.arange(len(added_grants))
+    table._keys = np.concatenate((np.delete(self._keys, removed_ids),
+                                  added_keys))
+    table._next_key = self._next_key + len(added_grants)
+    if self._keys_per_grant is not None:
+      table._keys_per_grant = dict(self._keys_per_grant)
+      for grant_id in removed_ids:
+        grant = self._grants[grant_id]
+        keys = [key for key in table._keys_per_grant[grant]
+                if key != self._keys[grant_id]]
+        if keys:
+          table._keys_per_grant[grant] = keys
+        else:
+          del table._keys_per_grant[grant]
+      for key, grant in zip(added_keys, added_grants):
+        table._keys_per_grant[grant] = (table._keys_per_grant.get(grant, [])
+                                        + [key])
+
+    num_kept = len(self._grants) - len(removed_ids)
+    for (low_freq, high_freq), mask in self._freq_masks.items():
+      table._freq_masks[(low_freq, high_freq)] = np.concatenate((
+          np.delete(mask, removed_ids),
+          _FreqOverlap(table.low_frequency[num_kept:],
+                       table.high_frequency[num_kept:], low_freq, high_freq)))
+    return table
+
+
+def _FreqOverlap(low_freqs, high_freqs, low_freq, high_freq):
+  """Returns the mask of frequency ranges overlapping a given range."""
+  overlap_bw = np.minimum(high_freqs, high_freq) - np.maximum(low_freqs, low_freq)
+  return overlap_bw > 0
+
+
 # Define FSS Protection Point, i.e., a tuple with named fields of
 # 'latitude', 'longitude', 'height_agl', 'max_gain_dbi', 'pointing_azimuth',
 # 'pointing_elevation'
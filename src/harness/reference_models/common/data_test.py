@@ -0,0 +1,94 @@
+#    Copyright 2018 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from reference_models.common import data
+
+
+def MakeGrant(lat, lon, category='A', low_freq=3550e6, is_managed=True,
+              beamwidth=None):
+  return data.CbsdGrantInfo(
+      latitude=lat, longitude=lon, height_agl=10., indoor_deployment=False,
+      cbsd_category=category, antenna_azimuth=None, antenna_gain=5,
+      antenna_beamwidth=beamwidth, max_eirp=20,
+      low_frequency=low_freq, high_frequency=low_freq + 10e6,
+      is_managed_grant=is_managed)
+
+
+class TestGrantTable(unittest.TestCase):
+
+  def setUp(self):
+    self.grants = [MakeGrant(37., -100., 'A', 3550e6, True),
+                   MakeGrant(37.1, -100., 'B', 3600e6, False, 30),
+                   MakeGrant(37.2, -100., 'B', 3650e6, True),
+                   MakeGrant(37., -100., 'A', 3550e6, True)]  # Duplicate
+    self.table = data.GrantTable(self.grants)
+
+  def test_columns(self):
+    self.assertEqual(len(self.table), 4)
+    self.assertListEqual(list(self.table.ids), [0, 1, 2, 3])
+    self.assertListEqual(list(self.table.latitude), [37., 37.1, 37.2, 37.])
+    self.assertListEqual(list(self.table.is_cat_b), [False, True, True, False])
+    self.assertListEqual(list(self.table.is_managed_grant),
+                         [True, False, True, True])
+    self.assertEqual(self.table.antenna_beamwidth[1], 30)
+    self.assertTrue(np.isnan(self.table.antenna_beamwidth[0]))
+    self.assertListEqual(list(self.table.FreqOverlapMask(3555e6, 3605e6)),
+                         [True, True, False, True])
+
+  def test_views_and_masks(self):
+    self.assertEqual(self.table.Grant(1), self.grants[1])
+    self.assertListEqual(self.table.Grants(), self.grants)
+    self.assertListEqual(self.table.Grants([2, 0]),
+                         [self.grants[2], self.grants[0]])
+    mask = self.table.Mask({self.grants[0], MakeGrant(10., 10.)})
+    self.assertListEqual(list(mask), [True, False, False, True])
+    self.assertListEqual(self.table.Grants(mask),
+                         [self.grants[0], self.grants[3]])
+    self.assertListEqual(list(self.table.Ids([self.grants[2]])), [2])
+
+  def test_updated(self):
+    self.table.Mask([])  # Builds the grant lookup, to be updated.
+    self.table.FreqOverlapMask(3555e6, 3605e6)
+    added = [MakeGrant(37.3, -100., 'B', 3600e6, False),
+             MakeGrant(37.2, -100., 'B', 3650e6, True)]  # Duplicate
+    table = self.table.Updated(added, [3, 1])
+    expected = data.GrantTable([self.grants[0], self.grants[2]] + added)
+    self.assertListEqual(table.Grants(), expected.Grants())
+    self.assertListEqual(list(table.ids), list(expected.ids))
+    for field in ['latitude', 'low_frequency', 'cbsd_category', 'is_cat_b',
+                  'is_managed_grant']:
+      self.assertListEqual(list(getattr(table, field)),
+                           list(getattr(expected, field)))
+    self.assertTrue(np.all(np.isnan(table.antenna_beamwidth)))
+    self.assertListEqual(list(table.FreqOverlapMask(3555e6, 3605e6)),
+                         [True, False, True, False])
+    self.assertListEqual(list(table.Mask([self.grants[0], self.grants[2]])),
+                         [True, True, False, True])
+    self.assertListEqual(list(table.Mask([self.grants[1]])),
+                         [False, False, False, False])
+    # The original table is unchanged.
+    self.assertListEqual(self.table.Grants(), self.grants)
+    self.assertListEqual(list(self.table.Mask([self.grants[0]])),
+                         [True, False, False, True])
+
+
+if __name__ == '__main__':
+  unittest.main()
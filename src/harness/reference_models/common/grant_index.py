@@ -0,0 +1,173 @@
+#    Copyright 2018 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+"""Spatial index of grants for neighborhood queries.
+
+The `GrantIndex` is built once from a list of |data.CbsdGrantInfo| (or from a
+|data.GrantTable|) and allows to quickly find the grants in the neighborhood of
+many protection points, instead of a full scan of all grants for each
+protection point.
+
+The grants are bucketed in a 3D grid of their ECEF coordinates. A query first
+selects the candidate grants whose straight line (chord) distance to the
+protection point is below the neighborhood distance, which is a conservative
+filter as the chord is always shorter than the geodesic. The candidates are
+then refined with the exact Vincenty distance, so that the result is the same
+as a full scan.
+
+Typical usage:
+  index = GrantIndex(grants)
+  # Indices of grants within 150km (cat A) or 200km (cat B) of a point,
+  # overlapping a given frequency range.
+  idxs = index.FindInsideNeighborhood(lat, lon, (150, 200),
+                                      low_freq, high_freq)
+  neighbor_grants = [index[k] for k in idxs]
+
+The index behaves as a read-only sequence of its grants, so it can be passed
+in place of the list of grants to the neighborhood routines of the models.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+from reference_models.common import data
+from reference_models.geo import vincenty
+
+# WGS84 ellipsoid
+_WGS_A_KM = 6378.137
+_WGS_F = 1./298.257223563
+_WGS_E2 = _WGS_F * (2 - _WGS_F)
+
+# Size of the ECEF grid cells (km).
+_CELL_SIZE_KM = 100.
+# Margin on the chord distance, to account for numerical errors (km).
+_CHORD_MARGIN_KM = 1e-3
+
+
+def _LatLonToEcef(lats, lons):
+  """Returns the ECEF coordinates (km) of points on the WGS84 ellipsoid.
+
+  Inputs:
+    lats, lons: ndarray of the point coordinates (degrees).
+
+  Returns:
+    A ndarray of shape (N, 3) holding the ECEF (x, y, z) of the points.
+  """
+  phi = np.radians(lats)
+  lmbda = np.radians(lons)
+  sin_phi = np.sin(phi)
+  n = _WGS_A_KM / np.sqrt(1 - _WGS_E2 * sin_phi**2)
+  return np.column_stack((n * np.cos(phi) * np.cos(lmbda),
+                          n * np.cos(phi) * np.sin(lmbda),
+                          n * (1 - _WGS_E2) * sin_phi))
+
+
+class GrantIndex(object):
+  """Spatial index of grants.
+
+  Attributes:
+    table: The |data.GrantTable| of the indexed grants.
+  """
+
+  def __init__(self, grants, cell_size_km=_CELL_SIZE_KM):
+    """Initializes the index.
+
+    Args:
+      grants: An iterable of |data.CbsdGrantInfo| grants, or a |data.GrantTable|.
+      cell_size_km: The size of the ECEF grid cells (km).
+    """
+    if not isinstance(grants, data.GrantTable):
+      grants = data.GrantTable(grants)
+    self.table = grants
+
+    # Bucket the grants into the ECEF grid cells.
+    self._cell_size_km = cell_size_km
+    self._xyz = _LatLonToEcef(self.table.latitude, self.table.longitude)
+    cells = np.floor(self._xyz / cell_size_km).astype(np.int64)
+    order = np.lexsort(cells.T[::-1])
+    cells = cells[order]
+    starts = np.nonzero(np.any(np.diff(cells, axis=0), axis=1))[0] + 1
+    starts = np.concatenate(([0], starts)) if len(self.table) else starts
+    self._cells = cells[starts]
+    self._cell_members = np.split(order, starts[1:])
+
+  def __len__(self):
+    return len(self.table)
+
+  def __getitem__(self, idx):
+    return self.table.Grant(idx)
+
+  def __iter__(self):
+    return iter(self.table.Grants())
+
+  def QueryCandidates(self, latitude, longitude, radius_km):
+    """Returns the candidate grants within a radius of a point.
+
+    This is a conservative selection: all grants within the given geodesic
+    distance of the point are returned, but also possibly a few more.
+
+    Args:
+      latitude: The point latitude (degrees).
+      longitude: The point longitude (degrees).
+      radius_km: The radius (km).
+
+    Returns:
+      A sorted ndarray of the candidate grant indices.
+    """
+    if not len(self.table):
+      return np.zeros(0, dtype=int)
+    xyz = _LatLonToEcef(np.array([latitude]), np.array([longitude]))[0]
+    radius_km += _CHORD_MARGIN_KM
+    min_cell = np.floor((xyz - radius_km) / self._cell_size_km)
+    max_cell = np.floor((xyz + radius_km) / self._cell_size_km)
+    in_box = np.all((self._cells >= min_cell) & (self._cells <= max_cell),
+                    axis=1)
+    members = [self._cell_members[k] for k in np.nonzero(in_box)[0]]
+    if not members:
+      return np.zeros(0, dtype=int)
+    idxs = np.sort(np.concatenate(members))
+    chord_sq = np.sum((self._xyz[idxs] - xyz)**2, axis=1)
+    return idxs[chord_sq <= radius_km**2]
+
+  def FindInsideNeighborhood(self, latitude, longitude, neighbor_distances,
+                             low_freq=None, high_freq=None):
+    """Finds the grants inside the neighborhood of a point.
+
+    The distance of each grant is computed from the grant location to the
+    point, with the same Vincenty routine as the full scan routines.
+
+    Args:
+      latitude: The point latitude (degrees).
+      longitude: The point longitude (degrees).
+      neighbor_distances: The neighborhood distances (km) as a sequence:
+        [cata_dist, catb_dist].
+      low_freq: If specified, the low frequency of the protection (Hz), for
+        keeping only grants overlapping [low_freq, high_freq].
+      high_freq: The high frequency of the protection (Hz).
+
+    Returns:
+      A sorted ndarray of the indices of the grants inside the neighborhood.
+    """
+    idxs = self.QueryCandidates(latitude, longitude, max(neighbor_distances))
+    if low_freq is not None:
+      idxs = idxs[self.table.FreqOverlapMask(low_freq, high_freq)[idxs]]
+    if not len(idxs):
+      return idxs
+    max_dists_km = np.where(self.table.is_cat_b[idxs],
+                            neighbor_distances[1], neighbor_distances[0])
+    return idxs[vincenty.GeodesicDistancesWithin(
+        self.table.latitude[idxs], self.table.longitude[idxs],
+        latitude, longitude, max_dists_km)]
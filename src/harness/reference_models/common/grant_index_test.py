@@ -0,0 +1,89 @@
+#    Copyright 2018 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import random
+import unittest
+
+import numpy as np
+
+from reference_models.common import data
+from reference_models.common import grant_index
+from reference_models.geo import vincenty
+
+
+def RandomGrants(num_grants, lat0, lon0, delta):
+  grants = []
+  for _ in range(num_grants):
+    low_freq = random.choice(range(3550, 3700, 5)) * 1e6
+    grants.append(data.CbsdGrantInfo(
+        latitude=lat0 + random.uniform(-delta, delta),
+        longitude=lon0 + random.uniform(-delta, delta),
+        height_agl=10., indoor_deployment=False,
+        cbsd_category=random.choice(['A', 'B']),
+        antenna_azimuth=0, antenna_gain=10, antenna_beamwidth=360,
+        max_eirp=20,
+        low_frequency=low_freq, high_frequency=low_freq + 10e6,
+        is_managed_grant=True))
+  return grants
+
+
+class TestGrantIndex(unittest.TestCase):
+
+  def test_neighborhood(self):
+    random.seed(12345)
+    grants = RandomGrants(2000, 37., -100., 4.)
+    index = grant_index.GrantIndex(grants, cell_size_km=30.)
+    self.assertEqual(len(index), len(grants))
+    self.assertEqual(index[10], grants[10])
+    for lat, lon in [(37., -100.), (35.5, -98.), (30., -100.)]:
+      for low_freq, high_freq in [(None, None), (3600e6, 3610e6)]:
+        idxs = index.FindInsideNeighborhood(lat, lon, (80, 150),
+                                            low_freq, high_freq)
+        # Full scan
+        exp_idxs = []
+        for k, grant in enumerate(grants):
+          if (low_freq is not None and
+              (min(grant.high_frequency, high_freq)
+               - max(grant.low_frequency, low_freq)) <= 0):
+            continue
+          dist, _, _ = vincenty.GeodesicDistanceBearing(
+              grant.latitude, grant.longitude, lat, lon)
+          if dist <= (150 if grant.cbsd_category == 'B' else 80):
+            exp_idxs.append(k)
+        self.assertListEqual(list(idxs), exp_idxs)
+
+  def test_candidates(self):
+    random.seed(12345)
+    grants = RandomGrants(1000, 45., 10., 2.)
+    index = grant_index.GrantIndex(grants)
+    idxs = index.QueryCandidates(45., 10., 50.)
+    self.assertTrue(np.all(np.diff(idxs) > 0))
+    dists = [vincenty.GeodesicDistanceBearing(g.latitude, g.longitude,
+                                              45., 10.)[0]
+             for g in grants]
+    exp_idxs = [k for k, dist in enumerate(dists) if dist <= 50.]
+    self.assertTrue(set(exp_idxs).issubset(idxs))
+    self.assertLess(len(idxs), len(grants) / 4)
+
+  def test_empty(self):
+    index = grant_index.GrantIndex([])
+    self.assertEqual(len(index), 0)
+    self.assertEqual(len(index.FindInsideNeighborhood(37, -100, (80, 150))), 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -36,6 +36,20 @@ mpool.RunOnEachWorkerProcess(fn, 3, arg2=4)
 pool = mpool.Pool()
 pool.map(...)
 pool.apply_async(...)
+
+# Share a large read-only payload (for ex the grants) once with the workers,
+# and only send a handle to it with each task.
+with mpool.SharedPayloads() as shared:
+  grants_handle = shared.Share(grants)
+  pool.map(mpool.SharedPartial(fn, grants=grants_handle), points)
+
+# Map a function on protection points, scheduling the points by terrain tiles
+# to reduce the tile loads in the workers.
+results = mpool.MapByTileLocality(
+    fn, points,
+    [tiles.NeighborhoodTiles(lat, lon, radius_km) for lat, lon in locations],
+    drive.NumTerrainTileLoads)
+print(mpool.GetWorkerTileLoads())
 """
 # NOTE: This has been tested in Linux only.
 # Windows has some special way of launching processes, not using fork(),
@@ -50,9 +64,19 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from collections import OrderedDict
 from functools import partial
+import atexit
+import itertools
 import multiprocessing
+import os
+import tempfile
 import time
+import uuid
+
+import numpy as np
+import six
+from six.moves import cPickle as pickle
 
 
 class _DummyPool(object):
@@ -131,6 +155,257 @@ def RunOnEachWorkerProcess(fn, * args, **kwargs):
   return _pool.map(_partial_fn, [pfn] * _num_workers, chunksize=1)
 
 
+# The payloads shared by current process, per key: (version, payload, path).
+_shared_payloads = {}
+# The payloads loaded by current process (LRU), per key: (version, payload, path).
+_loaded_payloads = OrderedDict()
+# Maximum number of payloads kept in the LRU of loaded payloads: the maximum
+# number of payloads used together by a task (see `dpa_mgr.CheckInterference`).
+_MAX_LOADED_PAYLOADS = 4
+# Version counter of the shared payloads.
+_payload_versions = itertools.count(1)
+
+
+class SharedPayload(object):
+  """Handle to a read-only payload shared with the worker processes.
+
+  The handle is cheap to pickle: only the payload key, version and file location
+  are sent to the workers. Each worker loads the payload once on first access,
+  and keeps it until another version is shared under the same key, or until
+  it loads another payload once this one has been released.
+
+  Attributes:
+    key: The payload key.
+    version: The payload version.
+  """
+  def __init__(self, key, version, path):
+    self.key = key
+    self.version = version
+    self._path = path
+
+  def Get(self):
+    """Returns the payload."""
+    entry = _shared_payloads.get(self.key)
+    if entry is not None and entry[0] == self.version:
+      return entry[1]
+    entry = _loaded_payloads.pop(self.key, None)
+    if entry is None or entry[0] != self.version:
+      if self._path is None:
+        raise ValueError('Shared payload `%s` not available.' % self.key)
+      # Drop the payloads released since then by the sharing process.
+      for key, (_, _, path) in list(_loaded_payloads.items()):
+        if not os.path.exists(path):
+          del _loaded_payloads[key]
+      with open(self._path, 'rb') as fd:
+        entry = (self.version, pickle.load(fd), self._path)
+    _loaded_payloads[self.key] = entry
+    while len(_loaded_payloads) > _MAX_LOADED_PAYLOADS:
+      _loaded_payloads.popitem(last=False)
+    return entry[1]
+
+  def Release(self):
+    """Releases the payload, if still the current version of its key."""
+    entry = _shared_payloads.get(self.key)
+    if entry is not None and entry[0] == self.version:
+      Release(self.key)
+
+
+def Share(payload, key=None):
+  """Shares a read-only payload with the worker processes.
+
+  The payload is serialized once into a temporary file, from which each worker
+  loads it on first access. Sharing a new payload under the same key invalidates
+  the previous version.
+  If there are no worker processes, the payload is simply kept in memory.
+
+  Args:
+    payload: The payload, which shall not be modified once shared.
+    key: An optional key. If None, a unique key is created.
+
+  Returns:
+    A |SharedPayload| handle to the payload.
+  """
+  if key is None:
+    key = uuid.uuid4().hex
+  Release(key)
+  version = next(_payload_versions)
+  path = None
+  if not isinstance(_pool, _DummyPool):
+    fd, path = tempfile.mkstemp(prefix='mpool_', suffix='.pkl')
+    with os.fdopen(fd, 'wb') as f:
+      pickle.dump(payload, f, pickle.HIGHEST_PROTOCOL)
+  _shared_payloads[key] = (version, payload, path)
+  return SharedPayload(key, version, path)
+
+
+def Release(key):
+  """Releases the payload shared under a given key (if any)."""
+  entry = _shared_payloads.pop(key, None)
+  if entry is not None and entry[2] is not None:
+    try:
+      os.remove(entry[2])
+    except OSError:
+      pass
+
+
+def _ReleaseAll(pid=os.getpid()):
+  # Only the process which created the payload files removes them.
+  if os.getpid() == pid:
+    for key in list(_shared_payloads):
+      Release(key)
+
+atexit.register(_ReleaseAll)
+
+
+class SharedPayloads(object):
+  """Context manager of shared payloads, releasing them on exit.
+
+  Usage:
+    with mpool.SharedPayloads() as shared:
+      grants_handle = shared.Share(grants)
+      ...
+  """
+  def __init__(self):
+    self._handles = []
+
+  def Share(self, payload):
+    """Shares a payload. See module `Share()`."""
+    handle = Share(payload)
+    self._handles.append(handle)
+    return handle
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    for handle in self._handles:
+      handle.Release()
+    self._handles = []
+
+
+def _Resolve(value):
+  return value.Get() if isinstance(value, SharedPayload) else value
+
+
+class SharedPartial(object):
+  """A `functools.partial` replacing its |SharedPayload| arguments by the payload.
+
+  Only the handles are pickled when the partial is sent to the workers, and the
+  payloads are resolved at time of call.
+  """
+  def __init__(self, fn, *args, **kwargs):
+    self.fn = fn
+    self.args = args
+    self.kwargs = kwargs
+
+  def __call__(self, *args, **kwargs):
+    fn_args = [_Resolve(arg) for arg in self.args] + list(args)
+    fn_kwargs = dict((k, _Resolve(v)) for k, v in six.iteritems(self.kwargs))
+    fn_kwargs.update(kwargs)
+    return self.fn(*fn_args, **fn_kwargs)
+
+
+# Number of terrain tile loads per worker process (pid) in the scheduled maps.
+_worker_tile_loads = {}
+# Number of regions per worker in the scheduled maps, for load balancing.
+_REGIONS_PER_WORKER = 4
+
+
+class _TileLocalityBatch(object):
+  """Runs a function on a batch of items, counting the terrain tile loads."""
+  def __init__(self, fn, num_tile_loads_fn):
+    self.fn = fn
+    self.num_tile_loads_fn = num_tile_loads_fn
+
+  def _NumTileLoads(self):
+    return self.num_tile_loads_fn() if self.num_tile_loads_fn else 0
+
+  def __call__(self, batch):
+    num_loads = self._NumTileLoads()
+    results = [self.fn(item) for item in batch]
+    return os.getpid(), self._NumTileLoads() - num_loads, results
+
+
+def _TileLocalityOrder(tile_keys):
+  """Returns the item indices ordered by clusters of neighborhood tiles."""
+  clusters = {}
+  for idx, item_tiles in enumerate(tile_keys):
+    clusters.setdefault(tuple(sorted(item_tiles)), []).append(idx)
+  return [idx for key in sorted(clusters) for idx in clusters[key]]
+
+
+def MapByTileLocality(fn, items, tile_keys, num_tile_loads_fn=None):
+  """Applies a function on items, with a terrain tile locality aware scheduling.
+
+  The items (typically protection points) are clustered by the set of terrain
+  tiles covering their neighborhood, and the ordered clusters are split into
+  contiguous regions, a few per worker so that the pool can balance the load.
+  Each region is sent as a single task, so that it is processed by a single
+  worker, which reuses the tiles in its cache instead of loading the tiles of
+  all regions. The regions are queued in tile order, so that a worker taking
+  the next pending region usually continues in nearby tiles.
+
+  Note that there is no worker affinity: the pool gives no control on which
+  worker processes a task, so a region may go to a different worker from one
+  call to the next, and the tiles reuse across calls is not guaranteed.
+
+  With the dummy pool, the items are simply processed in order.
+
+  The number of terrain tile loads of each worker is accumulated, and can be
+  retrieved with `GetWorkerTileLoads()`.
+
+  Args:
+    fn: The function to apply on each item.
+    items: A sequence of items.
+    tile_keys: For each item, the set of tiles covering its neighborhood, as
+      sortable keys (see |tiles.NeighborhoodTiles()|).
+    num_tile_loads_fn: An optional module level function returning the number
+      of tile loads done so far by the calling process (for example
+      |drive.NumTerrainTileLoads|). If not set, the tile loads are not counted.
+
+  Returns:
+    The list of `fn(item)`, in the order of the items.
+  """
+  items = list(items)
+  run_batch = _TileLocalityBatch(fn, num_tile_loads_fn)
+  num_workers = _num_workers or getattr(_pool, '_processes', 0)
+  if isinstance(_pool, _DummyPool) or num_workers <= 1 or len(items) <= 1:
+    batches_results = [run_batch(items)]
+    batches = [range(len(items))]
+  else:
+    order = _TileLocalityOrder(tile_keys)
+    batches = np.array_split(
+        order, min(num_workers * _REGIONS_PER_WORKER, len(items)))
+    async_results = [_pool.apply_async(run_batch,
+                                       ([items[idx] for idx in batch],))
+                     for batch in batches]
+    batches_results = [async_result.get() for async_result in async_results]
+
+  results = [None] * len(items)
+  for batch, (pid, num_loads, batch_results) in zip(batches, batches_results):
+    _worker_tile_loads[pid] = _worker_tile_loads.get(pid, 0) + num_loads
+    for idx, result in zip(batch, batch_results):
+      results[idx] = result
+  return results
+
+
+def GetWorkerTileLoads():
+  """Returns the number of terrain tile loads per worker process.
+
+  Only the tile loads occurring within `MapByTileLocality()` are accounted,
+  since the last call to `ResetWorkerTileLoads()`.
+
+  Returns:
+    A dict of the number of tile loads, keyed by the worker process id.
+  """
+  return dict(_worker_tile_loads)
+
+
+def ResetWorkerTileLoads():
+  """Resets the number of terrain tile loads per worker process."""
+  _worker_tile_loads.clear()
+
+
 def Configure(num_processes=-1, pool=None):
   """Configure multiprocessing pool.
 
@@ -0,0 +1,154 @@
+#    Copyright 2018 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from six.moves import cPickle as pickle
+
+from reference_models.common import mpool
+
+
+_num_calls = [0]
+
+
+def Square(x):
+  _num_calls[0] += 1
+  return x**2
+
+
+def NumCalls():
+  return _num_calls[0]
+
+
+def Pid(x):
+  return os.getpid()
+
+
+def SumWithOffset(x, values, offset=0):
+  return x + sum(values) + offset
+
+
+class TestSharedPayload(unittest.TestCase):
+
+  def tearDown(self):
+    mpool.Configure(0)
+
+  def test_dummy_pool(self):
+    mpool.Configure(0)
+    with mpool.SharedPayloads() as shared:
+      handle = shared.Share([1, 2, 3])
+      self.assertEqual(handle.Get(), [1, 2, 3])
+      fn = mpool.SharedPartial(SumWithOffset, values=handle)
+      self.assertListEqual(mpool.Pool().map(fn, [0, 10]), [6, 16])
+    self.assertRaises(ValueError, handle.Get)
+
+  def test_worker_pool(self):
+    pool = multiprocessing.Pool(processes=2)
+    self.addCleanup(pool.terminate)
+    mpool.Configure(pool=pool)
+    handle = mpool.Share(list(range(1000)), key='values')
+    fn = mpool.SharedPartial(SumWithOffset, values=handle, offset=1)
+    # Only the handle is pickled into the tasks.
+    self.assertLess(len(pickle.dumps(fn)), 500)
+    self.assertListEqual(pool.map(fn, [0, 1, 2, 3], chunksize=1),
+                         [499501, 499502, 499503, 499504])
+
+    # New version invalidates the previous one.
+    path = handle._path
+    handle2 = mpool.Share([5], key='values')
+    self.assertFalse(os.path.exists(path))
+    self.assertGreater(handle2.version, handle.version)
+    fn = mpool.SharedPartial(SumWithOffset, values=handle2)
+    self.assertListEqual(pool.map(fn, [0, 1, 2, 3], chunksize=1),
+                         [5, 6, 7, 8])
+    handle.Release()  # No effect on the new version
+    self.assertEqual(handle2.Get(), [5])
+    handle2.Release()
+    self.assertFalse(os.path.exists(handle2._path))
+
+  def test_loaded_payloads_eviction(self):
+    # Payloads loaded by a worker, as not shared by the current process.
+    handles = []
+    for k in range(2):
+      fd, path = tempfile.mkstemp(prefix='mpool_test_', suffix='.pkl')
+      self.addCleanup(mpool._loaded_payloads.pop, 'payload%d' % k, None)
+      with os.fdopen(fd, 'wb') as f:
+        pickle.dump([k], f)
+      handles.append(mpool.SharedPayload('payload%d' % k, 1, path))
+    self.addCleanup(os.remove, handles[1]._path)
+    self.assertEqual(handles[0].Get(), [0])
+    self.assertIn('payload0', mpool._loaded_payloads)
+    # The released payloads are dropped on next load.
+    os.remove(handles[0]._path)
+    self.assertEqual(handles[1].Get(), [1])
+    self.assertNotIn('payload0', mpool._loaded_payloads)
+    self.assertIn('payload1', mpool._loaded_payloads)
+
+
+class TestTileLocality(unittest.TestCase):
+
+  def tearDown(self):
+    mpool.Configure(0)
+    mpool.ResetWorkerTileLoads()
+
+  def test_order(self):
+    # Interleaved points of 2 distant regions are grouped by region.
+    tile_keys = [{(38, -123)}, {(41, -101)}, {(38, -123)}, {(41, -101)},
+                 {(38, -123)}]
+    order = mpool._TileLocalityOrder(tile_keys)
+    self.assertEqual(sorted(order), list(range(5)))
+    regions = [(41, -101) in tile_keys[idx] for idx in order]
+    self.assertEqual(sum(regions[k] != regions[k+1] for k in range(4)), 1)
+
+  def test_map(self):
+    items = list(range(40))
+    tile_keys = [{(38 + k % 2, -110)} for k in items]
+    pool = multiprocessing.Pool(processes=2)
+    self.addCleanup(pool.terminate)
+    for configured_pool in [None, pool]:
+      mpool.Configure(0, pool=configured_pool)
+      mpool.ResetWorkerTileLoads()
+      results = mpool.MapByTileLocality(Square, items, tile_keys, NumCalls)
+      self.assertListEqual(results, [k**2 for k in items])
+      workers = set(mpool.GetWorkerTileLoads())
+      self.assertEqual(sum(mpool.GetWorkerTileLoads().values()), 40)
+      if configured_pool is None:
+        self.assertSetEqual(workers, {os.getpid()})
+      else:
+        self.assertTrue(workers)
+        self.assertNotIn(os.getpid(), workers)
+
+  def test_map_regions(self):
+    # Each of the 8 regions (4 per worker) is processed by a single worker.
+    items = list(range(40))
+    tile_keys = [{(38 + k % 2, -110)} for k in items]
+    pool = multiprocessing.Pool(processes=2)
+    self.addCleanup(pool.terminate)
+    mpool.Configure(0, pool=pool)
+    pids = mpool.MapByTileLocality(Pid, items, tile_keys)
+    order = mpool._TileLocalityOrder(tile_keys)
+    regions = [order[k:k+5] for k in range(0, 40, 5)]
+    for region in regions:
+      self.assertEqual(len(set(pids[idx] for idx in region)), 1)
+    self.assertSetEqual(set(mpool.GetWorkerTileLoads().values()), {0})
+
+
+if __name__ == '__main__':
+  unittest.main()
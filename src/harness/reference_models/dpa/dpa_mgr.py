@@ -43,8 +43,8 @@ from __future__ import division
 from __future__ import print_function
 
 from collections import namedtuple
+import contextlib
 from datetime import datetime
-import functools
 import logging
 import os
 
@@ -54,9 +54,12 @@ import six
 from six.moves import zip
 
 from reference_models.common import data
+from reference_models.common import grant_index
 from reference_models.common import mpool
 from reference_models.dpa import dpa_builder
 from reference_models.dpa import move_list as ml
+from reference_models.geo import drive
+from reference_models.geo import tiles
 from reference_models.geo import zones
 
 # The default DPA parameters, corresponding to legacy Coastal DPA.
@@ -136,6 +139,11 @@ class Dpa(object):
 
   Note that keep list is the grants of the nbor_list not in the move list.
 
+  Internally the move and neighbor lists are held as boolean masks over the
+  |data.GrantTable| of the DPA grants. The `move_lists` and `nbor_lists` sets are
+  only built when accessed, and from then on are used as the reference lists
+  (as they can be modified by the caller).
+
   Usage:
     # Setup the DPA
     dpa = Dpa(protected_points)
@@ -151,16 +159,43 @@ class Dpa(object):
     status = dpa.CheckInterference(channel, sas_uut_keep_list, margin_db=1)
   """
   num_iteration = 2000
+  share_path_loss = False
+  sampling = 'uniform'
+  seed = None
 
   @classmethod
   def Configure(cls,
-                num_iteration=2000):
+                num_iteration=2000,
+                share_path_loss=False,
+                sampling='uniform',
+                seed=None):
     """Configure operating parameters.
 
     Args:
       num_iteration: The number of iteration to use in the Monte Carlo simulation.
+      share_path_loss: If True, the Monte Carlo path losses of each CBSD to a
+        protection point are computed once and shared by all the DPA channels,
+        instead of being drawn again for each channel. This applies to the
+        move list computation and to the interference check of all channels.
+      sampling: The sampling strategy of the Monte Carlo reliabilities, one of
+        `move_list.SAMPLING_STRATEGIES`: 'uniform' (reference) or 'lhs' (Latin
+        hypercube, allowing fewer iterations for the same 95% quantile
+        accuracy). It is applied to the main and worker processes.
+      seed: If set, an integer seed of the deterministic random streams: the
+        Monte Carlo reliabilities of each CBSD to protection point link are
+        drawn from a counter-based generator keyed by the seed and the link
+        (see `move_list.SetRandomStreamsSeed()`), giving reproducible results
+        whatever the worker pool. It is applied to the main and worker
+        processes. Otherwise the global `np.random` state is used.
     """
+    ml.SetSamplingStrategy(sampling)
+    mpool.RunOnEachWorkerProcess(ml.SetSamplingStrategy, sampling)
+    ml.SetRandomStreamsSeed(seed)
+    mpool.RunOnEachWorkerProcess(ml.SetRandomStreamsSeed, seed)
     cls.num_iteration = num_iteration
+    cls.share_path_loss = share_path_loss
+    cls.sampling = sampling
+    cls.seed = seed
 
   def __init__(self, protected_points,
                geometry=None,
@@ -184,6 +219,7 @@ class Dpa(object):
     self.monitor_type = monitor_type
     self._channels = None
     self._grants = []
+    self._grant_table = data.GrantTable([])
     self._has_th_grants = False
     self.ResetFreqRange(freq_ranges_mhz)
     self.ResetLists()
@@ -216,15 +252,72 @@ class Dpa(object):
 
   def ResetLists(self):
     """Reset move list and neighbor list."""
-    self.move_lists = [set() for _ in self._channels]
-    self.nbor_lists = [set() for _ in self._channels]
+    self._move_masks = [np.zeros(len(self._grant_table), dtype=bool)
+                        for _ in self._channels]
+    self._nbor_masks = [np.zeros(len(self._grant_table), dtype=bool)
+                        for _ in self._channels]
+    self._move_lists = None
+    self._nbor_lists = None
+    self._incremental_move_lists = None
+    self._move_counts = None
+    self._nbor_counts = None
+    self._inside_mask = None
+
+  @property
+  def move_lists(self):
+    """The move lists, as a list of set of |CbsdGrantInfo| per channel."""
+    if self._move_lists is None:
+      self._move_lists = [set(self._grant_table.Grants(mask))
+                          for mask in self._move_masks]
+    return self._move_lists
+
+  @move_lists.setter
+  def move_lists(self, move_lists):
+    self._move_lists = move_lists
+
+  @property
+  def nbor_lists(self):
+    """The neighbor lists, as a list of set of |CbsdGrantInfo| per channel."""
+    if self._nbor_lists is None:
+      self._nbor_lists = [set(self._grant_table.Grants(mask))
+                          for mask in self._nbor_masks]
+    return self._nbor_lists
+
+  @nbor_lists.setter
+  def nbor_lists(self, nbor_lists):
+    self._nbor_lists = nbor_lists
+
+  def _GetMoveMask(self, chan_idx):
+    """Returns the move list of a channel as a mask over the grant table."""
+    if self._move_lists is not None:
+      return self._grant_table.Mask(self._move_lists[chan_idx])
+    return self._move_masks[chan_idx]
+
+  def _GetNeighborMask(self, chan_idx):
+    """Returns the neighbor list of a channel as a mask over the grant table."""
+    if self._nbor_lists is not None:
+      return self._grant_table.Mask(self._nbor_lists[chan_idx])
+    return self._nbor_masks[chan_idx]
+
+  def _SetGrants(self, grants):
+    """Sets the list of grants and resets the lists."""
+    self._grants = grants
+    self._grant_table = data.GrantTable(grants)
+    self.ResetLists()
+    self._has_th_grants = self._DetectIfPeerSas()
+
+  def _MapOnPoints(self, fn):
+    """Maps a function on the protected points, scheduled by terrain tiles."""
+    radius_km = max(self.neighbor_distances)
+    return mpool.MapByTileLocality(
+        fn, self.protected_points,
+        [tiles.NeighborhoodTiles(point.latitude, point.longitude, radius_km)
+         for point in self.protected_points],
+        drive.NumTerrainTileLoads)
 
   def _DetectIfPeerSas(self):
     """Returns True if holding grants from peer TH SAS."""
-    for grant in self._grants:
-      if not grant.is_managed_grant:
-        return True
-    return False
+    return not np.all(self._grant_table.is_managed_grant)
 
   def SetGrantsFromFad(self, sas_uut_fad, sas_th_fads):
     """Sets the list of grants.
@@ -238,46 +331,56 @@ class Dpa(object):
     if sas_uut_fad is None: sas_uut_fad = _EmptyFad()
     if sas_th_fads is None: sas_th_fads = []
     # TODO(sbdt): optim = pre-filtering of grants in global DPA neighborhood.
-    self._grants = data.getGrantObjectsFromFAD(sas_uut_fad, sas_th_fads)
-    self.ResetLists()
-    self._has_th_grants = self._DetectIfPeerSas()
+    self._SetGrants(data.getGrantObjectsFromFAD(sas_uut_fad, sas_th_fads))
 
   def SetGrantsFromList(self, grants):
     """Sets the list of grants from a list of |data.CbsdGrantInfo|."""
     # TODO(sbdt): optim = pre-filtering of grants in global DPA neighborhood.
-    self._grants = grants
-    self.ResetLists()
-    self._has_th_grants = self._DetectIfPeerSas()
+    self._SetGrants(grants)
 
-  def ComputeMoveLists(self):
+  def ComputeMoveLists(self, incremental=False):
     """Computes move/neighbor lists.
 
     This routine updates the internal grants move list and neighbor list.
     One set of list is maintained per protected channel.
     To retrieve the list, see the routines GetMoveList(), GetNeighborList() and
     GetKeepList().
+
+    Args:
+      incremental: If True, the lists of each protected point are computed
+        with |move_list.IncrementalMoveList| and kept in memory, so that they
+        can be updated afterwards with `UpdateGrants()`. This holds the sorted
+        interference matrices of all points, ie 8 bytes per Monte Carlo
+        iteration for each (point, channel, neighbor grant).
     """
     logging.info('DPA Compute movelist `%s`- channels %s thresh %s bw %s height %s '
-                 'iter %s azi_range %s nbor_dists %s',
+                 'iter %s (%s) azi_range %s nbor_dists %s incremental %s',
                  self.name, self._channels, self.threshold, self.beamwidth,
-                 self.radar_height, Dpa.num_iteration,
-                 self.azimuth_range, self.neighbor_distances)
+                 self.radar_height, Dpa.num_iteration, Dpa.sampling,
+                 self.azimuth_range, self.neighbor_distances, incremental)
     logging.debug('  protected points: %s', self.protected_points)
-    pool = mpool.Pool()
     self.ResetLists()
+    if incremental:
+      self._ComputeIncrementalMoveLists()
+    else:
+      self._ComputePointsMoveLists()
+
+    if logging.getLogger().isEnabledFor(logging.INFO):
+      logging.info('DPA Result movelist `%s`- MOVE_LIST:%s NBOR_LIST: %s',
+                   self.name,
+                   [set(self._grant_table.Grants(mask)) for mask in self._move_masks],
+                   [set(self._grant_table.Grants(mask)) for mask in self._nbor_masks])
+
+  def _ComputePointsMoveLists(self):
+    """Computes the move/neighbor lists from the per point move lists."""
     # Detect the inside "inside grants", which will allow to
     # add them into move list for sure later on.
-    inside_grants = set()
-    if self.geometry and not isinstance(self.geometry, sgeo.Point):
-      inside_grants = set(g for g in self._grants
-                          if sgeo.Point(g.longitude, g.latitude).intersects(self.geometry))
-
-    for chan_idx, (low_freq, high_freq) in enumerate(self._channels):
-      moveListConstraint = functools.partial(
-          ml.moveListConstraint,
-          low_freq=low_freq * 1.e6,
-          high_freq=high_freq * 1.e6,
-          grants=self._grants,
+    inside_mask = self._GetInsideMask(self._grants)
+    # Spatial index of the grants, shared by all points and channels, and sent
+    # only once to the worker processes.
+    with mpool.SharedPayloads() as shared:
+      common_params = dict(
+          grants=shared.Share(grant_index.GrantIndex(self._grant_table)),
           inc_ant_height=self.radar_height,
           num_iter=Dpa.num_iteration,
           threshold=self.threshold,
@@ -286,20 +389,190 @@ class Dpa(object):
           max_azimuth=self.azimuth_range[1],
           neighbor_distances=self.neighbor_distances)
 
-      move_list, nbor_list = list(
-          zip(*pool.map(moveListConstraint, self.protected_points)))
-      # Combine the individual point move lists
-      move_list = set().union(*move_list)
-      nbor_list = set().union(*nbor_list)
-      include_grants = ml.filterGrantsForFreqRange(
-          inside_grants, low_freq * 1.e6, high_freq * 1.e6)
-      move_list.update(include_grants)
-      nbor_list.update(include_grants)
-      self.move_lists[chan_idx] = move_list
-      self.nbor_lists[chan_idx] = nbor_list
-
-    logging.info('DPA Result movelist `%s`- MOVE_LIST:%s NBOR_LIST: %s',
-                 self.name, self.move_lists, self.nbor_lists)
+      if Dpa.share_path_loss and len(self._channels) > 1:
+        # All channels of a point at once, with shared path losses.
+        moveListConstraints = mpool.SharedPartial(
+            ml.moveListConstraints,
+            channels=[(low_freq * 1.e6, high_freq * 1.e6)
+                      for low_freq, high_freq in self._channels],
+            **common_params)
+        channels_lists = list(zip(*self._MapOnPoints(moveListConstraints)))
+      else:
+        channels_lists = [None] * len(self._channels)
+
+      for chan_idx, (low_freq, high_freq) in enumerate(self._channels):
+        if channels_lists[chan_idx] is None:
+          moveListConstraint = mpool.SharedPartial(
+              ml.moveListConstraint,
+              low_freq=low_freq * 1.e6,
+              high_freq=high_freq * 1.e6,
+              **common_params)
+          channels_lists[chan_idx] = self._MapOnPoints(moveListConstraint)
+
+        move_list, nbor_list = list(zip(*channels_lists[chan_idx]))
+        self._SetChannelLists(chan_idx, move_list, nbor_list, inside_mask)
+
+  def _ComputeIncrementalMoveLists(self):
+    """Computes the move/neighbor lists from incremental per point lists."""
+    with mpool.SharedPayloads() as shared:
+      buildMoveLists = mpool.SharedPartial(
+          ml.IncrementalMoveList,
+          channels=[(low_freq * 1.e6, high_freq * 1.e6)
+                    for low_freq, high_freq in self._channels],
+          grants=shared.Share(grant_index.GrantIndex(self._grant_table)),
+          inc_ant_height=self.radar_height,
+          num_iter=Dpa.num_iteration,
+          threshold=self.threshold,
+          beamwidth=self.beamwidth,
+          min_azimuth=self.azimuth_range[0],
+          max_azimuth=self.azimuth_range[1],
+          neighbor_distances=self.neighbor_distances,
+          share_path_loss=Dpa.share_path_loss)
+      self._incremental_move_lists = self._MapOnPoints(buildMoveLists)
+    self._inside_mask = self._GetInsideMask(self._grants)
+    # Per channel, the number of points having each grant in their lists.
+    self._move_counts = [np.zeros(len(self._grant_table), dtype=int)
+                         for _ in self._channels]
+    self._nbor_counts = [np.zeros(len(self._grant_table), dtype=int)
+                         for _ in self._channels]
+    for point_move_lists in self._incremental_move_lists:
+      for chan_idx in range(len(self._channels)):
+        self._CountListChange(self._move_counts[chan_idx], [],
+                              point_move_lists.move_lists[chan_idx])
+        self._CountListChange(self._nbor_counts[chan_idx], [],
+                              point_move_lists.nbor_lists[chan_idx])
+    for chan_idx in range(len(self._channels)):
+      self._SetIncrementalChannelLists(chan_idx)
+
+  def _GetInsideMask(self, grants):
+    """Returns the mask of the grants inside the DPA geometry."""
+    if not self.geometry or isinstance(self.geometry, sgeo.Point):
+      return np.zeros(len(grants), dtype=bool)
+    return np.array([sgeo.Point(grant.longitude, grant.latitude).intersects(
+        self.geometry) for grant in grants], dtype=bool)
+
+  def _GetIncludeMask(self, chan_idx, inside_mask):
+    """Returns the mask of the inside grants always in the lists of a channel."""
+    low_freq, high_freq = self._channels[chan_idx]
+    if ml.findDpaType(low_freq * 1.e6, high_freq * 1.e6) != ml.DpaType.OUT_OF_BAND:
+      return inside_mask & self._grant_table.FreqOverlapMask(
+          low_freq * 1.e6, high_freq * 1.e6)
+    return inside_mask
+
+  def _SetChannelLists(self, chan_idx, move_lists, nbor_lists, inside_mask):
+    """Sets the move/neighbor lists of a channel from the per point lists."""
+    # Combine the individual point move lists
+    move_mask = self._grant_table.Mask(set().union(*move_lists))
+    nbor_mask = self._grant_table.Mask(set().union(*nbor_lists))
+    include_mask = self._GetIncludeMask(chan_idx, inside_mask)
+    self._move_masks[chan_idx] = move_mask | include_mask
+    self._nbor_masks[chan_idx] = nbor_mask | include_mask
+
+  def _SetIncrementalChannelLists(self, chan_idx):
+    """Sets the move/neighbor lists of a channel from the per grant counts."""
+    include_mask = self._GetIncludeMask(chan_idx, self._inside_mask)
+    self._move_masks[chan_idx] = (self._move_counts[chan_idx] > 0) | include_mask
+    self._nbor_masks[chan_idx] = (self._nbor_counts[chan_idx] > 0) | include_mask
+
+  def _CountListChange(self, counts, old_grants, new_grants):
+    """Updates the per grant counts of points for a change of a point list."""
+    old_grants, new_grants = set(old_grants), set(new_grants)
+    np.add.at(counts, self._grant_table.Ids(new_grants - old_grants), 1)
+    np.subtract.at(counts, self._grant_table.Ids(old_grants - new_grants), 1)
+
+  def UpdateGrants(self, added_grants, removed_grants):
+    """Updates incrementally the move/neighbor lists for a change of grants.
+
+    Requires the lists to have been computed with
+    `ComputeMoveLists(incremental=True)`, which keeps for each protected point
+    its sorted interference matrices (see |move_list.IncrementalMoveList|).
+    On each call, the interference is computed only for the new grants, and the
+    move list is found again only for the (point, channel) whose neighbor list
+    has changed. The grant table and the lists masks are updated only for the
+    added and removed grants, and only the channels with a changed point list
+    (or new grants inside the DPA) are combined again.
+    As in `ComputeMoveLists()`, the path losses of a CBSD are shared by all
+    channels only if `Dpa.share_path_loss` is set.
+    Note that the incremental state is held in memory of the main process, and
+    is discarded when the grants or channels are reset.
+
+    Args:
+      added_grants: An iterable of |data.CbsdGrantInfo| grants to add.
+      removed_grants: An iterable of |data.CbsdGrantInfo| grants to remove.
+
+    Returns:
+      The changes of the move lists, as a dict {channel: (entered, left)} of
+      the channels whose move list changed, where `entered` and `left` are the
+      sets of grants entering and leaving the move list of that channel.
+
+    Raises:
+      ValueError: if the lists were not computed with
+        `ComputeMoveLists(incremental=True)`.
+    """
+    if self._incremental_move_lists is None:
+      raise ValueError('DPA `%s` has no incremental move lists: call '
+                       'ComputeMoveLists(incremental=True) first.' % self.name)
+    added_grants = list(added_grants)
+    removed_grants = list(removed_grants)
+    num_added = len(added_grants)
+    removed_ids = np.unique(self._grant_table.Ids(removed_grants))
+    def UpdatedRows(values, added_values):
+      # Converts an array over the grant table into the updated table.
+      return np.concatenate((np.delete(values, removed_ids), added_values))
+
+    # The removed grants leaving the move lists, and the previous lists over
+    # the updated grant table.
+    left_removed = [set(self._grant_table.Grants(removed_ids[mask[removed_ids]]))
+                    for mask in self._move_masks]
+    old_move_masks = [UpdatedRows(mask, np.zeros(num_added, dtype=bool))
+                      for mask in self._move_masks]
+    self._move_masks = list(old_move_masks)
+    self._nbor_masks = [UpdatedRows(mask, np.zeros(num_added, dtype=bool))
+                        for mask in self._nbor_masks]
+    self._move_counts = [UpdatedRows(counts, np.zeros(num_added, dtype=int))
+                         for counts in self._move_counts]
+    self._nbor_counts = [UpdatedRows(counts, np.zeros(num_added, dtype=int))
+                         for counts in self._nbor_counts]
+    added_inside_mask = self._GetInsideMask(added_grants)
+    self._inside_mask = UpdatedRows(self._inside_mask, added_inside_mask)
+    self._grant_table = self._grant_table.Updated(added_grants, removed_ids)
+    self._grants = self._grant_table.Grants()
+    self._has_th_grants = self._DetectIfPeerSas()
+    self._move_lists = None
+    self._nbor_lists = None
+
+    updated_chan_idxs = set()
+    for point_move_lists in self._incremental_move_lists:
+      old_move_lists = list(point_move_lists.move_lists)
+      old_nbor_lists = list(point_move_lists.nbor_lists)
+      for chan_idx in point_move_lists.Update(added_grants, removed_grants):
+        self._CountListChange(self._move_counts[chan_idx],
+                              old_move_lists[chan_idx],
+                              point_move_lists.move_lists[chan_idx])
+        self._CountListChange(self._nbor_counts[chan_idx],
+                              old_nbor_lists[chan_idx],
+                              point_move_lists.nbor_lists[chan_idx])
+        updated_chan_idxs.add(chan_idx)
+    combined_chan_idxs = set(updated_chan_idxs)
+    if np.any(added_inside_mask):
+      combined_chan_idxs.update(range(len(self._channels)))
+    for chan_idx in combined_chan_idxs:
+      self._SetIncrementalChannelLists(chan_idx)
+
+    changes = {}
+    for chan_idx, channel in enumerate(self._channels):
+      entered, left = set(), left_removed[chan_idx]
+      if chan_idx in combined_chan_idxs:
+        new_mask, old_mask = self._move_masks[chan_idx], old_move_masks[chan_idx]
+        entered = set(self._grant_table.Grants(new_mask & ~old_mask))
+        left = left | set(self._grant_table.Grants(old_mask & ~new_mask))
+      if entered or left:
+        changes[channel] = (entered, left)
+    logging.info('DPA Update movelist `%s`- %d added %d removed grants: '
+                 'channels updated %s, changes %s',
+                 self.name, len(added_grants), len(removed_grants),
+                 sorted(updated_chan_idxs), changes)
+    return changes
 
   def _GetChanIdx(self, channel):
     """Gets the channel idx for a given channel."""
@@ -315,7 +588,10 @@ class Dpa(object):
     Args:
       channel: A channel as tuple (low_freq_mhz, high_freq_mhz).
     """
-    return self.move_lists[self._GetChanIdx(channel)]
+    chan_idx = self._GetChanIdx(channel)
+    if self._move_lists is not None:
+      return self._move_lists[chan_idx]
+    return set(self._grant_table.Grants(self._move_masks[chan_idx]))
 
   def GetNeighborList(self, channel):
     """Returns the neighbor list for a given channel, as a set of grants.
@@ -323,7 +599,10 @@ class Dpa(object):
     Args:
       channel: A channel as tuple (low_freq_mhz, high_freq_mhz).
     """
-    return self.nbor_lists[self._GetChanIdx(channel)]
+    chan_idx = self._GetChanIdx(channel)
+    if self._nbor_lists is not None:
+      return self._nbor_lists[chan_idx]
+    return set(self._grant_table.Grants(self._nbor_masks[chan_idx]))
 
   def GetKeepList(self, channel):
     """Returns the keep list for a given channel, as a set of grants.
@@ -331,7 +610,13 @@ class Dpa(object):
     Args:
       channel: A channel as tuple (low_freq_mhz, high_freq_mhz).
     """
-    return self.GetNeighborList(channel).difference(self.GetMoveList(channel))
+    if self._move_lists is not None or self._nbor_lists is not None:
+      return self.GetNeighborList(channel).difference(self.GetMoveList(channel))
+    return set(self._grant_table.Grants(self._GetKeepMask(self._GetChanIdx(channel))))
+
+  def _GetKeepMask(self, chan_idx):
+    """Returns the keep list of a channel as a mask over the grant table."""
+    return self._GetNeighborMask(chan_idx) & ~self._GetMoveMask(chan_idx)
 
   def GetMoveListMask(self, channel):
     """Returns move list mask as a vector of bool.
@@ -340,12 +625,7 @@ class Dpa(object):
       channel: A channel as tuple (low_freq_mhz, high_freq_mhz).
     """
     # Legacy function for getting a mask, as used in some example code.
-    move_list = self.GetMoveList(channel)
-    mask = np.zeros(len(self._grants), np.bool)
-    for k, grant in enumerate(self._grants):
-      if grant in move_list:
-        mask[k] = True
-    return mask
+    return self._GetMoveMask(self._GetChanIdx(channel)).copy()
 
   def CalcKeepListInterference(self, channel, num_iter=None):
     """Calculates max aggregate interference per protected point.
@@ -362,22 +642,21 @@ class Dpa(object):
     if num_iter is None:
       num_iter = Dpa.num_iteration
     keep_list = self.GetKeepList(channel)
-    interfCalculator = functools.partial(
-        ml.calcAggregatedInterference,
-        low_freq=channel[0] * 1e6,
-        high_freq=channel[1] * 1e6,
-        grants=keep_list,
-        inc_ant_height=self.radar_height,
-        num_iter=num_iter,
-        beamwidth=self.beamwidth,
-        min_azimuth=self.azimuth_range[0],
-        max_azimuth=self.azimuth_range[1],
-        neighbor_distances=self.neighbor_distances,
-        do_max=True)
-
-    pool = mpool.Pool()
-    max_interf = pool.map(interfCalculator,
-                          self.protected_points)
+    with mpool.SharedPayloads() as shared:
+      interfCalculator = mpool.SharedPartial(
+          ml.calcAggregatedInterference,
+          low_freq=channel[0] * 1e6,
+          high_freq=channel[1] * 1e6,
+          grants=shared.Share(keep_list),
+          inc_ant_height=self.radar_height,
+          num_iter=num_iter,
+          beamwidth=self.beamwidth,
+          min_azimuth=self.azimuth_range[0],
+          max_azimuth=self.azimuth_range[1],
+          neighbor_distances=self.neighbor_distances,
+          do_max=True)
+
+      max_interf = self._MapOnPoints(interfCalculator)
     return max_interf
 
   def CheckInterference(self, sas_uut_active_grants, margin_db,
@@ -424,48 +703,75 @@ class Dpa(object):
       True if all SAS UUT aggregated interference are within margin, False otherwise
       (ie if at least one combined protection point / azimuth fails the test).
     """
+    if num_iter is None:
+      num_iter = Dpa.num_iteration
+    margin_method, margin_db = _ParseMarginDb(margin_db)
+
     if channel is None:
-      test_passed = True
+      channels = self._channels
       if output_data == []:
         output_data.extend([[]] * len(self._channels))
       else:
         output_data = [None] * len(self._channels)
-      for k, chan in enumerate(self._channels):
-        if not self.CheckInterference(sas_uut_active_grants, margin_db, chan, num_iter,
-                                      do_abs_check_single_uut, extensive_print,
-                                      output_data[k]):
-          test_passed = False
-      return test_passed
-
-    if num_iter is None:
-      num_iter = Dpa.num_iteration
-
-    # Manages the various margin_db methods.
-    margin_method = 'std'
-    if isinstance(margin_db, six.string_types):
-      idx1, idx2 = margin_db.find('('), margin_db.find(')')
-      if idx1 == -1 or idx2 == -1:
-        raise ValueError('DPA CheckInterference: margin_db: `%s` not allowed.'
-                         'Use a number,  the `target(xx)` or `linear(xx)` options' %
-                         margin_db)
-      margin_method = margin_db[:idx1].strip().lower()
-      if margin_method not in ['target', 'linear']:
-        raise ValueError('DPA CheckInterference: margin_db method: `%s` not allowed.'
-                         'Use either `target(xx)` or `linear(xx)` options' % margin_method)
-      margin_db = float(margin_db[idx1+1:idx2].strip())
-
-    # Find the keep list component of TH: SAS UUT and peer SASes.
-    keep_list = self.GetKeepList(channel)
-    keep_list_th_other_sas = [
-        grant for grant in self._grants
-        if (not grant.is_managed_grant and grant in keep_list)]
-    keep_list_th_managing_sas = [
-        grant for grant in self._grants
-        if (grant.is_managed_grant and grant in keep_list)]
+    else:
+      channels = [channel]
+      output_data = [output_data]
 
     # Makes sure we have a list of SAS UUT active grants
     sas_uut_active_grants = list(sas_uut_active_grants)
 
+    # Parameters of the per point check for each channel.
+    channels_params = [
+        self._GetCheckParams(sas_uut_active_grants, chan, margin_method, num_iter,
+                             do_abs_check_single_uut, extensive_print)
+        for chan in channels]
+
+    with mpool.SharedPayloads() as shared:
+      # The grant lists are sent only once to the worker processes.
+      if Dpa.share_path_loss and len(channels) > 1:
+        # All channels of a point at once, with shared path losses.
+        checkPointInterfs = mpool.SharedPartial(
+            _CalcTestPointInterfDiffChannels,
+            channels_params=shared.Share(channels_params))
+        channels_result = [list(result) for result in
+                           zip(*self._MapOnPoints(checkPointInterfs))]
+      else:
+        uut_grants = shared.Share(sas_uut_active_grants)
+        channels_result = []
+        for params in channels_params:
+          checkPointInterf = mpool.SharedPartial(
+              _CalcTestPointInterfDiff,
+              **dict(params,
+                     keep_list_th_other_sas=shared.Share(
+                         params['keep_list_th_other_sas']),
+                     keep_list_th_managing_sas=shared.Share(
+                         params['keep_list_th_managing_sas']),
+                     keep_list_uut_managing_sas=uut_grants))
+          channels_result.append(self._MapOnPoints(checkPointInterf))
+
+    test_passed = True
+    for chan, params, result, chan_output_data in zip(
+        channels, channels_params, channels_result, output_data):
+      if chan_output_data == []:
+        chan_output_data.extend(result)
+      if not self._CheckResult(result, chan, margin_method, margin_db,
+                               params['threshold'], extensive_print):
+        test_passed = False
+    return test_passed
+
+  def _GetCheckParams(self, sas_uut_active_grants, channel, margin_method,
+                      num_iter, do_abs_check_single_uut, extensive_print):
+    """Returns the parameters of `_CalcTestPointInterfDiff` for a channel.
+
+    See `CheckInterference()` for the arguments.
+    """
+    # Find the keep list component of TH: SAS UUT and peer SASes.
+    keep_mask = self._GetKeepMask(self._GetChanIdx(channel))
+    keep_list_th_other_sas = self._grant_table.Grants(
+        keep_mask & ~self._grant_table.is_managed_grant)
+    keep_list_th_managing_sas = self._grant_table.Grants(
+        keep_mask & self._grant_table.is_managed_grant)
+
     if extensive_print:
       # Derive the estimated SAS UUT keep list, ie the SAS UUT active grants
       # within the neighborhood (defined by distance and frequency). This is
@@ -496,25 +802,26 @@ class Dpa(object):
                  ('`MoveList`' if margin_method == 'std' else 'MoveList + Linear'),
                  self.beamwidth, num_iter, self.azimuth_range, self.neighbor_distances)
 
-    checkPointInterf = functools.partial(
-        _CalcTestPointInterfDiff,
-        channel=channel,
-        keep_list_th_other_sas=keep_list_th_other_sas,
-        keep_list_th_managing_sas=keep_list_th_managing_sas,
-        keep_list_uut_managing_sas=sas_uut_active_grants,
-        radar_height=self.radar_height,
-        beamwidth=self.beamwidth,
-        num_iter=num_iter,
-        azimuth_range=self.azimuth_range,
-        neighbor_distances=self.neighbor_distances,
-        threshold=hard_threshold
-    )
-    pool = mpool.Pool()
-    result = pool.map(checkPointInterf, self.protected_points)
+    return dict(channel=channel,
+                keep_list_th_other_sas=keep_list_th_other_sas,
+                keep_list_th_managing_sas=keep_list_th_managing_sas,
+                keep_list_uut_managing_sas=sas_uut_active_grants,
+                radar_height=self.radar_height,
+                beamwidth=self.beamwidth,
+                num_iter=num_iter,
+                azimuth_range=self.azimuth_range,
+                neighbor_distances=self.neighbor_distances,
+                threshold=hard_threshold)
 
-    if output_data == []:
-      output_data.extend(result)
+  def _CheckResult(self, result, channel, margin_method, margin_db,
+                   hard_threshold, extensive_print):
+    """Checks the per point interference results of a channel.
 
+    See `CheckInterference()` for the arguments.
+
+    Returns:
+      True if all SAS UUT aggregated interference are within margin.
+    """
     margin_mw = None  # for standard or target method
     if margin_method == 'linear':  # linear method
       margin_mw = Db2Lin(self.threshold + margin_db) - Db2Lin(self.threshold)
@@ -550,7 +857,6 @@ class Dpa(object):
 
       return max_diff_interf_mw <= margin_mw
 
-
   def __PrintStatistics(self, results, dpa_name, channel, threshold, margin_mw=None):
     """Prints result statistics."""
     timestamp = datetime.now().strftime('%Y-%m-%d %H_%M_%S')
@@ -678,6 +984,42 @@ def GetDpaProtectedChannels(freq_ranges_mhz, is_portal_dpa=False):
   return channels
 
 
+def _ParseMarginDb(margin_db):
+  """Parses the `margin_db` of `Dpa.CheckInterference()`.
+
+  Returns:
+    A tuple (margin_method, margin_db) where the method is one of 'std', 'target'
+    or 'linear'.
+  """
+  margin_method = 'std'
+  if isinstance(margin_db, six.string_types):
+    idx1, idx2 = margin_db.find('('), margin_db.find(')')
+    if idx1 == -1 or idx2 == -1:
+      raise ValueError('DPA CheckInterference: margin_db: `%s` not allowed.'
+                       'Use a number,  the `target(xx)` or `linear(xx)` options' %
+                       margin_db)
+    margin_method = margin_db[:idx1].strip().lower()
+    if margin_method not in ['target', 'linear']:
+      raise ValueError('DPA CheckInterference: margin_db method: `%s` not allowed.'
+                       'Use either `target(xx)` or `linear(xx)` options' % margin_method)
+    margin_db = float(margin_db[idx1+1:idx2].strip())
+  return margin_method, margin_db
+
+
+@contextlib.contextmanager
+def _InterferenceDrawsReuse(path_losses):
+  """Context reusing the random draws of each CBSD grant across calculations.
+
+  The caching engine is used, unless the path losses are shared per CBSD link
+  with the `path_losses` dict, or the deterministic random streams are used.
+  """
+  if path_losses is None and ml.GetRandomStreamsSeed() is None:
+    with ml.InterferenceCacheManager():
+      yield
+  else:
+    yield
+
+
 def _CalcTestPointInterfDiff(point,
                              channel,
                              keep_list_th_other_sas,
@@ -688,7 +1030,8 @@ def _CalcTestPointInterfDiff(point,
                              num_iter,
                              azimuth_range,
                              neighbor_distances,
-                             threshold=None):
+                             threshold=None,
+                             path_losses=None):
   """Calculate difference of aggregate interference between reference and SAS UUT.
 
   This implements the check required by the IPR certification tests, comparing the
@@ -702,7 +1045,10 @@ def _CalcTestPointInterfDiff(point,
 
   Note that this routine reduce the amount of random variation by reusing the same
   random draw for the CBSD that are shared between the two keep lists. This is done
-  by using the caching engine provided by |reference_models.common.cache|.
+  by using the caching engine provided by |reference_models.common.cache|, or
+  by sharing the Monte Carlo path losses of each CBSD link if `path_losses` is
+  set. With the deterministic random streams (see `Dpa.Configure()`), the same
+  draws are regenerated for each CBSD link, and no caching is needed.
 
   Args:
     point: A point having attributes 'latitude' and 'longitude'.
@@ -722,6 +1068,10 @@ def _CalcTestPointInterfDiff(point,
       [cata_dist, catb_dist, cata_oob_dist, catb_oob_dist]
     threshold: If set, do an absolute threshold check of SAS UUT interference against
       threshold. Otherwise compare against the reference model aggregated interference.
+    path_losses: An optional dict for sharing the Monte Carlo path losses of the
+      CBSDs to the point with other calls (see `ml.moveListConstraint()`). If
+      set, it is used instead of the caching engine for reusing the same random
+      draws.
 
   Returns:
     The maximum aggregated difference across all the radar pointing directions between
@@ -732,7 +1082,7 @@ def _CalcTestPointInterfDiff(point,
   # variability on similar CBSD in keep list.
   # TODO(sbdt): check if better to context manage once per process, with clearing
   # in between.
-  with ml.InterferenceCacheManager() as cm:
+  with _InterferenceDrawsReuse(path_losses):
     uut_interferences = ml.calcAggregatedInterference(
         point,
         low_freq=channel[0] * 1e6,
@@ -743,7 +1093,8 @@ def _CalcTestPointInterfDiff(point,
         beamwidth=beamwidth,
         min_azimuth=azimuth_range[0],
         max_azimuth=azimuth_range[1],
-        neighbor_distances=neighbor_distances)
+        neighbor_distances=neighbor_distances,
+        path_losses=path_losses)
     if threshold is not None:
       max_diff = np.max(uut_interferences - threshold)
       logging.debug('%s UUT interf @ %s Thresh %sdBm Diff %sdB: %s',
@@ -768,7 +1119,8 @@ def _CalcTestPointInterfDiff(point,
         beamwidth=beamwidth,
         min_azimuth=azimuth_range[0],
         max_azimuth=azimuth_range[1],
-        neighbor_distances=neighbor_distances)
+        neighbor_distances=neighbor_distances,
+        path_losses=path_losses)
 
     max_diff = np.max(uut_interferences - th_interferences)
     logging.debug(
@@ -791,6 +1143,26 @@ def _CalcTestPointInterfDiff(point,
 
 
 
+def _CalcTestPointInterfDiffChannels(point, channels_params):
+  """Calculate difference of aggregate interference for several channels.
+
+  This is similar to calling `_CalcTestPointInterfDiff()` for each channel, except
+  that the Monte Carlo path losses of each CBSD to the point are computed only once
+  and shared by all the channels.
+
+  Args:
+    point: A point having attributes 'latitude' and 'longitude'.
+    channels_params: A list of dict holding the other arguments of
+      `_CalcTestPointInterfDiff()`, one per channel.
+
+  Returns:
+    A list of |DpaInterferenceResult|, one per channel.
+  """
+  path_losses = {}
+  return [_CalcTestPointInterfDiff(point, path_losses=path_losses, **params)
+          for params in channels_params]
+
+
 def BuildDpa(dpa_name, protection_points_method=None, portal_dpa_filename=None):
   """Builds a DPA parameterized correctly.
 
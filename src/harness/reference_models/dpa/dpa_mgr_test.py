@@ -28,7 +28,9 @@ import numpy as np
 import shapely.geometry as sgeo
 
 from reference_models.common import data
+from reference_models.common import mpool
 from reference_models.dpa import dpa_mgr
+from reference_models.dpa import move_list as ml
 from reference_models.geo import zones
 from reference_models.propagation import wf_itm
 from reference_models.tools import entities
@@ -49,9 +51,12 @@ class TestDpa(unittest.TestCase):
     self.temp_dir = tempfile.mkdtemp()
     self.orig_dpa_log_dir = dpa_mgr.GetDpaLogDir
     dpa_mgr.GetDpaLogDir = lambda: self.temp_dir
+    # The tests replace the ITM model.
+    ml.SetBatchedLinks(False)
 
   def tearDown(self):
     dpa_mgr.GetDpaLogDir = self.orig_dpa_log_dir
+    ml.SetBatchedLinks(True)
     shutil.rmtree(self.temp_dir, ignore_errors=True)
 
   def test_channelization(self):
@@ -143,6 +148,168 @@ class TestDpa(unittest.TestCase):
                                     extensive_print=True)
     self.assertEqual(result, False)
 
+  def test_configureSampling(self):
+    self.addCleanup(dpa_mgr.Dpa.Configure)
+    dpa_mgr.Dpa.Configure(num_iteration=300, sampling='lhs')
+    self.assertEqual(dpa_mgr.Dpa.num_iteration, 300)
+    self.assertEqual(dpa_mgr.Dpa.sampling, 'lhs')
+    self.assertEqual(ml._sampling_strategy, 'lhs')
+    with self.assertRaises(ValueError):
+      dpa_mgr.Dpa.Configure(sampling='sobol')
+    dpa_mgr.Dpa.Configure()
+    self.assertEqual(ml._sampling_strategy, 'uniform')
+
+  def test_configureSeed(self):
+    self.addCleanup(dpa_mgr.Dpa.Configure)
+    dpa_mgr.Dpa.Configure(seed=12345)
+    self.assertEqual(dpa_mgr.Dpa.seed, 12345)
+    self.assertEqual(ml._random_streams_seed, 12345)
+    dpa_mgr.Dpa.Configure()
+    self.assertIsNone(dpa_mgr.Dpa.seed)
+    self.assertIsNone(ml._random_streams_seed)
+
+  def test_checkInterfSameDraws(self):
+    self.addCleanup(setattr, wf_itm, 'CalcItmPropagationLoss',
+                    wf_itm.CalcItmPropagationLoss)
+    self.addCleanup(ml.SetRandomStreamsSeed, None)
+    fake_itm = testutils.FakePropagationPredictor(
+        dist_type='REAL', factor=1.0, offset=(144+30-0.1) - 20.0)
+    def reliabilityItm(*args, **kwargs):
+      reliabilities = np.asarray(kwargs['reliability'])
+      result = fake_itm(*args, **kwargs)
+      return result._replace(db_loss=result.db_loss + 5 * np.log(
+          reliabilities / (1 - reliabilities)))
+    wf_itm.CalcItmPropagationLoss = reliabilityItm
+    np.random.seed(1248)
+    grants = entities.ConvertToCbsdGrantInfo(
+        entities.GenerateCbsdList(
+            10, template_cbsd=entities.CBSD_TEMPLATE_CAT_A_OUTDOOR,
+            ref_latitude=36.815, ref_longitude=-76.292,
+            min_distance_km=10, max_distance_km=50),
+        min_freq_mhz=3550,
+        max_freq_mhz=3560)
+    point = ProtectionPoint(latitude=36.815, longitude=-76.292)
+    # Same grants in both keep lists give the same random draws.
+    for seed in [None, 12345]:
+      ml.SetRandomStreamsSeed(seed)
+      result = dpa_mgr._CalcTestPointInterfDiff(
+          point, (3550, 3560), grants[:3], grants[3:], grants[:2:-1],
+          radar_height=50, beamwidth=3, num_iter=100, azimuth_range=(0, 360),
+          neighbor_distances=(150, 190, 0, 25))
+      self.assertAlmostEqual(result.max_difference, 0, 10)
+
+  def test_updateGrants(self):
+    self.addCleanup(setattr, wf_itm, 'CalcItmPropagationLoss',
+                    wf_itm.CalcItmPropagationLoss)
+    # Configuring for -144dBm circle at 20km
+    wf_itm.CalcItmPropagationLoss = testutils.FakePropagationPredictor(
+        dist_type='REAL', factor=1.0, offset=(144+30-0.1) - 20.0)
+    protection_points = [ProtectionPoint(latitude=36.815, longitude=-76.292),
+                         ProtectionPoint(latitude=36.9, longitude=-76.292)]
+    geometry = sgeo.Polygon([(-76.3, 36.81), (-76.28, 36.81),
+                             (-76.28, 36.91), (-76.3, 36.91)])
+    def buildDpa():
+      return dpa_mgr.Dpa(protection_points,
+                         geometry=geometry,
+                         name='test(Incremental)',
+                         threshold=-144,
+                         beamwidth=3,
+                         radar_height=50,
+                         neighbor_distances=(150, 190, 0, 25),
+                         freq_ranges_mhz=[(3550, 3570)])
+    np.random.seed(1248)
+    grants = entities.ConvertToCbsdGrantInfo(
+        entities.GenerateCbsdList(
+            30, template_cbsd=entities.CBSD_TEMPLATE_CAT_A_OUTDOOR,
+            ref_latitude=36.815, ref_longitude=-76.292,
+            min_distance_km=10, max_distance_km=50),
+        min_freq_mhz=3550,
+        max_freq_mhz=3560)
+    # A low power grant inside the DPA.
+    inside_grant = grants[0]._replace(latitude=36.85, longitude=-76.29,
+                                      max_eirp=-100)
+    dpa = buildDpa()
+    dpa.SetGrantsFromList(grants[:20])
+    dpa.ComputeMoveLists()
+    # Requires the incremental state.
+    self.assertRaises(ValueError, dpa.UpdateGrants, [], [])
+    expected_dpa = buildDpa()
+    expected_dpa.SetGrantsFromList(grants[:20])
+    expected_dpa.ComputeMoveLists()
+    dpa.ComputeMoveLists(incremental=True)
+    for channel in [(3550, 3560), (3560, 3570)]:
+      self.assertSetEqual(dpa.GetMoveList(channel),
+                          expected_dpa.GetMoveList(channel))
+      self.assertSetEqual(dpa.GetNeighborList(channel),
+                          expected_dpa.GetNeighborList(channel))
+    self.assertEqual(dpa.UpdateGrants([], []), {})
+    initial_move_list = dpa.GetMoveList((3550, 3560))
+    self.assertTrue(initial_move_list)
+
+    added = grants[20:] + [inside_grant]
+    removed = grants[:5]
+    changes = dpa.UpdateGrants(added, removed)
+    final_grants = grants[5:] + [inside_grant]
+    expected_dpa = buildDpa()
+    expected_dpa.SetGrantsFromList(final_grants)
+    expected_dpa.ComputeMoveLists()
+    for channel in [(3550, 3560), (3560, 3570)]:
+      self.assertSetEqual(dpa.GetMoveList(channel),
+                          expected_dpa.GetMoveList(channel))
+      self.assertSetEqual(dpa.GetNeighborList(channel),
+                          expected_dpa.GetNeighborList(channel))
+    move_list = dpa.GetMoveList((3550, 3560))
+    self.assertIn(inside_grant, move_list)
+    self.assertListEqual(list(changes), [(3550, 3560)])
+    entered, left = changes[(3550, 3560)]
+    self.assertSetEqual(entered, move_list - initial_move_list)
+    self.assertSetEqual(left, initial_move_list - move_list)
+
+  def test_updateGrantsRandomDraws(self):
+    self.addCleanup(setattr, wf_itm, 'CalcItmPropagationLoss',
+                    wf_itm.CalcItmPropagationLoss)
+    fake_itm = testutils.FakePropagationPredictor(
+        dist_type='REAL', factor=1.0, offset=(144+30-0.1) - 20.0)
+    def reliabilityItm(*args, **kwargs):
+      reliabilities = np.asarray(kwargs['reliability'])
+      result = fake_itm(*args, **kwargs)
+      return result._replace(db_loss=result.db_loss + 10 * np.log(
+          reliabilities / (1 - reliabilities)))
+    wf_itm.CalcItmPropagationLoss = reliabilityItm
+    # Few Monte Carlo iterations, for noisy move lists.
+    self.addCleanup(dpa_mgr.Dpa.Configure)
+    dpa_mgr.Dpa.Configure(num_iteration=20)
+    dpa = dpa_mgr.Dpa([ProtectionPoint(latitude=36.815, longitude=-76.292)],
+                      name='test(Incremental)',
+                      threshold=-144,
+                      beamwidth=3,
+                      radar_height=50,
+                      neighbor_distances=(150, 190, 0, 25),
+                      freq_ranges_mhz=[(3550, 3560)])
+    np.random.seed(1248)
+    grants = entities.ConvertToCbsdGrantInfo(
+        entities.GenerateCbsdList(
+            40, template_cbsd=entities.CBSD_TEMPLATE_CAT_A_OUTDOOR,
+            ref_latitude=36.815, ref_longitude=-76.292,
+            min_distance_km=20, max_distance_km=60),
+        min_freq_mhz=3550,
+        max_freq_mhz=3560)
+    dpa.SetGrantsFromList(grants[:30])
+    dpa.ComputeMoveLists(incremental=True)
+    self.assertDictEqual(mpool._shared_payloads, {})
+    self.assertEqual(dpa.UpdateGrants([], []), {})
+    initial_move_list = dpa.GetMoveList((3550, 3560))
+    self.assertTrue(initial_move_list)
+
+    changes = dpa.UpdateGrants(grants[30:], grants[:5])
+    # The shared grants are released after use.
+    self.assertDictEqual(mpool._shared_payloads, {})
+    move_list = dpa.GetMoveList((3550, 3560))
+    entered, left = changes[(3550, 3560)]
+    self.assertSetEqual(entered, move_list - initial_move_list)
+    self.assertSetEqual(left, initial_move_list - move_list)
+    self.assertFalse(move_list & set(grants[:5]))
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -31,18 +31,23 @@
 #
 # The main routines are:
 #   - 'moveListConstraint()': calculates the move list for one point
+#   - 'moveListConstraints()': calculates the move lists of all channels for one point
 #   - 'calcAggregatedInterference()': calculates the 95% quantile interference for one point
+#   - 'calcInterferenceConvergence()': reports the Monte Carlo convergence of the
+#      95% quantile interference for one point
 #==================================================================================
 
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-from collections import namedtuple, defaultdict
+from collections import namedtuple, defaultdict, OrderedDict
 from enum import Enum
 import functools
 from functools import partial
+import hashlib
 import logging
+import math
 
 import numpy as np
 import shapely.geometry as sgeo
@@ -57,8 +62,10 @@ from reference_models.antenna import antenna
 from reference_models.common import cache
 from reference_models.common import data
 from reference_models.common import data
+from reference_models.common import grant_index
 from reference_models.common import mpool
 from reference_models.geo import drive
+from reference_models.geo import tiles
 from reference_models.geo import vincenty
 from reference_models.propagation import wf_itm
 
@@ -80,6 +87,257 @@ OOB_POWER_WITHIN_10MHZ = -13
 OOB_POWER_OUTSIDE_10MHZ = -25
 OOB_POWER_BELOW_3530MHZ = -40
 
+# Number of links computed in one batch by the propagation model
+_LINKS_BATCH_SIZE = 256
+
+# Batched link mode: the path losses of the links are computed in batches with
+# `wf_itm.CalcItmPropagationLossMulti()`, and their terrain tiles prefetched.
+_batched_links = True
+
+# Relative rounding error bound (per summed term) of the aggregate interference
+# computed by cumulative sums or matrix products, compared to the direct sum of
+# contributions.
+_SUM_REL_ERROR = 4 * np.finfo(float).eps
+
+# Batched azimuth mode: the aggregate interference of all radar azimuths is
+# computed with a single matrix product with the (azimuth x grant) gain matrix.
+# Note: the product is done with `np.einsum()` which does not depend on the BLAS
+# library.
+_batched_azimuth_gains = False
+
+
+def SetBatchedAzimuthGains(on):
+  """Activates/Deactivates the batched azimuth mode. By default it is OFF.
+
+  In this mode, the aggregate interference for all radar azimuths is computed
+  with a single matrix product instead of one pass per azimuth.
+  The move lists are unchanged, while the aggregate interference returned by
+  `calcAggregatedInterference()` can differ from the per azimuth computation
+  by rounding errors.
+
+  Shall be called in the main process and in each worker process, for example
+  using `mpool.RunOnEachWorkerProcess(move_list.SetBatchedAzimuthGains, True)`,
+  unless the worker processes are created after this call.
+  """
+  global _batched_azimuth_gains
+  _batched_azimuth_gains = on
+
+
+def SetBatchedLinks(on):
+  """Activates/Deactivates the batched link mode. By default it is ON.
+
+  In this mode, the path losses of the links are computed in batches with
+  `wf_itm.CalcItmPropagationLossMulti()` instead of one call per link to
+  `wf_itm.CalcItmPropagationLoss()`, and the terrain tiles of the links are
+  prefetched in background.
+  It shall be deactivated when replacing `wf_itm.CalcItmPropagationLoss()`,
+  for example by a fake model in tests.
+  """
+  global _batched_links
+  _batched_links = on
+
+
+# Sampling strategies of the Monte Carlo random reliabilities of each link:
+#  - 'uniform': independent uniform draws (reference method).
+#  - 'lhs': Latin hypercube sampling, the dimensions being the links: the K
+#    draws of each link are stratified (one draw per 1/K reliability interval),
+#    in a random order independent of the other links. As the aggregate
+#    interference is a sum of per-link contributions, this reduces the Monte
+#    Carlo noise of its 95% quantile for a given number of iterations.
+SAMPLING_STRATEGIES = ('uniform', 'lhs')
+_sampling_strategy = 'uniform'
+
+
+def SetSamplingStrategy(sampling):
+  """Sets the sampling strategy of the Monte Carlo reliabilities.
+
+  Shall be called in the main process and in each worker process, for example
+  using `mpool.RunOnEachWorkerProcess(move_list.SetSamplingStrategy, 'lhs')`,
+  unless the worker processes are created after this call.
+
+  Inputs:
+    sampling: One of `SAMPLING_STRATEGIES`. Default is 'uniform'.
+  """
+  if sampling not in SAMPLING_STRATEGIES:
+    raise ValueError('Unsupported sampling strategy: %s' % sampling)
+  global _sampling_strategy
+  _sampling_strategy = sampling
+
+
+# Deterministic random streams: when a seed is set, the reliabilities of each
+# grant are drawn from a counter-based Philox generator keyed by a hash of the
+# seed, the grant and the protection constraint (see `_randomStreamKey()`),
+# instead of the global `np.random` state. The draws of a grant can then be
+# regenerated identically in any process and in any order, making the results
+# independent of the worker pool and scheduling, and the same draws are used
+# for a grant in all the calls (for example for the grants common to the SAS UUT
+# and reference keep lists).
+_random_streams_seed = None
+
+
+def SetRandomStreamsSeed(seed):
+  """Sets the seed of the deterministic random streams, or None to deactivate.
+
+  Shall be called in the main process and in each worker process, for example
+  using `mpool.RunOnEachWorkerProcess(move_list.SetRandomStreamsSeed, 12345)`,
+  unless the worker processes are created after this call.
+
+  Inputs:
+    seed: An integer seed, or None (default) for drawing from `np.random`.
+  """
+  global _random_streams_seed
+  _random_streams_seed = seed
+
+
+def GetRandomStreamsSeed():
+  """Returns the seed of the deterministic random streams, or None if not used."""
+  return _random_streams_seed
+
+
+def _randomStreamKey(grant, constraint, inc_ant_height, num_iteration,
+                     share_path_loss=False):
+  """Returns the key of the random stream of a grant to the constraint c.
+
+  Each grant has its own stream for each protection point and channel, unless
+  `share_path_loss` is set, in which case the stream is keyed on the link only
+  (see `_pathLossKey()`), as the path losses are shared by all the grants of a
+  CBSD and all channels. Returns None if the deterministic random streams are
+  not activated.
+  """
+  if _random_streams_seed is None:
+    return None
+  link_key = _pathLossKey(grant, constraint, inc_ant_height, num_iteration)
+  if share_path_loss:
+    return link_key
+  return link_key + tuple(grant) + (constraint.low_frequency,
+                                    constraint.high_frequency)
+
+
+def _streamRandomGenerator(stream_key):
+  """Returns the Philox generator of a random stream."""
+  key_bytes = b''.join(
+      value.encode('utf-8') if isinstance(value, six.string_types)
+      else np.float64(np.nan if value is None else value).tobytes()
+      for value in (_random_streams_seed,) + tuple(stream_key))
+  digest = hashlib.sha256(key_bytes).digest()
+  return np.random.Generator(np.random.Philox(
+      key=np.frombuffer(digest[:16], dtype='<u8')))
+
+
+def _drawReliabilities(num_iteration, stream_key=None):
+  """Returns the K random reliabilities of a link, followed by 0.5 (median).
+
+  The random reliabilities are in [0.001,0.999), drawn according to the
+  current sampling strategy, from the random stream `stream_key`
+  (see `_randomStreamKey()`) if the deterministic random streams are activated.
+  """
+  if _random_streams_seed is not None and stream_key is not None:
+    rng = _streamRandomGenerator(stream_key)
+  else:
+    rng = np.random
+  if _sampling_strategy == 'lhs':
+    reliabilities = ((rng.permutation(num_iteration)
+                      + rng.uniform(0, 1, num_iteration))
+                     / num_iteration)
+    reliabilities = 0.001 + 0.998 * reliabilities
+  else:
+    reliabilities = rng.uniform(0.001, 0.999, num_iteration)
+  return np.append(reliabilities, [0.5])
+
+
+# ITM quantile table mode: the path loss inverse CDF of each link is computed
+# once on a fixed grid of reliabilities (and cached per link), and the Monte
+# Carlo path losses are interpolated on that grid instead of being computed by
+# ITM for each random reliability. The knots are equally spaced in normal
+# deviate (the ITM variability being a piecewise linear function of the normal
+# deviates), cover [0.001, 0.999] and include the median reliability 0.5.
+# Each cached table holds 201 float64 (~1.7kB with its key), so the LRU cache
+# bounded to 10000 links costs up to ~17MB in each process.
+_QUANTILE_TABLE_MAX_DEVIATE = 3.1  # Normal deviate of ~0.999 reliability
+_QUANTILE_TABLE_NUM_KNOTS = 201
+_MAX_QUANTILE_TABLE_CACHE_SIZE = 10000
+_itm_quantile_table = False
+_quantile_tables = OrderedDict()
+
+
+def _quantileTableReliabilities():
+  """Returns the reliability knots of the ITM quantile table mode."""
+  deviates = np.linspace(0, _QUANTILE_TABLE_MAX_DEVIATE,
+                         _QUANTILE_TABLE_NUM_KNOTS // 2 + 1)
+  deviates = np.concatenate((-deviates[:0:-1], deviates))
+  erf = np.vectorize(math.erf)
+  return 0.5 * (1 + erf(deviates / np.sqrt(2)))
+
+_QUANTILE_TABLE_RELIABILITIES = _quantileTableReliabilities()
+
+
+def SetItmQuantileTable(on):
+  """Activates/Deactivates the ITM quantile table mode. By default it is OFF.
+
+  In this mode, the ITM path loss of each link is computed once for a fixed
+  grid of reliabilities, and the Monte Carlo path losses are linearly
+  interpolated on that grid. This reduces ~10x the number of reliabilities
+  evaluated by ITM per link, and avoids recomputing the links already cached.
+  The median path losses are exact, while the random path losses differ from
+  the exact ITM ones by the interpolation error (see `time_dpa.py` for the
+  accuracy bound).
+
+  Shall be called in the main process and in each worker process, for example
+  using `mpool.RunOnEachWorkerProcess(move_list.SetItmQuantileTable, True)`,
+  unless the worker processes are created after this call.
+  """
+  global _itm_quantile_table
+  _itm_quantile_table = on
+  ClearQuantileTableCache()
+
+
+def ClearQuantileTableCache():
+  """Clears the cache of per link ITM quantile tables.
+
+  Automatically called when reconfiguring the terrain or ITU data directories.
+  """
+  _quantile_tables.clear()
+
+
+drive.RegisterDataChangeCallback(ClearQuantileTableCache)
+
+
+def _interpolateQuantileTables(tables, reliabilities):
+  """Interpolates the path loss quantile tables at some reliabilities.
+
+  Inputs:
+    tables:        an ndarray (N, n_knots) of the path losses of N links at the
+                   reliabilities `_QUANTILE_TABLE_RELIABILITIES`.
+    reliabilities: an ndarray (N, n_rels) of the reliabilities of each link.
+
+  Returns:
+    the ndarray (N, n_rels) of interpolated path losses.
+  """
+  return np.array([np.interp(rels, _QUANTILE_TABLE_RELIABILITIES, table)
+                   for rels, table in zip(reliabilities, tables)])
+
+
+def _quantileTableKey(grant, constraint, inc_ant_height):
+  """Returns the key of the quantile table of a link."""
+  return (grant.latitude, grant.longitude, grant.height_agl,
+          grant.indoor_deployment,
+          constraint.latitude, constraint.longitude, inc_ant_height)
+
+
+def _getCachedQuantileTable(key):
+  """Returns the cached (table, bearing_cbsd_c, bearing_c_cbsd), or None."""
+  value = _quantile_tables.pop(key, None)
+  if value is not None:
+    _quantile_tables[key] = value
+  return value
+
+
+def _cacheQuantileTable(key, value):
+  """Caches the (table, bearing_cbsd_c, bearing_c_cbsd) of a link."""
+  _quantile_tables[key] = value
+  if len(_quantile_tables) > _MAX_QUANTILE_TABLE_CACHE_SIZE:
+    _quantile_tables.popitem(last=False)
+
 
 # Define interference contribution, i.e., a tuple with named fields of
 # 'randomInterference', 'bearing_c_cbsd'
@@ -133,7 +391,8 @@ def findGrantsInsideNeighborhood(grants, constraint,
   """Identify the CBSD grants in the neighborhood of protection constraint.
 
   Inputs:
-    grants:         a list of CBSD |data.CbsdGrantInfo| grants.
+    grants:         a list of CBSD |data.CbsdGrantInfo| grants, or a
+                    |grant_index.GrantIndex| of the grants.
     constraint:     protection constraint of type |data.ProtectionConstraint|
     dpa_type:       an enum member of class DpaType
     neighbor_distances: the neighborhood distances (Km) as a sequence:
@@ -153,26 +412,37 @@ def findGrantsInsideNeighborhood(grants, constraint,
   if dpa_type is DpaType.OUT_OF_BAND:
     neighbor_dists = neighbor_distances[2:]
 
-  # Loop over each CBSD grant and filter the ones inside the neighborhood
+  if isinstance(grants, grant_index.GrantIndex):
+    freq_range = (None, None)
+    if dpa_type is not DpaType.OUT_OF_BAND:
+      freq_range = (constraint.low_frequency, constraint.high_frequency)
+    idxs_inside = grants.FindInsideNeighborhood(
+        constraint.latitude, constraint.longitude, neighbor_dists, *freq_range)
+    grants_inside = [grants[k] for k in idxs_inside]
+    return grants_inside, idxs_inside.tolist()
+
+  # Filter the CBSD grants on frequency range
+  idxs_freq = []
   for k, grant in enumerate(grants):
-    # Check frequency range
     if dpa_type is not DpaType.OUT_OF_BAND:
       overlapping_bw = (min(grant.high_frequency, constraint.high_frequency)
                         - max(grant.low_frequency, constraint.low_frequency))
       if overlapping_bw <= 0:
         continue
-
-    # Compute distance from CBSD location to protection constraint location
-    dist_km, _, _ = vincenty.GeodesicDistanceBearing(
-        grant.latitude, grant.longitude,
-        constraint.latitude, constraint.longitude)
-
-    # Check if CBSD is inside the neighborhood of protection constraint
-    if dist_km > neighbor_dists[grant.cbsd_category == 'B']:
-      continue
-
-    grants_inside.append(grant)
-    idxs_inside.append(k)
+    idxs_freq.append(k)
+  if not idxs_freq:
+    return grants_inside, idxs_inside
+
+  # Check if CBSD is inside the neighborhood of protection constraint
+  insides = vincenty.GeodesicDistancesWithin(
+      [grants[k].latitude for k in idxs_freq],
+      [grants[k].longitude for k in idxs_freq],
+      constraint.latitude, constraint.longitude,
+      [neighbor_dists[grants[k].cbsd_category == 'B'] for k in idxs_freq])
+  for k, inside in zip(idxs_freq, insides):
+    if inside:
+      grants_inside.append(grants[k])
+      idxs_inside.append(k)
 
   return grants_inside, idxs_inside
 
@@ -216,7 +486,8 @@ def ComputeOOBConductedPower(low_freq_cbsd, low_freq_c, high_freq_c):
   return 10 * np.log10(power_mW)
 
 
-def computeInterference(grant, constraint, inc_ant_height, num_iteration, dpa_type):
+def computeInterference(grant, constraint, inc_ant_height, num_iteration, dpa_type,
+                        its_elev=None):
   """Calculate interference contribution of each grant in the neighborhood to
   the protection constraint c.
 
@@ -226,6 +497,9 @@ def computeInterference(grant, constraint, inc_ant_height, num_iteration, dpa_ty
     inc_ant_height: reference incumbent antenna height (in meters)
     num_iteration:  a number of Monte Carlo iterations
     dpa_type:       an enum member of class DpaType
+    its_elev:       optional terrain profile from grant to constraint (in ITM
+                    format), as a tuple. If not specified, it is extracted from
+                    the terrain.
 
   Returns:
     A tuple of
@@ -235,29 +509,93 @@ def computeInterference(grant, constraint, inc_ant_height, num_iteration, dpa_ty
          (bearing from c to CBSD grant location).
       medianInterference: the median interference.
   """
-  # Get frequency information
-  low_freq_cbsd = grant.low_frequency
-  high_freq_cbsd = grant.high_frequency
-  low_freq_c = constraint.low_frequency
-  high_freq_c = constraint.high_frequency
+  path_loss, bearing_cbsd_c, bearing_c_cbsd = _computePathLoss(
+      grant, constraint, inc_ant_height, num_iteration, its_elev)
+  return _interferenceFromPathLoss(grant, constraint, dpa_type, path_loss,
+                                   bearing_cbsd_c, bearing_c_cbsd)
+
+
+def _computePathLoss(grant, constraint, inc_ant_height, num_iteration,
+                     its_elev=None, share_path_loss=False):
+  """Calculates the random path losses of a grant to the protection constraint c.
+
+  Inputs:
+    share_path_loss: If True, the draws are the ones of the link, shared by all
+                     the grants of the CBSD (see `_randomStreamKey()`).
+    Other inputs:    Same as `computeInterference()`.
 
+  Returns:
+    A tuple of (path_loss, bearing_cbsd_c, bearing_c_cbsd) with:
+      path_loss: an ndarray of the K random path losses followed by the median
+                 path loss (in dB)
+      bearing_cbsd_c: bearing from CBSD to protection constraint (degrees)
+      bearing_c_cbsd: bearing from protection constraint to CBSD (degrees)
+  """
   # Compute median and K random realizations of path loss/interference contribution
   # based on ITM model as defined in [R2-SGN-03] (in dB)
-  reliabilities = np.random.uniform(0.001, 0.999, num_iteration)  # get K random
-  # reliability values from an uniform distribution over [0.001,0.999)
-  reliabilities = np.append(reliabilities, [0.5])  # add 0.5 (for median loss) as
-  # a last value to reliabilities array
+  # K random reliability values over [0.001,0.999), and 0.5 (for median loss)
+  # as a last value of the reliabilities array.
+  reliabilities = _drawReliabilities(
+      num_iteration,
+      _randomStreamKey(grant, constraint, inc_ant_height, num_iteration,
+                       share_path_loss))
+  if _itm_quantile_table:
+    key = _quantileTableKey(grant, constraint, inc_ant_height)
+    cached = _getCachedQuantileTable(key)
+    if cached is None:
+      results = wf_itm.CalcItmPropagationLoss(
+          grant.latitude, grant.longitude, grant.height_agl,
+          constraint.latitude, constraint.longitude, inc_ant_height,
+          grant.indoor_deployment,
+          reliability=_QUANTILE_TABLE_RELIABILITIES,
+          freq_mhz=FREQ_PROP_MODEL,
+          its_elev=its_elev)
+      cached = (np.array(results.db_loss),
+                results.incidence_angles.hor_cbsd,
+                results.incidence_angles.hor_rx)
+      _cacheQuantileTable(key, cached)
+    table, bearing_cbsd_c, bearing_c_cbsd = cached
+    path_loss = _interpolateQuantileTables(table[np.newaxis],
+                                           reliabilities[np.newaxis])[0]
+    return path_loss, bearing_cbsd_c, bearing_c_cbsd
+
   results = wf_itm.CalcItmPropagationLoss(
       grant.latitude, grant.longitude, grant.height_agl,
       constraint.latitude, constraint.longitude, inc_ant_height,
       grant.indoor_deployment,
       reliability=reliabilities,
-      freq_mhz=FREQ_PROP_MODEL)
-  path_loss = np.array(results.db_loss)
+      freq_mhz=FREQ_PROP_MODEL,
+      its_elev=its_elev)
+  return (np.array(results.db_loss),
+          results.incidence_angles.hor_cbsd,
+          results.incidence_angles.hor_rx)
+
+
+def _interferenceFromPathLoss(grant, constraint, dpa_type, path_loss,
+                              bearing_cbsd_c, bearing_c_cbsd):
+  """Calculate interference contribution of a grant from its path losses.
+
+  Inputs:
+    grant:          a |data.CbsdGrantInfo| grant
+    constraint:     protection constraint of type |data.ProtectionConstraint|
+    dpa_type:       an enum member of class DpaType
+    path_loss:      an ndarray of the K random path losses followed by the median
+                    path loss (in dB)
+    bearing_cbsd_c: bearing from CBSD to protection constraint (degrees)
+    bearing_c_cbsd: bearing from protection constraint to CBSD (degrees)
+
+  Returns:
+    Same as `computeInterference()`.
+  """
+  # Get frequency information
+  low_freq_cbsd = grant.low_frequency
+  high_freq_cbsd = grant.high_frequency
+  low_freq_c = constraint.low_frequency
+  high_freq_c = constraint.high_frequency
 
   # Compute CBSD antenna gain in the direction of protection point
   ant_gain = antenna.GetStandardAntennaGains(
-      results.incidence_angles.hor_cbsd,
+      bearing_cbsd_c,
       grant.antenna_azimuth, grant.antenna_beamwidth, grant.antenna_gain)
 
   # Compute EIRP of CBSD grant inside the frequency range of protection constraint
@@ -285,12 +623,165 @@ def computeInterference(grant, constraint, inc_ant_height, num_iteration, dpa_ty
 
   # Store interference contributions
   interference = InterferenceContribution(randomInterference=K_interf,
-                                          bearing_c_cbsd=results.incidence_angles.hor_rx)
+                                          bearing_c_cbsd=bearing_c_cbsd)
   return interference, median_interf
 
 
+def _pathLossKey(grant, constraint, inc_ant_height, num_iteration):
+  """Returns the key of the link from a grant to the constraint c.
+
+  The path losses of a link do not depend on the grant frequencies. When they
+  are shared (see `IncrementalMoveList` share_path_loss mode), the random path
+  losses of a link are used by all grants of a CBSD and all channels of the
+  constraint.
+  """
+  return (grant.latitude, grant.longitude, grant.height_agl,
+          grant.indoor_deployment,
+          constraint.latitude, constraint.longitude, inc_ant_height,
+          num_iteration)
+
+
+def _prefetchTerrainTiles(constraint, grants):
+  """Prefetches in background the terrain tiles of the grants links to c.
+
+  The tiles are loaded by the terrain driver I/O thread while the first links
+  are computed. Only done in batched link mode (see `SetBatchedLinks()`).
+  """
+  if not _batched_links:
+    return
+  drive.terrain_driver.Prefetch(tiles.LinksTiles(
+      constraint.latitude, constraint.longitude,
+      [grant.latitude for grant in grants],
+      [grant.longitude for grant in grants]))
+
+
+def _iterInterferences(grants, constraint, inc_ant_height, num_iteration, dpa_type,
+                       path_losses=None):
+  """Yields the interference contribution of each grant to the constraint c.
+
+  This is equivalent to calling `computeInterference()` on each grant in turn
+  (with same random draws), but the path losses are computed in batches with
+  `wf_itm.CalcItmPropagationLossMulti()`.
+
+  Inputs:
+    grants:         a list of |data.CbsdGrantInfo| grants
+    constraint:     protection constraint of type |data.ProtectionConstraint|
+    inc_ant_height: reference incumbent antenna height (in meters)
+    num_iteration:  a number of Monte Carlo iterations
+    dpa_type:       an enum member of class DpaType
+    path_losses:    optional dict of the random path losses of each link, as
+                    returned by `_computePathLoss()`. If specified, the path
+                    losses are taken from it, and the missing ones are
+                    computed and added to it.
+
+  Yields:
+    the tuple (interference, medianInterference) of each grant, as returned by
+    `computeInterference()`.
+  """
+  if path_losses is not None:
+    keys = [_pathLossKey(grant, constraint, inc_ant_height, num_iteration)
+            for grant in grants]
+    missing_keys, missing_grants = [], []
+    for grant, key in zip(grants, keys):
+      if key not in path_losses:
+        path_losses[key] = None  # Computed below
+        missing_keys.append(key)
+        missing_grants.append(grant)
+    path_losses.update(zip(missing_keys,
+                           _iterPathLosses(missing_grants, constraint,
+                                           inc_ant_height, num_iteration,
+                                           share_path_loss=True)))
+    for grant, key in zip(grants, keys):
+      yield _interferenceFromPathLoss(grant, constraint, dpa_type,
+                                      *path_losses[key])
+    return
+
+  if not _batched_links:
+    for grant in grants:
+      yield computeInterference(grant, constraint, inc_ant_height,
+                                num_iteration, dpa_type)
+    return
+  for grant, path_loss in zip(grants,
+                              _iterPathLosses(grants, constraint, inc_ant_height,
+                                              num_iteration)):
+    yield _interferenceFromPathLoss(grant, constraint, dpa_type, *path_loss)
+
+
+def _iterPathLosses(grants, constraint, inc_ant_height, num_iteration,
+                    share_path_loss=False):
+  """Yields the random path losses of each grant to the constraint c.
+
+  This is equivalent to calling `_computePathLoss()` on each grant in turn
+  (with same random draws), but the path losses are computed in batches with
+  `wf_itm.CalcItmPropagationLossMulti()` in batched link mode (see
+  `SetBatchedLinks()`).
+  """
+  if not _batched_links:
+    for grant in grants:
+      yield _computePathLoss(grant, constraint, inc_ant_height, num_iteration,
+                             share_path_loss=share_path_loss)
+    return
+  for k in range(0, len(grants), _LINKS_BATCH_SIZE):
+    batch = grants[k:k+_LINKS_BATCH_SIZE]
+    # Same random draws as in `computeInterference()`, in the same order
+    reliabilities = np.array([
+        _drawReliabilities(num_iteration,
+                           _randomStreamKey(grant, constraint, inc_ant_height,
+                                            num_iteration, share_path_loss))
+        for grant in batch])
+    if _itm_quantile_table:
+      tables = _getQuantileTables(batch, constraint, inc_ant_height)
+      path_losses = _interpolateQuantileTables(
+          np.array([table for table, _, _ in tables]), reliabilities)
+      for path_loss, (_, bearing_cbsd_c, bearing_c_cbsd) in zip(path_losses,
+                                                                tables):
+        yield path_loss, bearing_cbsd_c, bearing_c_cbsd
+      continue
+    results = wf_itm.CalcItmPropagationLossMulti(
+        [grant.latitude for grant in batch],
+        [grant.longitude for grant in batch],
+        [grant.height_agl for grant in batch],
+        constraint.latitude, constraint.longitude, inc_ant_height,
+        [grant.indoor_deployment for grant in batch],
+        reliability=reliabilities,
+        freq_mhz=FREQ_PROP_MODEL)
+    for j in range(len(batch)):
+      yield (results.db_loss[j],
+             results.incidence_angles.hor_cbsd[j],
+             results.incidence_angles.hor_rx[j])
+
+
+def _getQuantileTables(grants, constraint, inc_ant_height):
+  """Returns the (table, bearing_cbsd_c, bearing_c_cbsd) of each grant link.
+
+  The quantile tables missing from the cache are computed in a single call to
+  `wf_itm.CalcItmPropagationLossMulti()`, and added to the cache.
+  """
+  keys = [_quantileTableKey(grant, constraint, inc_ant_height)
+          for grant in grants]
+  tables = [_getCachedQuantileTable(key) for key in keys]
+  missing = [k for k, table in enumerate(tables) if table is None]
+  if missing:
+    missing_grants = [grants[k] for k in missing]
+    results = wf_itm.CalcItmPropagationLossMulti(
+        [grant.latitude for grant in missing_grants],
+        [grant.longitude for grant in missing_grants],
+        [grant.height_agl for grant in missing_grants],
+        constraint.latitude, constraint.longitude, inc_ant_height,
+        [grant.indoor_deployment for grant in missing_grants],
+        reliability=_QUANTILE_TABLE_RELIABILITIES,
+        freq_mhz=FREQ_PROP_MODEL)
+    for j, k in enumerate(missing):
+      tables[k] = (results.db_loss[j],
+                   results.incidence_angles.hor_cbsd[j],
+                   results.incidence_angles.hor_rx[j])
+      _cacheQuantileTable(keys[k], tables[k])
+  return tables
+
+
 def formInterferenceMatrix(grants, grants_ids, constraint,
-                           inc_ant_height, num_iter, dpa_type):
+                           inc_ant_height, num_iter, dpa_type,
+                           path_losses=None):
   """Form the matrix of interference contributions to protection constraint c.
 
   Inputs:
@@ -301,6 +792,8 @@ def formInterferenceMatrix(grants, grants_ids, constraint,
     inc_ant_height:     reference incumbent antenna height (in meters)
     num_iter:           number of random iterations
     dpa_type:           an enum member of class DpaType
+    path_losses:        optional dict for sharing the random path losses of
+                        each link between calls (see `moveListConstraint()`).
 
   Returns:
     A tuple of:
@@ -313,9 +806,8 @@ def formInterferenceMatrix(grants, grants_ids, constraint,
   # Compute interference contributions of each grant to the protection constraint
   interf_list = []
   median_interf = []
-  for cbsd_grant in grants:
-    interf, median = computeInterference(cbsd_grant, constraint, inc_ant_height,
-                                         num_iter, dpa_type)
+  for interf, median in _iterInterferences(grants, constraint, inc_ant_height,
+                                           num_iter, dpa_type, path_losses):
     interf_list.append(interf)
     median_interf.append(median)
   # Sort grants by their median interference contribution, smallest to largest
@@ -341,6 +833,28 @@ def findAzimuthRange(min_azimuth, max_azimuth, beamwidth):
   return azimuths
 
 
+def _radarGainMatrix(bearings, azimuths, beamwidth):
+  """Returns the DPA radar linear antenna gains of all grants for all azimuths.
+
+  Inputs:
+    bearings:  ndarray of bearings from protection point to CBSDs (degree).
+    azimuths:  ndarray of radar antenna azimuths (degree).
+    beamwidth: protection antenna beamwidth (degree).
+
+  Returns:
+    The linear gains as a 2D ndarray of shape (num_azimuths, num_grants),
+    equal to the `antenna.GetRadarNormalizedAntennaGains()` gains.
+  """
+  if beamwidth == 360:
+    return np.ones((len(azimuths), len(bearings)))
+  bore_angle = (np.asarray(bearings)[np.newaxis, :]
+                - np.asarray(azimuths)[:, np.newaxis])
+  bore_angle[bore_angle > 180] -= 360
+  bore_angle[bore_angle < -180] += 360
+  dpa_gains = np.where(np.abs(bore_angle) < beamwidth / 2., 0., -25.)
+  return 10**(dpa_gains / 10.0)
+
+
 def find_nc(I, bearings, t, beamwidth, min_azimuth, max_azimuth):
   """Returns the index (nc) of the grant in the ordered list of grants such that
   the protection percentile of the interference from the first nc grants is below the
@@ -369,28 +883,53 @@ def find_nc(I, bearings, t, beamwidth, min_azimuth, max_azimuth):
   t_mW = np.power(10.0, t/10.0)
   I_mW = np.power(10.0, I/10.0)
 
+  # In batched mode, the aggregate interference of all grants is computed for
+  # all azimuths at once. As it can only decrease when removing grants, the
+  # azimuths clearly below the threshold can be skipped.
+  batched = _batched_azimuth_gains and len(azimuths) > 1
+  if batched:
+    gains_lin = _radarGainMatrix(bearings, azimuths, beamwidth)
+    batch_agg_interf = np.percentile(np.einsum('ij,kj->ik', I_mW, gains_lin),
+                                     PROTECTION_PERCENTILE, axis=0,
+                                     interpolation='lower')
+
   # Loop through every azimuth angle.
-  for azi in azimuths:
+  for k, azi in enumerate(azimuths):
+
+    if batched and t_mW - batch_agg_interf[k] > _SUM_REL_ERROR * Nc * t_mW:
+      continue
 
     # Calculate interference contributions at output of receiver antenna.
-    dpa_gains = antenna.GetRadarNormalizedAntennaGains(bearings, azi, beamwidth)
-    IG = I_mW * 10**(dpa_gains/10.0)
+    dpa_gains = antenna.GetRadarNormalizedAntennaGains(bearings[0:nc], azi, beamwidth)
+    IG = I_mW[:, 0:nc] * 10**(dpa_gains/10.0)
 
-    # Compute the protection percentile of the aggregate interference, and remove
-    # grants until the protection threshold is met or all grants are moved.
-    agg_interf = np.percentile(np.sum(IG[:, 0:nc], axis=1),
+    # Remove grants until the protection threshold is met or all grants are moved.
+    agg_interf = np.percentile(np.sum(IG, axis=1),
                                PROTECTION_PERCENTILE, interpolation='lower')
     if agg_interf <= t_mW:
       continue
 
+    # Compute once the aggregate interference of the first n grants for all n,
+    # using cumulative sums.
+    cum_interf = np.cumsum(IG, axis=1)
+
+    def isAboveThreshold(n):
+      agg_interf = np.percentile(cum_interf[:, n-1],
+                                 PROTECTION_PERCENTILE, interpolation='lower')
+      # The cumulative sums are not rounded exactly as the direct sum of the
+      # first n contributions. When too close to the threshold, the direct sum
+      # is used so that the decision is the same.
+      if abs(agg_interf - t_mW) <= _SUM_REL_ERROR * n * max(agg_interf, t_mW):
+        agg_interf = np.percentile(np.sum(IG[:, 0:n], axis=1),
+                                   PROTECTION_PERCENTILE, interpolation='lower')
+      return agg_interf > t_mW
+
     # Conduct binary search for nc.
     hi = nc
     lo = 0
     while (hi - lo) > 1:
       mid = (hi + lo) // 2
-      agg_interf = np.percentile(np.sum(IG[:, 0:mid], axis=1),
-                                 PROTECTION_PERCENTILE, interpolation='lower')
-      if agg_interf > t_mW:
+      if isAboveThreshold(mid):
         hi = mid
       else:
         lo = mid
@@ -415,7 +954,8 @@ def moveListConstraint(protection_point, low_freq, high_freq,
                        inc_ant_height,
                        num_iter, threshold, beamwidth,
                        neighbor_distances,
-                       min_azimuth=0, max_azimuth=360):
+                       min_azimuth=0, max_azimuth=360,
+                       path_losses=None):
   """Returns the move list for a given protection constraint.
 
   Note that the returned indexes corresponds to the grant.grant_index
@@ -434,6 +974,10 @@ def moveListConstraint(protection_point, low_freq, high_freq,
       [cata_dist, catb_dist, cata_oob_dist, catb_oob_dist]
     min_azimuth:       The minimum azimuth (degrees) for incumbent transmission.
     max_azimuth:       The maximum azimuth (degrees) for incumbent transmission.
+    path_losses:       An optional dict for sharing the Monte Carlo path losses
+      between calls on the same protection point (typically for all its channels).
+      The path losses of each CBSD are then drawn only once: they are taken from
+      this dict if present, otherwise computed and added to it.
 
   Returns:
     A tuple of (move_list_grants, neighbor_list_grants) for that protection constraint:
@@ -470,9 +1014,11 @@ def moveListConstraint(protection_point, low_freq, high_freq,
 
   movelist_grants = []
   if len(neighbor_grants):  # Found CBSDs in the neighborhood
+    _prefetchTerrainTiles(constraint, neighbor_grants)
     # Form the matrix of interference contributions
     I, sorted_neighbor_idxs, bearings = formInterferenceMatrix(
-        neighbor_grants, neighbor_idxs, constraint, inc_ant_height, num_iter, dpa_type)
+        neighbor_grants, neighbor_idxs, constraint, inc_ant_height, num_iter, dpa_type,
+        path_losses)
 
     # Find the index (nc) of the grant in the ordered list of grants such that
     # the protection percentile of the interference from the first nc grants is below
@@ -508,6 +1054,35 @@ def moveListConstraint(protection_point, low_freq, high_freq,
   return (movelist_grants, neighbor_grants)
 
 
+def moveListConstraints(protection_point, channels,
+                        grants,
+                        inc_ant_height,
+                        num_iter, threshold, beamwidth,
+                        neighbor_distances,
+                        min_azimuth=0, max_azimuth=360):
+  """Returns the move lists for all channels of a given protection point.
+
+  This is similar to calling `moveListConstraint()` for each channel, except
+  that the Monte Carlo path losses of each CBSD to the protection point are
+  computed only once and shared by all the channels.
+
+  Inputs:
+    protection_point:  A protection point location, having attributes
+                      'latitude' and 'longitude'.
+    channels:          A list of channels as tuple (low_freq, high_freq) (Hz).
+    Other inputs:      Same as `moveListConstraint()`.
+
+  Returns:
+    A list of tuple (move_list_grants, neighbor_list_grants), one per channel.
+  """
+  path_losses = {}
+  return [moveListConstraint(protection_point, low_freq, high_freq, grants,
+                             inc_ant_height, num_iter, threshold, beamwidth,
+                             neighbor_distances, min_azimuth, max_azimuth,
+                             path_losses=path_losses)
+          for low_freq, high_freq in channels]
+
+
 def getDpaNeighborGrants(grants, protection_points, dpa_geometry,
                          low_freq, high_freq, neighbor_distances):
   """Gets the list of actual neighbor grants of a DPA, for a given channel.
@@ -515,7 +1090,8 @@ def getDpaNeighborGrants(grants, protection_points, dpa_geometry,
   This looks at the total keep list considering a bunch of protected points.
 
   Args:
-    grants:  A list of CBSD |data.CbsdGrantInfo| active grants.
+    grants:  A list of CBSD |data.CbsdGrantInfo| active grants, or a
+      |grant_index.GrantIndex| of the grants.
     protection_points: A list of protection point locations defining the DPA, each one
       having attributes 'latitude' and 'longitude'.
     dpa_geometry: The DPA |shapely.geometry| for detection of inside grants.
@@ -528,6 +1104,8 @@ def getDpaNeighborGrants(grants, protection_points, dpa_geometry,
     A set of |CbsdGrantInfo| neighbor grants.
   """
   dpa_type = findDpaType(low_freq, high_freq)
+  if not isinstance(grants, grant_index.GrantIndex):
+    grants = grant_index.GrantIndex(grants)
 
   neighbor_grants = set()
   if dpa_geometry and not isinstance(dpa_geometry, sgeo.Point):
@@ -561,7 +1139,8 @@ def calcAggregatedInterference(protection_point,
                                neighbor_distances,
                                min_azimuth=0,
                                max_azimuth=360,
-                               do_max=False):
+                               do_max=False,
+                               path_losses=None):
   """Computes the 95% aggregated interference quantile on a protected point.
 
   Inputs:
@@ -578,6 +1157,8 @@ def calcAggregatedInterference(protection_point,
     neighbor_distances: The neighborhood distances (km) as a sequence:
       [cata_dist, catb_dist, cata_oob_dist, catb_oob_dist]
     do_max:            If True, returns the maximum interference over all radar azimuth.
+    path_losses:       An optional dict for sharing the Monte Carlo path losses
+      between calls on the same protection point (see `moveListConstraint()`).
 
   Returns:
     The 95% aggregated interference (dB) either:
@@ -612,17 +1193,31 @@ def calcAggregatedInterference(protection_point,
                                                     neighbor_distances)
   if not neighbor_grants:
     return np.asarray(-1000)
+  _prefetchTerrainTiles(constraint, neighbor_grants)
   interf_matrix = np.zeros((num_iter, len(neighbor_grants)))
   bearings = np.zeros(len(neighbor_grants))
-  for k, grant in enumerate(neighbor_grants):
-    interf, _ = computeInterference(grant, constraint, inc_ant_height,
-                                    num_iter, dpa_type)
+  if path_losses is not None:
+    interferences = _iterInterferences(neighbor_grants, constraint, inc_ant_height,
+                                       num_iter, dpa_type, path_losses)
+  else:
+    interferences = (computeInterference(grant, constraint, inc_ant_height,
+                                         num_iter, dpa_type)
+                     for grant in neighbor_grants)
+  for k, (interf, _) in enumerate(interferences):
     interf_matrix[:,k] = interf.randomInterference
     bearings[k] = interf.bearing_c_cbsd
 
   interf_matrix = 10**(interf_matrix / 10.)
   azimuths = findAzimuthRange(min_azimuth, max_azimuth, beamwidth)
 
+  if _batched_azimuth_gains and len(azimuths) > 1:
+    gains_lin = _radarGainMatrix(bearings, azimuths, beamwidth)
+    agg_interf = np.percentile(np.einsum('ij,kj->ik', interf_matrix, gains_lin),
+                               PROTECTION_PERCENTILE, axis=0,
+                               interpolation='lower')
+    agg_interf = 10 * np.log10(agg_interf)
+    return np.max(agg_interf) if do_max else agg_interf
+
   agg_interf = np.zeros(len(azimuths))
   for k, azi in enumerate(azimuths):
     dpa_gains = antenna.GetRadarNormalizedAntennaGains(bearings, azi, beamwidth)
@@ -633,12 +1228,366 @@ def calcAggregatedInterference(protection_point,
   return np.max(agg_interf) if do_max else agg_interf
 
 
+def _isBelowThresholdAllAzimuths(I, bearings, n, t, beamwidth,
+                                 min_azimuth, max_azimuth):
+  """Checks if the first n grants are below threshold for all radar azimuths.
+
+  The decision is the same as in `find_nc()`: the 95% quantile of the
+  aggregate interference of the first `n` grants is compared to the threshold
+  for each azimuth, computing the direct sum of contributions when too close
+  to the threshold.
+
+  Inputs:
+    I:        2D array of interference contributions (dBm/10 MHz) sorted by
+              median, with rows corresponding to Monte Carlo iterations.
+    bearings: bearings from protection point to CBSDs of the sorted grants.
+    n:        the number of first grants to consider.
+    Others:   same as `find_nc()`.
+  """
+  if n == 0:
+    return True
+  azimuths = findAzimuthRange(min_azimuth, max_azimuth, beamwidth)
+  t_mW = np.power(10.0, t/10.0)
+  I_mW = np.power(10.0, I[:, 0:n]/10.0)
+  gains_lin = _radarGainMatrix(bearings[0:n], azimuths, beamwidth)
+  agg_interfs = np.percentile(np.einsum('ij,kj->ik', I_mW, gains_lin),
+                              PROTECTION_PERCENTILE, axis=0,
+                              interpolation='lower')
+  for azi, agg_interf in zip(azimuths, agg_interfs):
+    if abs(agg_interf - t_mW) <= _SUM_REL_ERROR * n * max(agg_interf, t_mW):
+      dpa_gains = antenna.GetRadarNormalizedAntennaGains(bearings[0:n], azi,
+                                                         beamwidth)
+      agg_interf = np.percentile(np.sum(I_mW * 10**(dpa_gains/10.0), axis=1),
+                                 PROTECTION_PERCENTILE, interpolation='lower')
+    if agg_interf > t_mW:
+      return False
+  return True
+
+
+class _ChannelMoveList(object):
+  """The incremental move list state of one channel of a protection point.
+
+  Attributes:
+    constraint: the |data.ProtectionConstraint| of the channel.
+    dpa_type:   an enum member of class DpaType.
+    units:      the neighbor units sorted by median interference. A unit is a
+                grant for co-channel, and a CBSD key for out-of-band channels
+                (for which only the minimum frequency grant of each CBSD is
+                considered, see the DPA purge algorithm for OOB).
+    grants:     a dict of the grants of each unit. The first one is the grant
+                whose interference is considered.
+    medians:    the median interference of each unit.
+    interf:     the interference contributions of the units, as a 2D array
+                (num_iter, num_units).
+    bearings:   the bearings from protection point to the units CBSD.
+    nc:         the number of first units not on the move list.
+  """
+
+  def __init__(self, constraint, dpa_type, num_iter):
+    self.constraint = constraint
+    self.dpa_type = dpa_type
+    self.units = []
+    self.grants = {}
+    self.medians = np.zeros(0)
+    self.interf = np.zeros((num_iter, 0))
+    self.bearings = np.zeros(0)
+    self.nc = 0
+
+  def Unit(self, grant):
+    """Returns the unit of a grant."""
+    if self.dpa_type is DpaType.OUT_OF_BAND:
+      return grant.uniqueCbsdKey()
+    return grant
+
+  def MoveList(self):
+    """Returns the move list grants."""
+    return [grant for unit in self.units[self.nc:]
+            for grant in self.grants[unit]]
+
+  def NeighborList(self):
+    """Returns the neighbor list grants."""
+    return [grant for unit in self.units for grant in self.grants[unit]]
+
+
+class IncrementalMoveList(object):
+  """Move lists of all channels of a protection point, updated incrementally.
+
+  For each channel, the interference matrix of the neighbor grants sorted by
+  median interference is kept, with their bearings and the `nc` index (see
+  `find_nc()`), along with the Monte Carlo path losses of the neighbor CBSDs
+  if shared by all channels.
+  On a change of grants (see `Update()`):
+    - only the channels whose neighbor list changed are updated, by removing
+      and inserting columns in their sorted interference matrix,
+    - the interference is computed only for the new grants,
+    - `nc` is searched only from its previous value when all the changes are
+      after the first `nc` sorted grants, otherwise with `find_nc()`.
+  The move lists are the same as the ones given by `moveListConstraint()` on
+  the current grants with the same random draws (apart from the order of
+  grants having exactly the same median interference): each grant of each
+  channel has its own draws, as with `moveListConstraint()`, unless
+  `share_path_loss` is set in which case the draws of a CBSD are shared by all
+  its grants and channels, as with `moveListConstraints()`.
+
+  Note that the matrices of all channels are kept in memory, ie 8 bytes per
+  Monte Carlo iteration for each (channel, neighbor grant).
+
+  Attributes:
+    protection_point: The protection point.
+    channels: The list of channels as tuple (low_freq, high_freq) (Hz).
+    move_lists: The move list grants of each channel, as a list of lists.
+    nbor_lists: The neighbor list grants of each channel, as a list of lists.
+  """
+
+  def __init__(self, protection_point, channels, grants,
+               inc_ant_height, num_iter, threshold, beamwidth,
+               neighbor_distances, min_azimuth=0, max_azimuth=360,
+               share_path_loss=False):
+    """Initializes the move lists for an initial list of grants.
+
+    Inputs:
+      protection_point:  A protection point location, having attributes
+                         'latitude' and 'longitude'.
+      channels:          A list of channels as tuple (low_freq, high_freq) (Hz).
+      grants:            A list of CBSD |data.CbsdGrantInfo| grants, or a
+                         |grant_index.GrantIndex| of the grants.
+      share_path_loss:   If True, the Monte Carlo path losses of each CBSD are
+                         shared by all its grants and all channels.
+      Other inputs:      Same as `moveListConstraint()`.
+    """
+    self.protection_point = protection_point
+    self.channels = channels
+    self.inc_ant_height = inc_ant_height
+    self.num_iter = num_iter
+    self.threshold = threshold
+    self.beamwidth = beamwidth or 360
+    self.neighbor_distances = neighbor_distances
+    self.min_azimuth = min_azimuth
+    self.max_azimuth = max_azimuth
+    self._path_losses = {} if share_path_loss else None
+    self._channels_state = []
+    for low_freq, high_freq in channels:
+      constraint = data.ProtectionConstraint(
+          latitude=protection_point.latitude,
+          longitude=protection_point.longitude,
+          low_frequency=low_freq,
+          high_frequency=high_freq,
+          entity_type=data.ProtectedEntityType.DPA)
+      self._channels_state.append(_ChannelMoveList(
+          constraint, findDpaType(low_freq, high_freq), num_iter))
+    self.move_lists = [[] for _ in channels]
+    self.nbor_lists = [[] for _ in channels]
+    self.Update(grants, [])
+
+  def Update(self, added_grants, removed_grants):
+    """Updates the move lists for a change of grants.
+
+    Inputs:
+      added_grants:   A list of |data.CbsdGrantInfo| grants to add, or a
+                      |grant_index.GrantIndex| of the grants.
+      removed_grants: A list of |data.CbsdGrantInfo| grants to remove.
+
+    Returns:
+      The list of indices of the channels whose lists have been updated.
+    """
+    updated_chan_idxs = []
+    for chan_idx, state in enumerate(self._channels_state):
+      if self._UpdateChannel(state, added_grants, removed_grants):
+        self.move_lists[chan_idx] = state.MoveList()
+        self.nbor_lists[chan_idx] = state.NeighborList()
+        updated_chan_idxs.append(chan_idx)
+    if updated_chan_idxs and self._path_losses is not None:
+      # Only keep the path losses still in use.
+      keys = set(_pathLossKey(state.grants[unit][0], state.constraint,
+                              self.inc_ant_height, self.num_iter)
+                 for state in self._channels_state for unit in state.units)
+      for key in list(self._path_losses):
+        if key not in keys:
+          del self._path_losses[key]
+    return updated_chan_idxs
+
+  def _UpdateChannel(self, state, added_grants, removed_grants):
+    """Updates the move list of a channel. Returns True if changed."""
+    # The grants changes within the neighborhood.
+    added, _ = findGrantsInsideNeighborhood(added_grants, state.constraint,
+                                            state.dpa_type,
+                                            self.neighbor_distances)
+    removed, _ = findGrantsInsideNeighborhood(removed_grants, state.constraint,
+                                              state.dpa_type,
+                                              self.neighbor_distances)
+    if not added and not removed:
+      return False
+    changed_units = OrderedDict()
+    for grant in removed + added:
+      changed_units[state.Unit(grant)] = True
+    removed = set(removed)
+    new_unit_grants = OrderedDict()
+    for unit in changed_units:
+      new_unit_grants[unit] = [grant for grant in state.grants.get(unit, [])
+                               if grant not in removed]
+    for grant in added:
+      new_unit_grants[state.Unit(grant)].append(grant)
+    for unit, unit_grants in six.iteritems(new_unit_grants):
+      # The main grant first (the first one of minimum frequency, as in
+      # `_addMinFreqGrantToFront()`), then the others in their original order.
+      if unit_grants:
+        main_grant = min(unit_grants, key=lambda grant: grant.low_frequency)
+        unit_grants.remove(main_grant)
+        unit_grants.insert(0, main_grant)
+
+    # Remove the columns of the removed units, or whose main grant changed.
+    old_positions = dict((unit, k) for k, unit in enumerate(state.units))
+    removed_idxs = []
+    inserted_units = []
+    for unit, unit_grants in six.iteritems(new_unit_grants):
+      old_grants = state.grants.get(unit)
+      if old_grants and (not unit_grants or unit_grants[0] != old_grants[0]):
+        removed_idxs.append(old_positions[unit])
+      if unit_grants and (not old_grants or unit_grants[0] != old_grants[0]):
+        inserted_units.append(unit)
+      if unit_grants:
+        state.grants[unit] = unit_grants
+      else:
+        state.grants.pop(unit, None)
+    num_common = min(removed_idxs) if removed_idxs else len(state.units)
+    if removed_idxs:
+      removed_idxs = set(removed_idxs)
+      kept_idxs = [k for k in range(len(state.units)) if k not in removed_idxs]
+      state.units = [state.units[k] for k in kept_idxs]
+      state.medians = state.medians[kept_idxs]
+      state.interf = state.interf[:, kept_idxs]
+      state.bearings = state.bearings[kept_idxs]
+
+    # Insert the columns of the new units, sorted by median interference.
+    if inserted_units:
+      interfs = list(_iterInterferences(
+          [state.grants[unit][0] for unit in inserted_units],
+          state.constraint, self.inc_ant_height, self.num_iter,
+          state.dpa_type, self._path_losses))
+      units = state.units + inserted_units
+      medians = np.concatenate((state.medians,
+                                [median for _, median in interfs]))
+      interf = np.concatenate(
+          (state.interf, np.array([interf.randomInterference
+                                   for interf, _ in interfs]).T), axis=1)
+      bearings = np.concatenate(
+          (state.bearings, [interf.bearing_c_cbsd for interf, _ in interfs]))
+      order = np.argsort(medians, kind='stable')
+      moved = np.nonzero(order != np.arange(len(order)))[0]
+      if len(moved):
+        num_common = min(num_common, moved[0])
+      state.units = [units[k] for k in order]
+      state.medians = medians[order]
+      state.interf = interf[:, order]
+      state.bearings = bearings[order]
+
+    # Find the new nc.
+    num_units = len(state.units)
+    if not removed_idxs and not inserted_units:
+      # Only extra grants of some OOB units changed.
+      pass
+    elif 0 < state.nc <= num_common:
+      # The first nc units are unchanged, and still below the threshold.
+      lo, hi = state.nc, num_units + 1
+      while (hi - lo) > 1:
+        mid = (hi + lo) // 2 if lo > state.nc else lo + 1
+        if _isBelowThresholdAllAzimuths(state.interf, state.bearings, mid,
+                                        self.threshold, self.beamwidth,
+                                        self.min_azimuth, self.max_azimuth):
+          lo = mid
+        else:
+          hi = mid
+      state.nc = lo
+    elif num_units:
+      state.nc = find_nc(state.interf, state.bearings, self.threshold,
+                         self.beamwidth, self.min_azimuth, self.max_azimuth)
+    else:
+      state.nc = 0
+    return True
+
+
+# Statistics of the 95% aggregated interference for a number of iterations.
+ConvergenceStats = namedtuple('ConvergenceStats',
+                              ['num_iter', 'mean', 'std', 'min', 'max'])
+
+
+def calcInterferenceConvergence(protection_point,
+                                low_freq, high_freq,
+                                grants,
+                                inc_ant_height,
+                                num_iters,
+                                beamwidth,
+                                neighbor_distances,
+                                min_azimuth=0,
+                                max_azimuth=360,
+                                num_replications=10):
+  """Reports the Monte Carlo convergence of the 95% aggregated interference.
+
+  For each number of iterations, the maximum (over radar azimuths) 95%
+  aggregated interference is computed on several independent replications,
+  using the current sampling strategy (see `SetSamplingStrategy()`). The spread
+  of the replications gives the Monte Carlo noise for that number of
+  iterations.
+  Note: the ITM computation of each replication can be saved by activating the
+  ITM quantile table mode (see `SetItmQuantileTable()`).
+  Note: with the deterministic random streams (see `SetRandomStreamsSeed()`),
+  the replications use the seeds `seed`, `seed+1`, ...
+
+  Inputs:
+    protection_point:  A protection point location, having attributes 'latitude' and
+                       'longitude'.
+    low_freq:          The low frequency of protection constraint (Hz).
+    high_freq:         The high frequency of protection constraint (Hz).
+    grants:            A list of CBSD |data.CbsdGrantInfo| active grants.
+    inc_ant_height:    The reference incumbent antenna height (meters).
+    num_iters:         A sequence of number of Monte Carlo iterations.
+    beamwidth:         The protection antenna beamwidth (degree).
+    neighbor_distances: The neighborhood distances (km) as a sequence:
+      [cata_dist, catb_dist, cata_oob_dist, catb_oob_dist]
+    min_azimuth:       The minimum azimuth (degrees) for incumbent transmission.
+    max_azimuth:       The maximum azimuth (degrees) for incumbent transmission.
+    num_replications:  The number of replications per number of iterations.
+
+  Returns:
+    A list of |ConvergenceStats| for each number of iterations, holding the
+    mean, standard deviation, min and max (in dB) of the replications.
+  """
+  global _random_streams_seed
+  seed = _random_streams_seed
+  report = []
+  for num_iter in num_iters:
+    interfs = []
+    for replication in range(num_replications):
+      if seed is not None:
+        # Different random streams for each replication.
+        _random_streams_seed = seed + replication
+      try:
+        interfs.append(calcAggregatedInterference(
+            protection_point, low_freq, high_freq, grants, inc_ant_height,
+            num_iter, beamwidth, neighbor_distances, min_azimuth, max_azimuth,
+            do_max=True))
+      finally:
+        _random_streams_seed = seed
+    stats = ConvergenceStats(num_iter=num_iter,
+                             mean=np.mean(interfs), std=np.std(interfs),
+                             min=np.min(interfs), max=np.max(interfs))
+    logging.info('Convergence (%s sampling) - %d iterations: '
+                 '%.3f dBm +/- %.3f dB [%.3f, %.3f]',
+                 _sampling_strategy, num_iter, stats.mean, stats.std,
+                 stats.min, stats.max)
+    report.append(stats)
+  return report
+
+
 class InterferenceCacheManager(cache.CacheManager):
   """Interference cache context manager.
 
   By running the DPA routines within this context manager, pathloss
   calculation are cached per CBSD. Note that subsequent calls (with exact set
   of parameters) will reuse the same reliability random samples.
+  Note: this is not needed with the deterministic random streams (see
+  `SetRandomStreamsSeed()`), which always give the same random samples for
+  a link.
 
   Usage:
     with InterferenceCacheManager() as cm:
@@ -19,7 +19,9 @@ import unittest
 
 import numpy as np
 
+from reference_models.common import data
 from reference_models.dpa import move_list
+from reference_models.geo import drive
 from reference_models.propagation import wf_itm
 from reference_models.tools import entities
 from reference_models.tools import testutils
@@ -32,9 +34,16 @@ class TestDpa(unittest.TestCase):
 
   def setUp(self):
     self.original_itm = wf_itm.CalcItmPropagationLoss
+    # The tests replace the ITM model.
+    move_list.SetBatchedLinks(False)
 
   def tearDown(self):
     wf_itm.CalcItmPropagationLoss = self.original_itm
+    move_list.SetBatchedLinks(True)
+    move_list.SetBatchedAzimuthGains(False)
+    move_list.SetItmQuantileTable(False)
+    move_list.SetSamplingStrategy('uniform')
+    move_list.SetRandomStreamsSeed(None)
 
   def test_movelist_single_grant(self):
     np.random.seed(1248)
@@ -205,5 +214,352 @@ class TestDpa(unittest.TestCase):
     self.assertListEqual(move_grants, [])
 
 
+  def test_find_nc(self):
+    def findNcDirect(I, t):
+      # Binary search with direct sums, for an omni protection antenna.
+      I_mW, t_mW = 10**(I/10.), 10**(t/10.)
+      def aggInterf(n):
+        return np.percentile(np.sum(I_mW[:, 0:n], axis=1),
+                             move_list.PROTECTION_PERCENTILE,
+                             interpolation='lower')
+      if aggInterf(I.shape[1]) <= t_mW:
+        return I.shape[1]
+      hi, lo = I.shape[1], 0
+      while (hi - lo) > 1:
+        mid = (hi + lo) // 2
+        if aggInterf(mid) > t_mW:
+          hi = mid
+        else:
+          lo = mid
+      return lo
+
+    np.random.seed(1248)
+    for _ in range(50):
+      num_grants = np.random.randint(2, 200)
+      I = np.random.normal(-110, 8, size=(50, num_grants))
+      bearings = np.random.uniform(0, 360, num_grants)
+      # Threshold exactly at the aggregate of some first grants.
+      n = np.random.randint(1, num_grants)
+      t = 10*np.log10(np.percentile(np.sum(10**(I[:, 0:n]/10.), axis=1),
+                                    move_list.PROTECTION_PERCENTILE,
+                                    interpolation='lower'))
+      for thresh in [t, t + np.random.uniform(-10, 10)]:
+        self.assertEqual(
+            move_list.find_nc(I, bearings, thresh, 360, 0, 360),
+            findNcDirect(I, thresh))
+
+  def test_aggregate_interference_batched(self):
+    wf_itm.CalcItmPropagationLoss = testutils.FakePropagationPredictor(
+        dist_type='REAL', factor=1.0, offset=(144+30-0.1) - 20.0)
+    point = ProtectionPoint(latitude=36.815, longitude=-76.292)
+    grants = entities.ConvertToCbsdGrantInfo(
+        entities.GenerateCbsdList(
+            20, template_cbsd=entities.CBSD_TEMPLATE_CAT_A_OUTDOOR,
+            ref_latitude=36.815, ref_longitude=-76.292,
+            min_distance_km=5, max_distance_km=50),
+        min_freq_mhz=3600,
+        max_freq_mhz=3610)
+
+    interfs = {}
+    for batched in [False, True]:
+      move_list.SetBatchedAzimuthGains(batched)
+      np.random.seed(1248)
+      interfs[batched] = move_list.calcAggregatedInterference(
+          point, 3600e6, 3610e6, grants, 50, 200, 3, (150, 200, 0, 25),
+          min_azimuth=10, max_azimuth=300)
+    self.assertEqual(len(interfs[True]), len(interfs[False]))
+    self.assertTrue(np.allclose(interfs[True], interfs[False], rtol=0, atol=1e-10))
+
+    # The move lists are the same in both modes.
+    move_grants = {}
+    for batched in [False, True]:
+      move_list.SetBatchedAzimuthGains(batched)
+      np.random.seed(1248)
+      move_grants[batched], _ = move_list.moveListConstraint(
+          point, 3600e6, 3610e6, grants, 50, 200,
+          np.median(interfs[False]), 3, (150, 200, 0, 25))
+    self.assertTrue(move_grants[False])
+    self.assertListEqual(move_grants[True], move_grants[False])
+
+  def test_movelist_shared_path_losses(self):
+    fake_itm = testutils.FakePropagationPredictor(
+        dist_type='REAL', factor=1.0, offset=(144+30-0.1) - 30.0)
+    num_calls = [0]
+    def countingItm(*args, **kwargs):
+      num_calls[0] += 1
+      return fake_itm(*args, **kwargs)
+    wf_itm.CalcItmPropagationLoss = countingItm
+    point = ProtectionPoint(latitude=36.815, longitude=-76.292)
+    # 20 CBSDs with 20MHz grants: each channel sees all of them.
+    grants = entities.ConvertToCbsdGrantInfo(
+        entities.GenerateCbsdList(
+            20, template_cbsd=entities.CBSD_TEMPLATE_CAT_A_OUTDOOR,
+            ref_latitude=36.815, ref_longitude=-76.292,
+            min_distance_km=10, max_distance_km=50),
+        min_freq_mhz=3550,
+        max_freq_mhz=3570)
+    channels = [(3550e6, 3560e6), (3560e6, 3570e6), (3540e6, 3550e6)]
+
+    lists = []
+    for low_freq, high_freq in channels:
+      lists.append(move_list.moveListConstraint(
+          point, low_freq, high_freq, grants,
+          50, 100, -144, 3, (150, 200, 150, 200)))
+    self.assertEqual(num_calls[0], 3 * len(grants))
+
+    num_calls[0] = 0
+    shared_lists = move_list.moveListConstraints(
+        point, channels, grants,
+        50, 100, -144, 3, (150, 200, 150, 200))
+    self.assertEqual(num_calls[0], len(grants))
+    self.assertTrue(lists[0][0])
+    self.assertEqual(len(shared_lists), len(channels))
+    for (move_grants, nbor_grants), (exp_move_grants, exp_nbor_grants) in zip(
+        shared_lists, lists):
+      self.assertListEqual(move_grants, exp_move_grants)
+      self.assertListEqual(nbor_grants, exp_nbor_grants)
+  def test_itm_quantile_table(self):
+    fake_itm = testutils.FakePropagationPredictor(
+        dist_type='REAL', factor=1.0, offset=(144+30-0.1) - 30.0)
+    num_rels = []
+    def reliabilityItm(*args, **kwargs):
+      # Path loss linear with reliability, exactly interpolated by the table.
+      reliabilities = np.asarray(kwargs['reliability'])
+      num_rels.append(len(reliabilities))
+      result = fake_itm(*args, **kwargs)
+      return result._replace(db_loss=result.db_loss + 10 * reliabilities)
+    wf_itm.CalcItmPropagationLoss = reliabilityItm
+    point = ProtectionPoint(latitude=36.815, longitude=-76.292)
+    grants = entities.ConvertToCbsdGrantInfo(
+        entities.GenerateCbsdList(
+            10, template_cbsd=entities.CBSD_TEMPLATE_CAT_A_OUTDOOR,
+            ref_latitude=36.815, ref_longitude=-76.292,
+            min_distance_km=10, max_distance_km=50),
+        min_freq_mhz=3550,
+        max_freq_mhz=3560)
+
+    np.random.seed(1248)
+    exact_losses = list(move_list._iterPathLosses(grants, point, 50, 300))
+    self.assertListEqual(num_rels, [301] * len(grants))
+
+    move_list.SetItmQuantileTable(True)
+    for _ in range(2):
+      num_rels[:] = []
+      np.random.seed(1248)
+      losses = list(move_list._iterPathLosses(grants, point, 50, 300))
+      for (path_loss, _, _), (exact_path_loss, _, _) in zip(losses,
+                                                            exact_losses):
+        self.assertEqual(len(path_loss), 301)
+        self.assertTrue(np.allclose(path_loss, exact_path_loss, atol=1e-9))
+    # Tables computed once per link, and cached.
+    self.assertListEqual(num_rels, [])
+    move_list.ClearQuantileTableCache()
+    list(move_list._iterPathLosses(grants, point, 50, 300))
+    self.assertListEqual(num_rels,
+                         [len(move_list._QUANTILE_TABLE_RELIABILITIES)]
+                         * len(grants))
+    # Reconfiguring the terrain data clears the cache.
+    drive.ConfigureTerrainDriver(terrain_dir=drive.terrain_driver._terrain_dir)
+    self.assertEqual(len(move_list._quantile_tables), 0)
+
+  def test_quantile_table_reliabilities(self):
+    knots = move_list._QUANTILE_TABLE_RELIABILITIES
+    self.assertTrue(np.all(np.diff(knots) > 0))
+    self.assertLess(knots[0], 0.001)
+    self.assertGreater(knots[-1], 0.999)
+    self.assertIn(0.5, knots)
+    # The median is exactly interpolated.
+    table = np.random.uniform(100, 200, (1, len(knots)))
+    self.assertEqual(
+        move_list._interpolateQuantileTables(table, np.array([[0.5]]))[0, 0],
+        table[0, list(knots).index(0.5)])
+
+  def test_lhs_reliabilities(self):
+    move_list.SetSamplingStrategy('lhs')
+    np.random.seed(1248)
+    reliabilities = move_list._drawReliabilities(100)
+    self.assertEqual(len(reliabilities), 101)
+    self.assertEqual(reliabilities[-1], 0.5)
+    # One draw per stratum, in random order.
+    strata = np.floor((reliabilities[:-1] - 0.001) / 0.998 * 100)
+    self.assertListEqual(sorted(strata), list(range(100)))
+    self.assertNotEqual(list(strata), list(range(100)))
+    with self.assertRaises(ValueError):
+      move_list.SetSamplingStrategy('sobol')
+
+  def test_lhs_convergence(self):
+    fake_itm = testutils.FakePropagationPredictor(
+        dist_type='REAL', factor=1.0, offset=(144+30-0.1) - 30.0)
+    def reliabilityItm(*args, **kwargs):
+      # Path loss with a logistic variability.
+      reliabilities = np.asarray(kwargs['reliability'])
+      result = fake_itm(*args, **kwargs)
+      return result._replace(db_loss=result.db_loss + 5 * np.log(
+          reliabilities / (1 - reliabilities)))
+    wf_itm.CalcItmPropagationLoss = reliabilityItm
+    point = ProtectionPoint(latitude=36.815, longitude=-76.292)
+    np.random.seed(1248)
+    grants = entities.ConvertToCbsdGrantInfo(
+        entities.GenerateCbsdList(
+            20, template_cbsd=entities.CBSD_TEMPLATE_CAT_A_OUTDOOR,
+            ref_latitude=36.815, ref_longitude=-76.292,
+            min_distance_km=10, max_distance_km=50),
+        min_freq_mhz=3550,
+        max_freq_mhz=3560)
+    reports = {}
+    for sampling in ['uniform', 'lhs']:
+      move_list.SetSamplingStrategy(sampling)
+      reports[sampling] = move_list.calcInterferenceConvergence(
+          point, 3550e6, 3560e6, grants, 50, [100, 400], 3,
+          (150, 200, 0, 25), num_replications=20)
+    for sampling in ['uniform', 'lhs']:
+      self.assertListEqual([stats.num_iter for stats in reports[sampling]],
+                           [100, 400])
+      self.assertLess(reports[sampling][1].std, reports[sampling][0].std)
+    # LHS has much less Monte Carlo noise.
+    self.assertLess(reports['lhs'][0].std, reports['uniform'][0].std / 2)
+    self.assertLess(reports['lhs'][1].std, reports['uniform'][1].std / 2)
+
+  def test_random_streams(self):
+    fake_itm = testutils.FakePropagationPredictor(
+        dist_type='REAL', factor=1.0, offset=(144+30-0.1) - 30.0)
+    def reliabilityItm(*args, **kwargs):
+      reliabilities = np.asarray(kwargs['reliability'])
+      result = fake_itm(*args, **kwargs)
+      return result._replace(db_loss=result.db_loss + 5 * np.log(
+          reliabilities / (1 - reliabilities)))
+    wf_itm.CalcItmPropagationLoss = reliabilityItm
+    point = ProtectionPoint(latitude=36.815, longitude=-76.292)
+    np.random.seed(1248)
+    grants = entities.ConvertToCbsdGrantInfo(
+        entities.GenerateCbsdList(
+            20, template_cbsd=entities.CBSD_TEMPLATE_CAT_A_OUTDOOR,
+            ref_latitude=36.815, ref_longitude=-76.292,
+            min_distance_km=10, max_distance_km=50),
+        min_freq_mhz=3550,
+        max_freq_mhz=3560)
+    def calcInterference(grants):
+      return move_list.calcAggregatedInterference(
+          point, 3550e6, 3560e6, grants, 50, 200, 3, (150, 200, 0, 25))
+
+    move_list.SetRandomStreamsSeed(12345)
+    link_key = (36.8, -76.3, 3., False, 36.815, -76.292, 50, 200)
+    reliabilities = move_list._drawReliabilities(200, link_key)
+    self.assertEqual(len(reliabilities), 201)
+    self.assertEqual(reliabilities[-1], 0.5)
+    self.assertTrue(np.all(reliabilities >= 0.001) and
+                    np.all(reliabilities < 0.999))
+    np.random.seed(1)
+    self.assertListEqual(list(move_list._drawReliabilities(200, link_key)),
+                         list(reliabilities))
+    self.assertNotEqual(
+        list(move_list._drawReliabilities(200, link_key[:-2] + (40, 200))),
+        list(reliabilities))
+    # Each grant of a CBSD has its own draws, unless the path losses are shared.
+    constraint = data.ProtectionConstraint(
+        latitude=point.latitude, longitude=point.longitude,
+        low_frequency=3550e6, high_frequency=3560e6,
+        entity_type=data.ProtectedEntityType.DPA)
+    other_grant = grants[0]._replace(low_frequency=3555e6)
+    for share_path_loss, same_draws in [(False, False), (True, True)]:
+      draws = [list(move_list._drawReliabilities(
+          200, move_list._randomStreamKey(grant, constraint, 50, 200,
+                                          share_path_loss)))
+               for grant in (grants[0], other_grant)]
+      self.assertEqual(draws[0] == draws[1], same_draws)
+    # Same result whatever the global random state and the order of the links.
+    np.random.seed(1)
+    interf = calcInterference(grants)
+    np.random.seed(2)
+    self.assertTrue(np.allclose(calcInterference(grants[::-1]), interf,
+                                rtol=0, atol=1e-9))
+    self.assertTrue(np.allclose(calcInterference(grants[::-1]), interf,
+                                rtol=0, atol=1e-9))
+    # Different streams for another seed.
+    move_list.SetRandomStreamsSeed(54321)
+    self.assertFalse(np.allclose(calcInterference(grants), interf))
+    # The convergence replications are not identical.
+    report = move_list.calcInterferenceConvergence(
+        point, 3550e6, 3560e6, grants, 50, [100], 3, (150, 200, 0, 25),
+        num_replications=5)
+    self.assertGreater(report[0].std, 0)
+    self.assertEqual(move_list._random_streams_seed, 54321)
+
+  def test_incremental_movelist(self):
+    fake_itm = testutils.FakePropagationPredictor(
+        dist_type='REAL', factor=1.0, offset=(144+30-0.1) - 30.0)
+    def reliabilityItm(*args, **kwargs):
+      reliabilities = np.asarray(kwargs['reliability'])
+      result = fake_itm(*args, **kwargs)
+      return result._replace(db_loss=result.db_loss + 5 * np.log(
+          reliabilities / (1 - reliabilities)))
+    wf_itm.CalcItmPropagationLoss = reliabilityItm
+    point = ProtectionPoint(latitude=36.815, longitude=-76.292)
+    np.random.seed(1248)
+    def generateGrants(num_cbsds, min_freq_mhz, max_freq_mhz,
+                       template_cbsd=entities.CBSD_TEMPLATE_CAT_A_OUTDOOR):
+      return entities.ConvertToCbsdGrantInfo(
+          entities.GenerateCbsdList(
+              num_cbsds, template_cbsd=template_cbsd,
+              ref_latitude=36.815, ref_longitude=-76.292,
+              min_distance_km=3, max_distance_km=60),
+          min_freq_mhz=min_freq_mhz,
+          max_freq_mhz=max_freq_mhz)
+    grants = (generateGrants(30, 3550, 3560) + generateGrants(15, 3555, 3575) +
+              generateGrants(10, 3560, 3570, entities.CBSD_TEMPLATE_CAT_B))
+    # Out of band grants on some of the CBSDs.
+    grants += [grant._replace(low_frequency=3540e6, high_frequency=3550e6)
+               for grant in grants[:5]]
+    channels = [(3540e6, 3550e6), (3550e6, 3560e6), (3560e6, 3570e6)]
+    params = dict(inc_ant_height=50, num_iter=200, threshold=-144, beamwidth=3,
+                  neighbor_distances=(150, 200, 150, 200))
+    for share_path_loss in [True, False]:
+      if not share_path_loss:
+        # Same draws for each grant as in `moveListConstraint()`.
+        move_list.SetRandomStreamsSeed(12345)
+      self._checkIncrementalMoveList(point, channels, grants, params,
+                                     share_path_loss)
+
+  def _checkIncrementalMoveList(self, point, channels, grants, params,
+                                share_path_loss):
+    current_grants = grants[:40]
+    other_grants = grants[40:]
+    inc_move_list = move_list.IncrementalMoveList(
+        point, channels, current_grants, share_path_loss=share_path_loss,
+        **params)
+    if not share_path_loss:
+      self.assertIsNone(inc_move_list._path_losses)
+
+    def checkMoveLists():
+      path_losses = None
+      if share_path_loss:
+        path_losses = dict(inc_move_list._path_losses)
+      for chan_idx, (low_freq, high_freq) in enumerate(channels):
+        move_grants, nbor_grants = move_list.moveListConstraint(
+            point, low_freq, high_freq, current_grants,
+            path_losses=path_losses, **params)
+        self.assertSetEqual(set(inc_move_list.move_lists[chan_idx]),
+                            set(move_grants))
+        self.assertSetEqual(set(inc_move_list.nbor_lists[chan_idx]),
+                            set(nbor_grants))
+      if share_path_loss:
+        # All the path losses were already computed.
+        self.assertEqual(len(path_losses), len(inc_move_list._path_losses))
+
+    checkMoveLists()
+    self.assertTrue(inc_move_list.move_lists[1])
+    rng = np.random.RandomState(0)
+    for _ in range(10):
+      added = [other_grants.pop(rng.randint(len(other_grants)))
+               for _ in range(rng.randint(0, 3))]
+      removed = [current_grants.pop(rng.randint(len(current_grants)))
+                 for _ in range(rng.randint(0, 3))]
+      current_grants.extend(added)
+      other_grants.extend(removed)
+      updated_chan_idxs = inc_move_list.Update(added, removed)
+      if not added and not removed:
+        self.assertListEqual(updated_chan_idxs, [])
+      checkMoveLists()
+
 if __name__ == '__main__':
   unittest.main()
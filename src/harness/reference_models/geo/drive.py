@@ -18,6 +18,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+
 from reference_models.geo import nlcd
 from reference_models.geo import refractivity
 from reference_models.geo import tropoclim
@@ -39,21 +41,67 @@ refract_driver = refractivity.RefractivityIndexer()
 # - county  data.
 county_driver = county.CountyDriver()
 
+# Callbacks invoked when the terrain or ITU data is reconfigured, for
+# invalidating the results derived from that data and memoized elsewhere.
+_data_change_callbacks = []
+
+
+def RegisterDataChangeCallback(callback):
+  """Registers a callback invoked on terrain or ITU data reconfiguration.
+
+  Inputs:
+    callback: a function without arguments.
+  """
+  if callback not in _data_change_callbacks:
+    _data_change_callbacks.append(callback)
+
 
+def _NotifyDataChange():
+  for callback in _data_change_callbacks:
+    callback()
 
-def ConfigureTerrainDriver(terrain_dir=None, cache_size=None):
+
+def ConfigureTerrainDriver(terrain_dir=None, cache_size=None, do_memmap=None):
   """Configure the NED terrain driver.
 
-  Note that memory usage is about cache_size * 50MB.
+  Note that memory usage is about cache_size * 50MB, unless in memory-mapped
+  mode where the tiles are shared by all processes through the OS page cache.
 
   Inputs:
     terrain_dir: if specified, change the terrain directory.
     cache_size:  if specified, change the terrain tile cache size.
+    do_memmap:   if specified, change the memory-mapped mode of tiles.
   """
   if terrain_dir is not None:
     terrain_driver.SetTerrainDirectory(terrain_dir)
+    _NotifyDataChange()
   if cache_size is not None:
     terrain_driver.SetCacheSize(cache_size)
+  if do_memmap is not None:
+    terrain_driver.SetMemoryMapMode(do_memmap)
+
+
+def DataFingerprint():
+  """Returns a fingerprint of the configured terrain, NLCD and ITU data.
+
+  Built from the data locations and the modification times of the ITU files
+  and data directories, for use as a key of persisted results (see
+  |cache.PersistentCache|).
+  """
+  paths = [terrain_driver._terrain_dir, nlcd_driver._nlcd_dir,
+           climate_driver.datafile, refract_driver._datafile]
+  def ModificationTime(path):
+    try:
+      return os.path.getmtime(path)
+    except OSError:
+      return None
+  return repr([(os.path.abspath(path), ModificationTime(path))
+               for path in paths])
+
+
+def NumTerrainTileLoads():
+  """Returns the number of terrain tile loads done so far by this process."""
+  return sum(terrain_driver.stats.LoadOpsCount())
 
 
 def ConfigureNlcdDriver(nlcd_dir=None, cache_size=None):
@@ -77,6 +125,7 @@ def ConfigureItuDrivers(itu_dir=None):
   if itu_dir is not None:
     climate_driver.ConfigureDataFile(itu_dir)
     refract_driver.ConfigureDataFile(itu_dir)
+    _NotifyDataChange()
 
 
 def ConfigureCountyDriver(county_dir=None):
@@ -29,11 +29,13 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import logging
 import os
 import threading
 import time
 
 import numpy as np
+from six.moves import queue
 
 from reference_models.geo import CONFIG
 from reference_models.geo import tiles
@@ -45,6 +47,7 @@ _NUM_PIXEL_OVERLAP = 6 # Number of pixel overlap in tiles
 _TILE_BASE_DIM = 3600
 _TILE_DIM = _TILE_BASE_DIM + 2 * _NUM_PIXEL_OVERLAP # Dimension of a tile
 _TILES_KEYS = tiles.NED_TILES
+_PREFETCH_QUEUE_SIZE = 16 # Maximum number of pending tile prefetches
 
 class TerrainDriver:
   """TerrainDriver class to retrieve elevation data.
@@ -55,18 +58,34 @@ class TerrainDriver:
    - set the cache_size to the appropriate value for the region size.
   One tile being 1x1 degrees typically covers around 110km x 90km in continental US.
 
+  Tiles can be either loaded in process memory, or memory-mapped from the
+  tile files (see `SetMemoryMapMode()`). In memory-mapped mode, all processes
+  reading the same tile (such as the `mpool` workers) share a single copy of
+  the tile held in the OS page cache, instead of each holding a private 50MB
+  copy.
+
+  Tiles can also be prefetched by a background I/O thread (see `Prefetch()`),
+  when the tiles needed by some upcoming work are known in advance, so that
+  the tile reading is overlapped with the computation instead of stalling it.
+
   Attributes:
     cache_size (int): maximum number of tiles cached in memory.
-      Memory usage is about 50MB per tile.
+      Memory usage is about 50MB per tile (when not memory-mapped).
     stats (|tile.TileStats|): a tile statistic counter.
 
   Typical usage:
     # Initialize driver
     driver = TerrainDriver(cache_size=8)
 
+    # Optionally use memory-mapped tiles, shared across processes
+    driver.SetMemoryMapMode(True)
+
     # Get the altitude in one or several locations
     altitudes = driver.GetTerrainElevation(lat, lon, do_interp=True)
 
+    # Optionally prefetch in background the tiles needed by upcoming work
+    driver.Prefetch([(38, -123), (38, -122)])
+
     # Get profile between 2 location with target resolution 30m
     its_profile = driver.TerrainProfile(lat1, lon1, lat2, lon2,
                                         target_res_meters=30, max_points=1501)
@@ -78,7 +97,7 @@ class TerrainDriver:
     driver.stats.Report()  # simple statistic reporting
     driver.stats.Reset()   # reset the statistic counter
   """
-  def __init__(self, terrain_directory=None, cache_size=8):
+  def __init__(self, terrain_directory=None, cache_size=8, do_memmap=False):
     self.SetTerrainDirectory(terrain_directory)
     self.SetCacheSize(cache_size)
     # Keep a small tile cache, LRU fashion
@@ -87,6 +106,32 @@ class TerrainDriver:
     self.stats = tiles.TileStats('ned')
     self._lock = threading.Lock()
     self.do_flat = False
+    self.do_memmap = do_memmap
+    # Tiles being loaded, as a dict of key: threading.Event.
+    self._loading_tiles = {}
+    # Prefetched tiles not yet used, which are not evicted from the cache, as
+    # a dict of key: number of demand loads at prefetch time.
+    self._prefetched_tiles = {}
+    self._num_demand_loads = 0
+    # The background prefetch thread, started on first use in each process.
+    self._prefetch_queue = None
+    self._prefetch_thread = None
+    self._pid = os.getpid()
+
+  def _ResetIfForked(self):
+    """Resets the loading state inherited from the parent process after a fork.
+
+    The prefetch thread does not survive a process fork (such as the `mpool`
+    workers): the tiles it was loading would never be signaled as loaded, and
+    its lock could be held forever.
+    """
+    if self._pid != os.getpid():
+      self._lock = threading.Lock()
+      self._loading_tiles = {}
+      self._prefetched_tiles = {}
+      self._prefetch_queue = None
+      self._prefetch_thread = None
+      self._pid = os.getpid()
 
   def SetTerrainDirectory(self, terrain_directory):
     """Configures the terrain data directory."""
@@ -105,6 +150,30 @@ class TerrainDriver:
     """
     self.do_flat = do_flat
 
+  def SetMemoryMapMode(self, do_memmap=False):
+    """Sets the driver in memory-mapped mode.
+
+    In this mode, tiles are opened with `np.memmap` in read-only mode instead
+    of being read in memory. The tile data is then held in the OS page cache
+    and shared by all processes using the same tile files, and only the pages
+    actually accessed are read from disk.
+    The tile cache then manages mappings instead of arrays: evicting a tile
+    only releases the mapping. As a mapping is cheap, a bigger `cache_size`
+    can be used in this mode.
+
+    Changing the mode flushes the tile cache.
+
+    Inputs:
+      do_memmap (bool): if True, the tiles are memory-mapped.
+    """
+    self._ResetIfForked()
+    with self._lock:
+      if do_memmap != self.do_memmap:
+        self._tile_cache.clear()
+        self._tile_lru.clear()
+        self._prefetched_tiles.clear()
+      self.do_memmap = do_memmap
+
   def SetCacheSize(self, cache_size):
     """Configures the cache size."""
     if cache_size < 1: cache_size = 1
@@ -118,8 +187,10 @@ class TerrainDriver:
     """Returns a given tile as a 2D array, or None if unmanaged tile.
 
     This routine manages the tile cache.
+    In memory-mapped mode, the returned array is a read-only `np.memmap`.
     For tiles not in the database, returns None.
     If a tile in the database cannot be read, raises an exception.
+    If the tile is being prefetched, waits for the end of its loading.
 
     Inputs:
       ilat, ilon (int): integer coordinates of NW corner.
@@ -127,44 +198,164 @@ class TerrainDriver:
     Raises:
       IOError: if an expected tile cannot be read
     """
+    self._ResetIfForked()
     key = (ilat, ilon)
+    while True:
+      with self._lock:
+        # Manage the cases of mem-loaded or unmanaged tiles.
+        try:
+          tile = self._tile_cache[key]
+          self._CacheLruUpdate(key)
+          if key in self._prefetched_tiles:
+            del self._prefetched_tiles[key]
+            self.stats.UpdateForPrefetchHit(ilat, ilon)
+          return tile
+        except KeyError:
+          if key not in _TILES_KEYS:
+            return None
+        loaded_event = self._loading_tiles.get(key)
+        if loaded_event is None:
+          loaded_event = threading.Event()
+          self._loading_tiles[key] = loaded_event
+          break
+      # Wait for the tile being loaded by the prefetch thread, and retry (in
+      # case that load failed).
+      loaded_event.wait()
+
+    return self._LoadTile(key, loaded_event)
+
+  def _TileFilePath(self, ilat, ilon):
+    """Returns the file path of a tile."""
+    encoding = '%c%02d%c%03d' % (
+        'sn'[int(ilat >= 0)], abs(ilat),
+        'we'[int(ilon >= 0)], abs(ilon))
+    tile_name1 = 'usgs_ned_1_' + encoding + '_gridfloat_std.flt'
+    tile_name2 = 'float' + encoding + '_1_std.flt'
+    tile_name = (tile_name1
+                 if os.path.isfile(os.path.join(self._terrain_dir, tile_name1))
+                 else tile_name2)
+    return os.path.join(self._terrain_dir, tile_name)
+
+  def _LoadTile(self, key, loaded_event, prefetch=False):
+    """Loads a tile in the cache and returns it.
+
+    The tile is read outside of the driver lock, so that other threads can
+    still access the cached tiles, while concurrent requests of the same tile
+    wait for that load (see `GetTile()`).
 
+    Inputs:
+      key: the tile (ilat, ilon) key.
+      loaded_event: the `threading.Event` registered for that key in
+        `_loading_tiles` by the caller (under lock), set at end of loading.
+      prefetch (bool): if True, the tile is loaded by the prefetch thread, and
+        kept in cache until first used (see `Prefetch()`).
+
+    Raises:
+      IOError: if the tile cannot be read
+    """
+    ilat, ilon = key
     with self._lock:
-      # Manage the cases of mem-loaded or unmanaged tiles.
-      try:
-        tile = self._tile_cache[key]
-        self._CacheLruUpdate(key)
-        return tile
-      except KeyError:
-        if key not in _TILES_KEYS:
-          return None
-
-      # Load a tile in memory and manage the cache.
-      encoding = '%c%02d%c%03d' % (
-          'sn'[int(ilat >= 0)], abs(ilat),
-          'we'[int(ilon >= 0)], abs(ilon))
-      tile_name1 = 'usgs_ned_1_' + encoding + '_gridfloat_std.flt'
-      tile_name2 = 'float' + encoding + '_1_std.flt'
-      tile_name = (tile_name1
-                   if os.path.isfile(os.path.join(self._terrain_dir, tile_name1))
-                   else tile_name2)
+      do_memmap = self.do_memmap
 
+    try:
+      # Load a tile in memory.
       try:
-        self._tile_cache[key] = np.fromfile(
-            os.path.join(self._terrain_dir, tile_name),
-            dtype=np.float32).reshape(_TILE_DIM, _TILE_DIM)
-      except IOError:
+        if do_memmap:
+          tile = np.memmap(self._TileFilePath(ilat, ilon),
+                           dtype=np.float32, mode='r',
+                           shape=(_TILE_DIM, _TILE_DIM))
+        else:
+          tile = np.fromfile(self._TileFilePath(ilat, ilon),
+                             dtype=np.float32).reshape(_TILE_DIM, _TILE_DIM)
+      except (IOError, ValueError):
         raise IOError('NED Tile (%d,%d) not found.' % (ilat, ilon))
 
-      # Check cache size and evict oldest
-      if len(self._tile_cache) > self.cache_size:
-        key_to_evict = min(self._tile_lru, key=self._tile_lru.get)
-        self._tile_cache.pop(key_to_evict)
-        self._tile_lru.pop(key_to_evict)
-      self._CacheLruUpdate(key)
-      self.stats.UpdateForTileLoad(ilat, ilon)
+      with self._lock:
+        # Manage the cache.
+        self._tile_cache[key] = tile
+        if prefetch:
+          self._prefetched_tiles[key] = self._num_demand_loads
+        else:
+          # Expire the prefetched tiles still not used after many demand loads,
+          # (the linked tiles can include some tiles never actually read).
+          self._num_demand_loads += 1
+          for k, num_loads in list(self._prefetched_tiles.items()):
+            if self._num_demand_loads - num_loads > self.cache_size:
+              del self._prefetched_tiles[k]
+        # Check cache size and evict oldest, except the prefetched tiles not
+        # yet used.
+        # For memory-mapped tiles, this releases the mapping once no more
+        # referenced by the caller.
+        if len(self._tile_cache) > self.cache_size:
+          evictable_keys = [k for k in self._tile_lru
+                            if k not in self._prefetched_tiles]
+          if evictable_keys:
+            key_to_evict = min(evictable_keys, key=self._tile_lru.get)
+            self._tile_cache.pop(key_to_evict)
+            self._tile_lru.pop(key_to_evict)
+        self._CacheLruUpdate(key)
+        self.stats.UpdateForTileLoad(ilat, ilon, mapped=do_memmap,
+                                     prefetched=prefetch)
+      return tile
+
+    finally:
+      with self._lock:
+        del self._loading_tiles[key]
+      loaded_event.set()
+
+  def Prefetch(self, tile_keys):
+    """Prefetches some tiles in the background.
+
+    The tiles are loaded in the cache by a background I/O thread, in the order
+    of the request, and are not evicted from the cache before being used, unless
+    more than `cache_size` demand loads (cache misses) happen in the meantime.
+    This is a hint only: the tiles already cached or being loaded are ignored,
+    and the requests exceeding the capacity of the prefetch queue or of the
+    cache (at most `cache_size-1` prefetched tiles not yet used) are dropped.
+    The tiles that cannot be read are also ignored, the error being raised by
+    the later `GetTile()` call.
 
-      return self._tile_cache[key]
+    Inputs:
+      tile_keys: an iterable of the (ilat, ilon) integer coordinates of the
+        NW corner of the tiles (see |tiles.NeighborhoodTiles()|).
+    """
+    if self.do_flat:
+      return
+    self._ResetIfForked()
+    if self._prefetch_thread is None:
+      self._prefetch_queue = queue.Queue(maxsize=_PREFETCH_QUEUE_SIZE)
+      self._prefetch_thread = threading.Thread(
+          target=self._PrefetchLoop, args=(self._prefetch_queue,))
+      self._prefetch_thread.daemon = True
+      self._prefetch_thread.start()
+    for key in tile_keys:
+      key = (int(key[0]), int(key[1]))
+      if key not in _TILES_KEYS:
+        continue
+      with self._lock:
+        if key in self._tile_cache or key in self._loading_tiles:
+          continue
+      try:
+        self._prefetch_queue.put_nowait(key)
+      except queue.Full:
+        break
+
+  def _PrefetchLoop(self, prefetch_queue):
+    """Loads the tiles of the prefetch queue (background thread routine)."""
+    while True:
+      key = prefetch_queue.get()
+      try:
+        with self._lock:
+          if (key in self._tile_cache or key in self._loading_tiles
+              or len(self._prefetched_tiles) >= self.cache_size - 1):
+            continue
+          loaded_event = threading.Event()
+          self._loading_tiles[key] = loaded_event
+        self._LoadTile(key, loaded_event, prefetch=True)
+      except Exception as e:
+        logging.debug('Terrain tile prefetch failed: %s', e)
+      finally:
+        prefetch_queue.task_done()
 
   def GetTerrainElevation(self, lat, lon, do_interp=True):
     """Retrieves the elevation for one or several points.
@@ -221,15 +412,19 @@ class TerrainDriver:
     # It would be:
     #  ilatlon = np.column_stack((ilat, ilon))
     #  unique_ilatlon = np.unique(ilatlon, axis=0)
-    ilatlon = ilat + 1j*ilon
-    unique_ilatlon = np.unique(ilatlon)
-    for key in unique_ilatlon:
-      tile_cache = self.GetTile(key.real, key.imag)
+    if len(lat) and ilat.min() == ilat.max() and ilon.min() == ilon.max():
+      # All points on the same tile (such as a radial from a CBSD).
+      tiles_idx = [(ilat[0], ilon[0], slice(None))]
+    else:
+      ilatlon = ilat + 1j*ilon
+      tiles_idx = [(key.real, key.imag, np.where(ilatlon == key)[0])
+                   for key in np.unique(ilatlon)]
+    for tile_ilat, tile_ilon, idx in tiles_idx:
+      tile_cache = self.GetTile(tile_ilat, tile_ilon)
       if tile_cache is None:
         # Nothing to set, all values already at 0
         continue
 
-      idx = np.where(ilatlon == key)[0]
       if do_interp:
         ymxm = tile_cache[ym[idx], xm[idx]]
         ymxp = tile_cache[ym[idx], xp[idx]]
@@ -302,6 +497,80 @@ class TerrainDriver:
     elev.extend(self.GetTerrainElevation(lats, lons, do_interp))
     return elev
 
+  def TerrainProfiles(self, lats1, lons1, lat2, lon2,
+                      target_res_meter=-1,
+                      target_res_arcsec=1,
+                      do_interp=True,
+                      max_points=-1):
+    """Returns the terrain profiles between several points and a common point.
+
+    This is a batched version of `TerrainProfile()`, typically used for getting
+    the profiles from all neighbor CBSDs to a protection point, or from a CBSD
+    to all points of a radial. All the geodesics are sampled in a single
+    vectorized pass, and the terrain elevation of all points read in one pass
+    (grouping points per tile).
+    Each returned profile is identical to the one returned by `TerrainProfile()`.
+
+    Inputs:
+      lats1, lons1: sequences of N starting point coordinates (in degrees), or
+        the coordinates of a common starting point.
+      lat2, lon2: coordinates of the common final point (in degrees), or
+        sequences of N final point coordinates.
+      target_res_meter: target resolution between points (in meters).
+        If unspecified, uses 'target_res_arcsec' instead.
+      target_res_arcsec: target resolution between 2 point (in arcsec).
+        Only used if 'target_res_meter' unspecified.
+      do_interp: if True (default), use bilinear interpolation on terrain data.
+      max_points: if positive, resolution extended if number of points is beyond
+                  this number.
+
+    Returns:
+      a tuple (its_elevs, num_points) of:
+        its_elevs: a 2D ndarray of the N profiles in the ITS format, padded with
+          zeros. The profile from point k is `its_elevs[k, :num_points[k]+2]`:
+            its_elevs[k, 0] = number of terrain points - 1 (i.e., number of intervals)
+            its_elevs[k, 1] = distance between sample points (meters)
+            its_elevs[k, 2:num_points[k]+2] = Terrain elevation (meters)
+        num_points: an ndarray of the number of terrain points of each profile.
+    """
+    if target_res_meter < 0:
+      target_res_meter = _RADIUS_EARTH_METERS * np.radians(target_res_arcsec/3600.)
+
+    lats1, lons1, lats2, lons2 = [
+        np.atleast_1d(coords) for coords in np.broadcast_arrays(
+            np.asarray(lats1, dtype=float), np.asarray(lons1, dtype=float),
+            np.asarray(lat2, dtype=float), np.asarray(lon2, dtype=float))]
+
+    # Distance between end points (m)
+    dists, bearings, _ = vincenty.GeodesicDistanceBearings(
+        lats1, lons1, lats2, lons2)
+
+    num_points = np.ceil(dists*1000./float(target_res_meter)) + 1
+    if max_points > 0:
+      num_points = np.minimum(num_points, max_points)
+    num_points = np.maximum(num_points, 2)
+    resolutions = dists*1000. / (num_points-1)
+
+    # Sample all geodesics
+    step_kms = dists / (num_points-1)
+    lats, lons, _ = vincenty.GeodesicPointsMulti(
+        lats1, lons1,
+        [step_km * np.arange(0, npts) for step_km, npts in zip(step_kms, num_points)],
+        bearings)
+    last_idxs = np.cumsum(num_points).astype(int) - 1
+    first_idxs = last_idxs - num_points.astype(int) + 1
+    lats[first_idxs], lons[first_idxs] = lats1, lons1
+    lats[last_idxs], lons[last_idxs] = lats2, lons2
+
+    # Pack the profiles in a padded array
+    max_num_points = int(np.max(num_points)) if len(num_points) else 0
+    its_elevs = np.zeros((len(lats1), max_num_points + 2))
+    its_elevs[:, 0] = num_points - 1
+    its_elevs[:, 1] = resolutions
+    mask = np.arange(max_num_points) < num_points[:, np.newaxis]
+    its_elevs[:, 2:][mask] = self.GetTerrainElevation(lats, lons, do_interp)
+    return its_elevs, num_points.astype(int)
+
   def ComputeNormalizedHaat(self, lat, lon):
     """Computes normalized HAAT (Height Above Average Terrain).
 
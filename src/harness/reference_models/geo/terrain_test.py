@@ -20,9 +20,11 @@ import logging
 import numpy as np
 import unittest
 import shutil
+import threading
 
 from reference_models.tools import testutils
 from reference_models.geo import terrain
+from reference_models.geo import tiles
 
 
 TEST_DIR = os.path.join(os.path.dirname(__file__),'testdata', 'ned')
@@ -139,6 +141,112 @@ class TestTerrain(unittest.TestCase):
     self.assertEqual(len(self.terrain_driver._tile_cache), 2)
     self.assertEqual(len(self.terrain_driver._tile_lru), 2)
 
+  def test_memmap(self):
+    lats = 36.5 + np.arange(0.01, 0.99, 0.01)
+    lons = -122.99 + np.arange(0.01, 0.99, 0.01)
+    elev_ref = self.terrain_driver.GetTerrainElevation(lats, lons, True)
+    self.assertEqual(self.terrain_driver.stats.LoadOpsCount(), (0, 2))
+
+    self.terrain_driver.SetMemoryMapMode(True)
+    self.assertEqual(len(self.terrain_driver._tile_cache), 0)
+    elev = self.terrain_driver.GetTerrainElevation(lats, lons, True)
+    self.assertEqual(np.max(np.abs(elev - elev_ref)), 0)
+    self.assertIsInstance(self.terrain_driver.GetTile(38, -123), np.memmap)
+    self.assertEqual(self.terrain_driver.stats.LoadOpsCount(), (2, 2))
+
+    # Eviction of mappings
+    self.terrain_driver = terrain.TerrainDriver(TEST_DIR, cache_size=1,
+                                                do_memmap=True)
+    elev = self.terrain_driver.GetTerrainElevation(lats, lons, False)
+    self.assertEqual(len(self.terrain_driver._tile_cache), 1)
+    self.assertEqual(len(self.terrain_driver._tile_lru), 1)
+
+  def test_prefetch(self):
+    lats = 36.5 + np.arange(0.01, 0.99, 0.01)
+    lons = -122.99 + np.arange(0.01, 0.99, 0.01)
+    elev_ref = self.terrain_driver.GetTerrainElevation(lats, lons, True)
+
+    self.terrain_driver = terrain.TerrainDriver(TEST_DIR, cache_size=3)
+    self.terrain_driver.Prefetch([(38, -123), (37, -123), (38, -122)])
+    self.terrain_driver._prefetch_queue.join()
+    # The missing tile (38, -122) is ignored by the prefetch.
+    self.assertSetEqual(set(self.terrain_driver._tile_cache),
+                        {(38, -123), (37, -123)})
+    self.assertEqual(self.terrain_driver.stats.PrefetchCount(), (2, 0, 0))
+    elev = self.terrain_driver.GetTerrainElevation(lats, lons, True)
+    self.assertEqual(np.max(np.abs(elev - elev_ref)), 0)
+    self.assertEqual(self.terrain_driver.stats.PrefetchCount(), (2, 2, 0))
+    with self.assertRaises(IOError):
+      self.terrain_driver.GetTile(38, -122)
+
+    # Prefetched tiles are not evicted before use.
+    self.terrain_driver = terrain.TerrainDriver(TEST_DIR, cache_size=2)
+    self.terrain_driver.Prefetch([(37, -123)])
+    self.terrain_driver._prefetch_queue.join()
+    self.terrain_driver.SetCacheSize(1)
+    self.terrain_driver.GetTile(38, -123)
+    self.assertEqual(len(self.terrain_driver._tile_cache), 2)
+    self.terrain_driver.GetTile(37, -123)
+    self.assertEqual(self.terrain_driver.stats.PrefetchCount(), (1, 1, 1))
+
+    # Prefetched tiles never used expire after more than `cache_size` demand
+    # loads.
+    self.terrain_driver = terrain.TerrainDriver(TEST_DIR, cache_size=2)
+    self.terrain_driver.Prefetch([(37, -123)])
+    self.terrain_driver._prefetch_queue.join()
+    self.terrain_driver.SetCacheSize(1)
+    for _ in range(2):
+      self.terrain_driver.GetTile(38, -123)
+      del self.terrain_driver._tile_cache[(38, -123)]
+      del self.terrain_driver._tile_lru[(38, -123)]
+    self.assertNotIn((37, -123), self.terrain_driver._tile_cache)
+    self.assertEqual(len(self.terrain_driver._prefetched_tiles), 0)
+    self.assertEqual(self.terrain_driver.stats.PrefetchCount(), (1, 0, 2))
+
+    # No prefetch beyond the cache capacity.
+    self.terrain_driver = terrain.TerrainDriver(TEST_DIR, cache_size=1)
+    self.terrain_driver.Prefetch([(37, -123)])
+    self.terrain_driver._prefetch_queue.join()
+    self.assertEqual(len(self.terrain_driver._tile_cache), 0)
+    self.assertEqual(self.terrain_driver.stats.PrefetchCount(), (0, 0, 0))
+
+  def test_prefetch_after_fork(self):
+    # A tile being loaded by the prefetch thread of the parent process.
+    self.terrain_driver._loading_tiles[(38, -123)] = threading.Event()
+    self.terrain_driver._prefetched_tiles[(37, -123)] = 0
+    self.terrain_driver._pid = None  # Simulates the fork
+    self.assertIsNotNone(self.terrain_driver.GetTile(38, -123))
+    self.assertEqual(len(self.terrain_driver._loading_tiles), 0)
+    self.assertEqual(len(self.terrain_driver._prefetched_tiles), 0)
+
+  def test_links_tiles(self):
+    # From tile (38, -123) to tiles (38, -122) and (37, -123), crossing
+    # tile (37, -122) for the diagonal link.
+    keys = tiles.LinksTiles(37.5, -122.5, [37.5, 36.5, 36.6],
+                            [-121.5, -122.5, -121.6])
+    self.assertEqual(keys[0], (38, -123))
+    self.assertSetEqual(set(keys),
+                        {(38, -123), (38, -122), (37, -123), (37, -122)})
+    self.assertListEqual(tiles.LinksTiles(37.5, -122.5, [], []), [(38, -123)])
+
+  def test_profiles(self):
+    lats1 = 36.5 + np.arange(0.01, 0.99, 0.07)
+    lons1 = -122.99 + np.arange(0.01, 0.99, 0.07)
+    lat2, lon2 = 37.6, -122.4
+    its_elevs, num_points = self.terrain_driver.TerrainProfiles(
+        lats1, lons1, lat2, lon2,
+        target_res_meter=30., do_interp=True, max_points=1501)
+    self.assertEqual(len(its_elevs), len(lats1))
+    for its_elev, npts, lat1, lon1 in zip(its_elevs, num_points, lats1, lons1):
+      its_elev_ref = self.terrain_driver.TerrainProfile(
+          lat1, lon1, lat2, lon2,
+          target_res_meter=30., do_interp=True, max_points=1501)
+      self.assertEqual(npts + 2, len(its_elev_ref))
+      # The vectorized Vincenty only matches the scalar one to a few ULPs.
+      self.assertEqual(its_elev[0], its_elev_ref[0])
+      for h, h_ref in zip(its_elev[1:npts+2], its_elev_ref[1:]):
+        self.assertAlmostEqual(h, h_ref, 6)
+      self.assertEqual(np.max(np.abs(its_elev[npts+2:]), initial=0), 0)
 
   def test_haat(self):
     # Twin Peaks - SF
@@ -17,7 +17,8 @@
 This allows the NED and NLCD drivers to actually detect if there is an issue
 when reading a tile (such as missing tile) and fail gracefully.
 
-Also provides a simple statistic counter for tile hit analysis.
+Also provides a simple statistic counter for tile hit analysis, and the tiles
+covering the neighborhood of a point for grouping requests by tiles.
 """
 
 from __future__ import absolute_import
@@ -26,6 +27,9 @@ from __future__ import print_function
 
 import numpy as np
 
+# Minimum length of a degree of latitude, or of longitude at equator (km).
+_MIN_KM_PER_DEG = 110.5
+
 
 class TileStats(object):
   """Tile access statistics & analysis.
@@ -35,24 +39,64 @@ class TileStats(object):
     self._tiles_set = NED_TILES if type == 'ned' else NLCD_TILES
     self.Reset()
 
-  def UpdateForTileLoad(self, ilat, ilon):
+  def UpdateForTileLoad(self, ilat, ilon, mapped=False, prefetched=False):
+    """Records a tile load, either in memory or as a memory mapping.
+
+    The load is either a prefetch (see |terrain.TerrainDriver.Prefetch()|) or
+    a demand load.
+    """
     if (ilat, ilon) not in self._tiles_set:
       return
     self.tiles_stats[(ilat, ilon)] += 1
+    if mapped:
+      self.mapped_stats[(ilat, ilon)] += 1
+    if prefetched:
+      self.prefetch_stats[(ilat, ilon)] += 1
+
+  def UpdateForPrefetchHit(self, ilat, ilon):
+    """Records the first use of a prefetched tile."""
+    if (ilat, ilon) not in self._tiles_set:
+      return
+    self.prefetch_hits[(ilat, ilon)] += 1
 
   def ActiveTilesCount(self):
     counts = [cnt for cnt in self.tiles_stats.values() if cnt > 0]
     num_active_tiles = len(counts)
     return (num_active_tiles, [0] if not counts else counts)
 
+  def LoadOpsCount(self):
+    """Returns the number of load ops as a tuple (#mapped, #loaded)."""
+    num_mapped = sum(self.mapped_stats.values())
+    num_loaded = sum(self.tiles_stats.values()) - num_mapped
+    return num_mapped, num_loaded
+
+  def PrefetchCount(self):
+    """Returns the prefetch stats as a tuple (#prefetched, #hits, #demand).
+
+    With #prefetched the number of tiles loaded by prefetch, #hits the number
+    of those actually used, and #demand the number of demand loads.
+    """
+    num_prefetched = sum(self.prefetch_stats.values())
+    num_hits = sum(self.prefetch_hits.values())
+    num_demand = sum(self.tiles_stats.values()) - num_prefetched
+    return num_prefetched, num_hits, num_demand
+
   def Reset(self):
     self.tiles_stats = {tile: 0 for tile in self._tiles_set}
+    self.mapped_stats = {tile: 0 for tile in self._tiles_set}
+    self.prefetch_stats = {tile: 0 for tile in self._tiles_set}
+    self.prefetch_hits = {tile: 0 for tile in self._tiles_set}
 
   def Report(self):
     num_active_tiles, counts = self.ActiveTilesCount()
+    num_mapped, num_loaded = self.LoadOpsCount()
     print("Used tiles: {total} / {max}".format(
         total=num_active_tiles, max=len(self._tiles_set)))
-    print("Total load ops: {total}".format(total=sum(counts)))
+    print("Total load ops: {total} (mapped: {mapped}, loaded: {loaded})".format(
+        total=sum(counts), mapped=num_mapped, loaded=num_loaded))
+    num_prefetched, num_hits, num_demand = self.PrefetchCount()
+    print("Prefetch loads: {prefetched} (hits: {hits}), demand loads: {demand}".format(
+        prefetched=num_prefetched, hits=num_hits, demand=num_demand))
     print("Active tiles statistics (#loads per used tiles):")
     print("  Avg:{avg} (std={std})".format(
         avg=np.mean(counts), std=np.std(counts)))
@@ -60,6 +104,72 @@ class TileStats(object):
         min=np.min(counts), max=np.max(counts)))
 
 
+def NeighborhoodTiles(latitude, longitude, radius_km, type='ned'):
+  """Returns the tiles covering the neighborhood of a point.
+
+  The neighborhood is approximated by its lat/lon bounding box, which is
+  slightly larger than the actual disk.
+
+  Inputs:
+    latitude, longitude: The point coordinates (degrees).
+    radius_km: The neighborhood radius (km).
+    type: The tile type, either 'ned' or 'nlcd'.
+
+  Returns:
+    A frozenset of the (ilat, ilon) integer coordinates of the tiles NW corner.
+  """
+  tiles_set = NED_TILES if type == 'ned' else NLCD_TILES
+  delta_lat = radius_km / _MIN_KM_PER_DEG
+  max_abs_lat = min(abs(latitude) + delta_lat, 89.)
+  delta_lon = min(radius_km / (_MIN_KM_PER_DEG * np.cos(np.radians(max_abs_lat))),
+                  180.)
+  ilats = range(int(np.ceil(latitude - delta_lat)),
+                int(np.ceil(latitude + delta_lat)) + 1)
+  ilons = range(int(np.floor(longitude - delta_lon)),
+                int(np.floor(longitude + delta_lon)) + 1)
+  return frozenset((ilat, ilon) for ilat in ilats for ilon in ilons
+                   if (ilat, ilon) in tiles_set)
+
+
+def LinksTiles(latitude, longitude, lats, lons, step_deg=0.05, type='ned'):
+  """Returns the tiles crossed by the links from a point to other locations.
+
+  The links are approximated by straight lines in lat/lon coordinates, sampled
+  every `step_deg`, which is close to the great circle paths for the short
+  distances of the neighborhoods.
+
+  Inputs:
+    latitude, longitude: The point coordinates (degrees).
+    lats, lons: The other locations coordinates (degrees), as iterables.
+    step_deg: The sampling step (degrees) of the links.
+    type: The tile type, either 'ned' or 'nlcd'.
+
+  Returns:
+    A list of the (ilat, ilon) integer coordinates of the tiles NW corner,
+    ordered with the most crossed tiles first (the tile of the point being
+    always first).
+  """
+  tiles_set = NED_TILES if type == 'ned' else NLCD_TILES
+  lats = np.asarray(lats, dtype=float)
+  lons = np.asarray(lons, dtype=float)
+  point_key = (int(np.ceil(latitude)), int(np.floor(longitude)))
+  keys = [point_key] if point_key in tiles_set else []
+  if not len(lats):
+    return keys
+  max_delta = max(np.max(np.abs(lats - latitude)),
+                  np.max(np.abs(lons - longitude)))
+  fractions = np.linspace(0, 1, int(np.ceil(max_delta / step_deg)) + 2)
+  ilats = np.ceil(latitude + np.outer(lats - latitude, fractions))
+  ilons = np.floor(longitude + np.outer(lons - longitude, fractions))
+  # Pack the lat/lon in complex numbers, as in |terrain.TerrainDriver|.
+  ilatlons, counts = np.unique(ilats + 1j*ilons, return_counts=True)
+  for idx in np.argsort(-counts, kind='mergesort'):
+    key = (int(ilatlons[idx].real), int(ilatlons[idx].imag))
+    if key != point_key and key in tiles_set:
+      keys.append(key)
+  return keys
+
+
 NED_TILES = frozenset([
     ( 6, 162), (44, -81), (67,-165),
     ( 6, 163), (44, -82), (67,-166),
@@ -473,8 +473,12 @@ def GetClosestCanadianBorderPoint(latitude, longitude, max_dist_km):
   return closest[1][1], closest[1][0], closest_dist, closest_bearing
 
 def _distancesOfPoints(latitude, longitude, points):
-  return [(vincenty.GeodesicDistanceBearing(latitude, longitude, point[1], point[0]), point)
-          for point in zip(*points.xy)]
+  lons, lats = points.xy
+  dists, bearings, rev_bearings = vincenty.GeodesicDistanceBearings(
+      latitude, longitude, lats, lons)
+  return [((dist, bearing, rev_bearing), point)
+          for dist, bearing, rev_bearing, point in zip(
+              dists, bearings, rev_bearings, zip(lons, lats))]
 
 def _angleBetween(angle, min_angle, max_angle):
   """Check if `angle` falls between `min_angle` and `max_angle`."""
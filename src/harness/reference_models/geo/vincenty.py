@@ -33,6 +33,20 @@ from math import pi, radians, degrees, atan, atan2, tan, cos, sin
 import numpy as np
 
 
+# Distance margin (km) of the vectorized distances, within which a distance
+# check is done again with the scalar routine.
+_RECHECK_DIST_KM = 1e-6
+
+
+def _Pow(x, y):
+  """Elementwise `x**y` using the math library `pow`.
+
+  The ndarray `**` operator special cases the square and square root, which may
+  round differently than the scalar `**` used in the scalar routines.
+  """
+  return np.power(x, y)
+
+
 def GeodesicDistanceBearing(lat1, lon1, lat2, lon2, accuracy=1.0E-12):
   """Calculates distance and bearings between two points.
 
@@ -123,6 +137,145 @@ def GeodesicDistanceBearing(lat1, lon1, lat2, lon2, accuracy=1.0E-12):
   return s, alpha1, alpha2
 
 
+def GeodesicDistanceBearings(lat1, lon1, lats2, lons2, accuracy=1.0E-12):
+  """Calculates distances and bearings between one point and several points.
+
+  This routine version is similar to `GeodesicDistanceBearing` but takes a
+  sequence of final points, and performs an efficient vectorized operation
+  internally. The lambda convergence is iterated on the subset of points not
+  yet converged, with the same operations as the scalar version.
+
+  Inputs:
+    lat1, lon1: the initial point coordinates (in degrees). Can also be
+      sequences of same length as `lats2`, in which case each final point has
+      its own initial point.
+    lats2, lons2: a sequence of final point coordinates (in degrees). Can be
+      for example a ndarray or a list.
+    accuracy: accuracy for the vincenty convergence (optional)
+
+  Returns:
+    a tuple of 3 ndarray of distance (km), initial bearing (deg), and back
+    bearing (deg).
+  """
+  a = 6378.1370        # semi-major axis (km), WGS84
+  f = 1./298.257223563 # flattening of the ellipsoid, WGS84
+  b = (1-f)*a          # semi-minor axis
+
+  lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+      np.asarray(lat1, dtype=float), np.asarray(lon1, dtype=float),
+      np.asarray(lats2, dtype=float), np.asarray(lons2, dtype=float))
+  s = np.zeros(lat2.shape)
+  alpha1 = np.zeros(lat2.shape)
+  alpha2 = np.zeros(lat2.shape)
+  # Same points are returned with a null distance and bearings.
+  valid = ~((lat1 == lat2) & (lon1 == lon2))
+  if not np.any(valid):
+    return s, alpha1, alpha2
+
+  phi1 = np.radians(lat1[valid])
+  L1   = np.radians(lon1[valid])
+  phi2 = np.radians(lat2[valid])
+  L2   = np.radians(lon2[valid])
+
+  U1 = np.arctan((1-f)*np.tan(phi1))
+  U2 = np.arctan((1-f)*np.tan(phi2))
+  sin_U1, cos_U1 = np.sin(U1), np.cos(U1)
+  sin_U2, cos_U2 = np.sin(U2), np.cos(U2)
+  L = L2 - L1
+
+  lmbda = L.copy()
+  lastlmbda = np.zeros(len(L))
+  sin_sigma = np.zeros(len(L))
+  cos_sigma = np.zeros(len(L))
+  sigma = np.zeros(len(L))
+  cossq_alpha = np.zeros(len(L))
+  cos2sigma_m = np.zeros(len(L))
+  idxs = np.arange(len(L))
+  while len(idxs):
+    # Using iteration on partial subset for perfect equivalence
+    # with scalar version
+    lastlmbda[idxs] = lmbda[idxs]
+    sin_U1_i, cos_U1_i = sin_U1[idxs], cos_U1[idxs]
+    sin_U2_i, cos_U2_i = sin_U2[idxs], cos_U2[idxs]
+    sin_lmbda = np.sin(lmbda[idxs])
+    cos_lmbda = np.cos(lmbda[idxs])
+
+    sin_sigma[idxs] = _Pow(_Pow(cos_U2_i*sin_lmbda, 2.0) +
+                           _Pow(cos_U1_i*sin_U2_i - sin_U1_i*cos_U2_i*cos_lmbda,
+                                2.0), 0.5)
+    cos_sigma[idxs] = sin_U1_i*sin_U2_i + cos_U1_i*cos_U2_i*cos_lmbda
+    sigma[idxs] = np.arctan2(sin_sigma[idxs], cos_sigma[idxs])
+
+    sin_alpha = (cos_U1_i*cos_U2_i*sin_lmbda)/np.sin(sigma[idxs])
+    cossq_alpha[idxs] = 1 - _Pow(sin_alpha, 2.0)
+
+    cos2sigma_m[idxs] = (np.cos(sigma[idxs])
+                         - (2.*sin_U1_i*sin_U2_i/cossq_alpha[idxs]))
+
+    C = (f/16.)*cossq_alpha[idxs]*(4. + f*(4. - 3.*cossq_alpha[idxs]))
+
+    lmbda[idxs] = (L[idxs] + (1. - C)*f*sin_alpha
+                   *(sigma[idxs] + C*sin_sigma[idxs]
+                     * (cos2sigma_m[idxs] + C*cos_sigma[idxs]
+                        * (-1. + 2.*_Pow(cos2sigma_m[idxs], 2.0)))))
+    idxs = idxs[np.abs(lmbda[idxs] - lastlmbda[idxs]) > accuracy]
+
+  usq = cossq_alpha*(a**2.0 - b**2.0)/b**2.0
+  A = 1 + (usq/16384.)*(4096. + usq*(-768. + usq*(320. - 175.*usq)))
+  B = (usq/1024.)*(256. + usq*(-128. + usq*(74. - 47.*usq)))
+  sin_sigma2 = np.sin(sigma)
+  dsigma = (B*sin_sigma2
+            * (cos2sigma_m + 0.25*B
+               * (np.cos(sigma)*(-1. + 2.*_Pow(cos2sigma_m, 2.0))
+                  - (1./6.)*B*cos2sigma_m*(-3. + 4.*_Pow(sin_sigma2, 2.0))
+                  * (-3. + 4.*_Pow(cos2sigma_m, 2.0)))))
+
+  s[valid] = b*A*(sigma-dsigma)
+
+  sin_lmbda = np.sin(lmbda)
+  cos_lmbda = np.cos(lmbda)
+  alpha1_v = np.arctan2(cos_U2*sin_lmbda,
+                        (cos_U1*sin_U2 - sin_U1*cos_U2*cos_lmbda))
+  alpha2_v = np.arctan2(cos_U1*sin_lmbda,
+                        (-sin_U1*cos_U2 + cos_U1*sin_U2*cos_lmbda))
+  alpha2_v = np.where(alpha2_v < pi, alpha2_v + pi, alpha2_v - pi)
+
+  alpha1[valid] = np.degrees((alpha1_v + 2.*pi) % (2.*pi))
+  alpha2[valid] = np.degrees((alpha2_v + 2.*pi) % (2.*pi))
+
+  return s, alpha1, alpha2
+
+
+def GeodesicDistancesWithin(lat1, lon1, lats2, lons2, max_dists_km):
+  """Checks which points are within a maximum distance.
+
+  The distances are computed with the vectorized `GeodesicDistanceBearings()`,
+  which can differ from the scalar `GeodesicDistanceBearing()` by rounding
+  errors. The points close to their maximum distance are checked again with the
+  scalar routine, so that the result is identical to checking each point with
+  `GeodesicDistanceBearing()`.
+
+  Inputs:
+    lat1, lon1, lats2, lons2: the initial and final points coordinates (in
+      degrees), as in `GeodesicDistanceBearings()`.
+    max_dists_km: the maximum distance (km), a scalar or a sequence of the
+      maximum distance of each point.
+
+  Returns:
+    a boolean ndarray, True for the points at distance <= their maximum distance.
+  """
+  lat1, lon1, lat2, lon2, max_dists_km = np.broadcast_arrays(
+      np.asarray(lat1, dtype=float), np.asarray(lon1, dtype=float),
+      np.asarray(lats2, dtype=float), np.asarray(lons2, dtype=float),
+      np.asarray(max_dists_km, dtype=float))
+  dists_km, _, _ = GeodesicDistanceBearings(lat1, lon1, lat2, lon2)
+  within = dists_km <= max_dists_km
+  for k in np.nonzero(np.abs(dists_km - max_dists_km) <= _RECHECK_DIST_KM)[0]:
+    dist_km, _, _ = GeodesicDistanceBearing(lat1[k], lon1[k], lat2[k], lon2[k])
+    within[k] = dist_km <= max_dists_km[k]
+  return within
+
+
 def GeodesicPoint(lat, lon, dist_km, bearing, accuracy=1.0E-12):
   """Computes the coordinates from a point towards a bearing at given distance.
 
@@ -317,6 +470,116 @@ def GeodesicPoints(lat, lon, distances_km, bearing, accuracy=1.0E-12):
     return list(np.degrees(phi2)), list(np.degrees(L2)), list(np.degrees(alpha2))
 
 
+def GeodesicPointsMulti(lats, lons, distances_km, bearings, accuracy=1.0E-12):
+  """Computes the coordinates of points along several geodesics.
+
+  This routine version is similar to `GeodesicPoints` but works on several
+  initial points and bearings at once, performing a single vectorized operation
+  on the points of all the geodesics.
+  The per-geodesic terms are computed exactly as in `GeodesicPoints`, so that
+  the results are identical to calling `GeodesicPoints` on each geodesic.
+
+  Inputs:
+    lats, lons: a sequence of N initial point coordinates (in degrees).
+    distances_km: a sequence of N sequences of distances (in km) of the target
+      points on each geodesic.
+    bearings: a sequence of N bearing angles (in degrees).
+    accuracy: accuracy for the vincenty convergence (optional)
+
+  Returns:
+    a tuple of the points latitude, longitude and reverse bearing (in degrees),
+    as 3 ndarray holding the points of all geodesics one after another.
+  """
+  a = 6378.1370        # semi-major axis (km), WGS84
+  f = 1./298.257223563 # flattening of the ellipsoid, WGS84
+  b = (1-f)*a          # semi-minor axis
+
+  # Per geodesic terms, computed with scalar math as in `GeodesicPoints`.
+  num_geodesics = len(bearings)
+  terms = np.zeros((11, num_geodesics))
+  for k in range(num_geodesics):
+    phi1 = radians(lats[k])
+    alpha1 = radians(bearings[k])
+    U1 = atan((1-f)*tan(phi1))
+    sigma1 = atan2(tan(U1), cos(alpha1))
+    sinalpha = cos(U1)*sin(alpha1)
+    cossq_alpha = (1. - sinalpha**2.0)
+    usq = cossq_alpha*(a**2.0-b**2.0)/b**2.0
+    A = 1 + usq/16384. * (4096. + usq*(-768 + usq*(320.-175.*usq)))
+    B = usq/1024.*(256. + usq*(-128. + usq*(74.-47.*usq)))
+    C = (f/16.) * cossq_alpha * (4. + f * (4. - 3.*cossq_alpha))
+    terms[:, k] = (radians(lons[k]), sin(U1), cos(U1), sin(alpha1), cos(alpha1),
+                   sigma1, sinalpha, sinalpha**2, A, B, C)
+
+  # Expand per-geodesic terms to all points.
+  counts = [len(distances) for distances in distances_km]
+  idxs_geo = np.repeat(np.arange(num_geodesics), counts)
+  (L1, sin_U1, cos_U1, sin_alpha1, cos_alpha1,
+   sigma1, sinalpha, sqsinalpha, A, B, C) = terms[:, idxs_geo]
+  if num_geodesics:
+    s = np.concatenate([np.asarray(distances, dtype=float)
+                        for distances in distances_km])
+  else:
+    s = np.zeros(0)
+
+  sigma = np.zeros(len(s))
+  twosigmam = np.zeros(len(s))
+  # Iteration on the subset of points not yet converged, for perfect
+  # equivalence with scalar version. The subset values are kept in compact
+  # arrays, shrunk after each iteration.
+  idxs = np.arange(len(s))
+  s_bA_idxs = s/(b*A)
+  sigma_idxs, sigma1_idxs, B_idxs = s_bA_idxs, sigma1, B
+  while len(idxs):
+    lastsigma = sigma_idxs
+    twosigmam_idxs = 2.*sigma1_idxs + sigma_idxs
+    cos_twosigmam = np.cos(twosigmam_idxs)
+    sin_sigma = np.sin(sigma_idxs)
+    cos_sigma = np.cos(sigma_idxs)
+    dsigma = (B_idxs * sin_sigma
+              *(cos_twosigmam + 0.25*B_idxs
+                *(cos_sigma
+                  *(-1. + 2. * cos_twosigmam**2)
+                  - (1./6.) * B_idxs * cos_twosigmam
+                  * (-3. + 4. * sin_sigma**2)
+                  * (-3. + 4. * cos_twosigmam**2))))
+    sigma_idxs = s_bA_idxs + dsigma
+    twosigmam[idxs] = twosigmam_idxs
+    sigma[idxs] = sigma_idxs
+    not_converged = np.abs(sigma_idxs - lastsigma) > accuracy
+    idxs = idxs[not_converged]
+    sigma_idxs = sigma_idxs[not_converged]
+    sigma1_idxs = sigma1_idxs[not_converged]
+    B_idxs = B_idxs[not_converged]
+    s_bA_idxs = s_bA_idxs[not_converged]
+  cos_sigma = np.cos(sigma)
+  sin_sigma = np.sin(sigma)
+  cos_twosigmam = np.cos(twosigmam)
+
+  num = sin_U1 * cos_sigma + cos_U1 * sin_sigma * cos_alpha1
+  den = ((1.-f) * (sqsinalpha +
+                   (sin_U1 * sin_sigma - cos_U1 * cos_sigma * cos_alpha1)**2)**0.5)
+
+  phi2 = np.arctan2(num, den)
+
+  num = sin_sigma * sin_alpha1
+  den = cos_U1 * cos_sigma - sin_U1 * sin_sigma * cos_alpha1
+  lmbda = np.arctan2(num, den)
+
+  L = (lmbda - (1. - C) * f * sinalpha
+       * (sigma + C * sin_sigma
+          * (cos_twosigmam + C * cos_sigma
+             * (-1. + 2. * cos_twosigmam**2))))
+  L2 = L + L1
+
+  num = sinalpha
+  den = -sin_U1 * sin_sigma + cos_U1 * cos_sigma * cos_alpha1
+  alpha2 = np.arctan2(num, den)
+  alpha2 = (alpha2 + 3.*pi) % (2.*pi)
+
+  return np.degrees(phi2), np.degrees(L2), np.degrees(alpha2)
+
+
 def GeodesicSampling(lat1, lon1, lat2, lon2, num_points):
   """Returns a geodesic between 2 points defined as equally spaced points.
 
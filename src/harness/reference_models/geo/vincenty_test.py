@@ -62,6 +62,48 @@ class TestVincenty(unittest.TestCase):
       self.assertAlmostEqual(az, p['azimuth'], 9)
       self.assertAlmostEqual(rev_az, p['reverse_azimuth'], 9)
 
+  def test_distbears(self):
+    random.seed(69)
+    lat1, lng1 = 38, -80
+    lats2 = [lat1 + random.uniform(-10, 10) for _ in range(1000)] + [lat1]
+    lngs2 = [lng1 + random.uniform(-10, 10) for _ in range(1000)] + [lng1]
+    dists, azs, rev_azs = vincenty.GeodesicDistanceBearings(lat1, lng1,
+                                                            lats2, lngs2)
+    self.assertEqual(len(dists), len(lats2))
+    self.assertEqual((dists[-1], azs[-1], rev_azs[-1]), (0, 0, 0))
+    # Test against scalar version
+    for k in range(len(lats2)):
+      d, az, rev_az = vincenty.GeodesicDistanceBearing(lat1, lng1,
+                                                       lats2[k], lngs2[k])
+      self.assertAlmostEqual(dists[k], d, 10)
+      self.assertAlmostEqual(azs[k], az, 10)
+      self.assertAlmostEqual(rev_azs[k], rev_az, 10)
+    # Test with many initial points
+    dists2, azs2, rev_azs2 = vincenty.GeodesicDistanceBearings(lats2, lngs2,
+                                                               lat1, lng1)
+    for k in range(len(lats2)):
+      d, az, rev_az = vincenty.GeodesicDistanceBearing(lats2[k], lngs2[k],
+                                                       lat1, lng1)
+      self.assertAlmostEqual(dists2[k], d, 10)
+      self.assertAlmostEqual(azs2[k], az, 10)
+      self.assertAlmostEqual(rev_azs2[k], rev_az, 10)
+
+  def test_distances_within(self):
+    random.seed(69)
+    lat1, lng1 = 38, -80
+    lats2 = [lat1 + random.uniform(-2, 2) for _ in range(1000)]
+    lngs2 = [lng1 + random.uniform(-2, 2) for _ in range(1000)]
+    dists = np.array([vincenty.GeodesicDistanceBearing(lat2, lng2, lat1, lng1)[0]
+                      for lat2, lng2 in zip(lats2, lngs2)])
+    # Decisions identical to the scalar version, at the boundary.
+    self.assertTrue(np.all(vincenty.GeodesicDistancesWithin(
+        lats2, lngs2, lat1, lng1, dists)))
+    self.assertFalse(np.any(vincenty.GeodesicDistancesWithin(
+        lats2, lngs2, lat1, lng1, np.nextafter(dists, 0))))
+    self.assertListEqual(
+        list(vincenty.GeodesicDistancesWithin(lats2, lngs2, lat1, lng1, 150)),
+        list(dists <= 150))
+
   def test_point(self):
     random.seed(69)
     for _ in range(1000):
@@ -103,6 +145,26 @@ class TestVincenty(unittest.TestCase):
       self.assertEqual(lng, lngs[k])
       self.assertEqual(rev_azi, rev_azis[k])
 
+  def test_points_multi(self):
+    random.seed(69)
+    lats0 = [random.uniform(-70, 70) for _ in range(20)]
+    lngs0 = [random.uniform(-170, 170) for _ in range(20)]
+    bearings = [random.uniform(0, 360) for _ in range(20)]
+    distances = [np.linspace(0, random.uniform(1, 300), random.randint(1, 100))
+                 for _ in range(20)]
+    lats, lngs, rev_azis = vincenty.GeodesicPointsMulti(lats0, lngs0,
+                                                        distances, bearings)
+    self.assertEqual(len(lats), sum(len(dists) for dists in distances))
+    # Test against single geodesic version
+    offset = 0
+    for lat0, lng0, dists, bearing in zip(lats0, lngs0, distances, bearings):
+      lats2, lngs2, rev_azis2 = vincenty.GeodesicPoints(lat0, lng0, dists, bearing)
+      num = len(dists)
+      self.assertEqual(np.max(np.abs(lats[offset:offset+num] - lats2)), 0)
+      self.assertEqual(np.max(np.abs(lngs[offset:offset+num] - lngs2)), 0)
+      self.assertEqual(np.max(np.abs(rev_azis[offset:offset+num] - rev_azis2)), 0)
+      offset += num
+
   def test_sampling(self):
     lat0, lng0 = 44.0, -122.0
     lat10, lng10 = 43.0, -122.0
@@ -41,7 +41,6 @@ from __future__ import division
 from __future__ import print_function
 
 from collections import namedtuple
-from functools import partial
 import logging
 
 import numpy as np
@@ -49,7 +48,10 @@ from six.moves import zip
 
 from reference_models.common import cache
 from reference_models.common import data
+from reference_models.common import grant_index
 from reference_models.common import mpool
+from reference_models.geo import drive
+from reference_models.geo import tiles
 from reference_models.geo import utils
 from reference_models.interference import interference as interf
 from reference_models.propagation import wf_hybrid
@@ -142,135 +144,107 @@ def iapPointConstraint(protection_point, channels, low_freq, high_freq,
     return (protection_point[1], protection_point[0],
             [0] * len(channels), [0] * len(channels))
 
-  # Get number of grants, IAP protection threshold and fairshare per channel.
-  num_unsatisfied_grants = len(neighbor_grants)
+  # Prefetch in background the terrain tiles of the grants links to the point.
+  drive.terrain_driver.Prefetch(tiles.LinksTiles(
+      protection_point[1], protection_point[0],
+      [grant.latitude for grant in neighbor_grants],
+      [grant.longitude for grant in neighbor_grants]))
+
+  num_grants = len(neighbor_grants)
+  num_channels = len(channels)
+
+  # Precompute the EIRP-independent coupling of each grant to each channel, as
+  # the interference (dBm) caused by the grant at its max EIRP. During the IAP
+  # iterations the interference of a grant is then simply this coupling minus
+  # the EIRP reduction of that grant.
+  #   grants_overlap:      (grants x channels) flag of grant overlap with channel
+  #   grants_coupling_db:  (grants x channels) interference at max EIRP (dBm)
+  grants_overlap = np.zeros((num_grants, num_channels), dtype=bool)
+  grants_coupling_db = np.zeros((num_grants, num_channels))
+  with cache.CacheManager(wf_hybrid.CalcHybridPropagationLoss, persistent=True):
+    # Using memoizing cache manager only for lengthy calculation (hybrid on PPA/GWPZ),
+    # so that the path loss is computed only once across channels. If configured,
+    # the persistent cache allows reuse by the aggregate interference check.
+    for idx, channel in enumerate(channels):
+      # Get protection constraint over 5MHz channel range
+      channel_constraint = data.ProtectionConstraint(
+          latitude=protection_point[1], longitude=protection_point[0],
+          low_frequency=channel[0], high_frequency=channel[1],
+          entity_type=protection_ent_type)
+      for g_idx, grant in enumerate(neighbor_grants):
+        # Check if grant overlaps with protection point, channel
+        if not interf.grantFrequencyOverlapCheck(
+            grant, channel[0], channel[1], protection_ent_type):
+          continue
+        grants_overlap[g_idx, idx] = True
+        grants_coupling_db[g_idx, idx] = interf.computeInterference(
+            grant, grant.max_eirp, channel_constraint, fss_info,
+            esc_antenna_info, region_type)
+
+  # IAP protection threshold, number of unsatisfied grants and fair share
+  # per channel.
+  num_unsatisfied_grants = num_grants
+  num_unsatisfied_grants_channels = np.sum(grants_overlap, axis=0)
+  iap_threshold_channels = np.full(num_channels, float(threshold))
+  fairshare_channels = np.zeros(num_channels)
+  has_grants = num_unsatisfied_grants_channels > 0
+  fairshare_channels[has_grants] = (iap_threshold_channels[has_grants] /
+                                    num_unsatisfied_grants_channels[has_grants])
 
   # Initialize list of aggregate interference from all the grants
   # (including grants from managing and peer SAS )
-  aggr_interf = [0] * len(channels)
+  aggr_interf = np.zeros(num_channels)
   # Initialize list of aggregate interference from managing SAS grants.
-  asas_interf = [0] * len(channels)
+  asas_interf = np.zeros(num_channels)
+
+  # EIRP reduction of grants from their max EIRP (dB)
+  grants_eirp_reduction = np.zeros(num_grants)
+  # Grants satisfied (and so removed from future consideration)
+  grants_satisfied = np.zeros(num_grants, dtype=bool)
+  grants_managed = np.array([grant.is_managed_grant for grant in neighbor_grants])
+  grants_has_overlap = np.any(grants_overlap, axis=1)
 
   # Algorithm to calculate interference within IAPBW using EIRP obtained for all
   # the grants through application of IAP
-  num_unsatisfied_grants_channels = []
-  iap_threshold_channels = []
-  fairshare_channels = []
-
-  for index, channel in enumerate(channels):
-    # Get protection constraint over 5MHz channel range
-    channel_constraint = data.ProtectionConstraint(
-        latitude=protection_point[1], longitude=protection_point[0],
-        low_frequency=channel[0], high_frequency=channel[1],
-        entity_type=protection_ent_type)
-
-    # Identify CBSD grants overlapping with frequency range of the protection entity
-    # in the neighborhood of the protection point and channel
-    channel_neighbor_grants = interf.findOverlappingGrants(neighbor_grants,
-                                                           channel_constraint)
-    num_unsatisfied_grants_channel = len(channel_neighbor_grants)
-
-    # Computes interference quota for this protection_point and channel.
-    iap_threshold = threshold
-
-    # Calculate the fair share per channel based on unsatisfied grants
-    fairshare_channel = 0
-    if num_unsatisfied_grants_channel > 0:
-      fairshare_channel = float(iap_threshold) / num_unsatisfied_grants_channel
-
-    num_unsatisfied_grants_channels.append(num_unsatisfied_grants_channel)
-    iap_threshold_channels.append(iap_threshold)
-    fairshare_channels.append(fairshare_channel)
-
-  # List of grants initialized with max EIRP
-  grants_eirp = [grant.max_eirp for grant in neighbor_grants]
-
-  # Initialize list of grants_satisfied to False
-  grants_satisfied = [False] * num_unsatisfied_grants
-
-  # Initialize list of grants_removed to False
-  grants_removed = [False] * num_unsatisfied_grants
-
-  # Initialize grant overlap and interference per channel dictionary
-  # Values will be stored in the format of key as tuple (grant_id, channel_id)
-  # and respective value as:
-  #   overlap_flag: True/False based on grant overlaps with channel
-  #   interference: respective interference value for the key
-  grants_overlap_flag = {}
-  grants_interference = {}
-
-  with cache.CacheManager(wf_hybrid.CalcHybridPropagationLoss):
-    # Using memoizing cache manager only for lengthy calculation (hybrid on PPA/GWPZ).
-    while num_unsatisfied_grants > 0:
-      for g_idx, grant in enumerate(neighbor_grants):
-
-        if grants_satisfied[g_idx]:
-          continue
-
-        for idx, channel in enumerate(channels):
-          # Check if grant overlaps with protection point, channel
-          grant_overlap_check = interf.grantFrequencyOverlapCheck(
-              grant, channel[0], channel[1], protection_ent_type)
-
-          grants_overlap_flag[(g_idx, idx)] = grant_overlap_check
-          if not grant_overlap_check:
-            continue
-          # Get protection constraint over 5MHz channel range
-          channel_constraint = data.ProtectionConstraint(
-              latitude=protection_point[1], longitude=protection_point[0],
-              low_frequency=channel[0], high_frequency=channel[1],
-              entity_type=protection_ent_type)
-
-          # Compute interference that grant causes to protection point over channel
-          interference = interf.dbToLinear(interf.computeInterference(
-              grant, grants_eirp[g_idx], channel_constraint, fss_info,
-              esc_antenna_info, region_type))
-
-          # If calculated interference is more than fair share of interference
-          # to which the grants are entitled then grant is considered unsatisfied
-          if interference < fairshare_channels[idx]:
-            # Add the interference caused by all the grants in a 5MHz channel
-            grants_interference[(g_idx, idx)] = interference
-            grants_satisfied[g_idx] = True
-          else:
-            grants_satisfied[g_idx] = False
-            break
-
-      num_grants_good_overall_channels = 0
-
-      for gr_idx, grant in enumerate(neighbor_grants):
-        if grants_removed[gr_idx]:
-          continue
-        if not grants_satisfied[gr_idx]:
-          continue
-        if num_unsatisfied_grants > 0:
-          num_unsatisfied_grants -= 1
-        for ch_idx, channel in enumerate(channels):
-          # Grant interferes with protection point over channel
-          if grants_overlap_flag[(gr_idx, ch_idx)]:
-            iap_threshold_channels[ch_idx] = (iap_threshold_channels[ch_idx] -
-                                              grants_interference[(gr_idx, ch_idx)])
-            num_unsatisfied_grants_channels[ch_idx] -= 1
-            # Re-calculate fairshare for a channel
-            if num_unsatisfied_grants_channels[ch_idx] > 0:
-              fairshare_channels[ch_idx] = (float(iap_threshold_channels[ch_idx]) /
-                                            num_unsatisfied_grants_channels[ch_idx])
-            aggr_interf[ch_idx] += grants_interference[(gr_idx, ch_idx)]
-            if grant.is_managed_grant:
-              asas_interf[ch_idx] += grants_interference[(gr_idx, ch_idx)]
-
-          # Removing grants from future consideration
-          grants_removed[gr_idx] = True
-
-          # Increase number of grants good over all channels
-          num_grants_good_overall_channels += 1
-
-      if num_grants_good_overall_channels == 0:
-        for grant_idx, grant in enumerate(neighbor_grants):
-          # Reduce power level of all the unsatisfied grants
-          if not grants_satisfied[grant_idx]:
-            grants_eirp[grant_idx] -= 1
-
+  while num_unsatisfied_grants > 0:
+    unsatisfied_idxs = np.nonzero(~grants_satisfied)[0]
+    # Compute interference that unsatisfied grants cause to protection point
+    # over all channels
+    grants_interference = interf.dbToLinear(
+        grants_coupling_db[unsatisfied_idxs]
+        - grants_eirp_reduction[unsatisfied_idxs, np.newaxis])
+    overlap = grants_overlap[unsatisfied_idxs]
+
+    # If calculated interference is more than fair share of interference
+    # to which the grants are entitled on any channel, then grant is considered
+    # unsatisfied
+    is_below_fairshare = (grants_interference < fairshare_channels) | ~overlap
+    new_satisfied = (np.all(is_below_fairshare, axis=1) &
+                     grants_has_overlap[unsatisfied_idxs])
+
+    for k in np.nonzero(new_satisfied)[0]:
+      # Removing grants from future consideration, and allocating its
+      # interference on all overlapping channels
+      num_unsatisfied_grants -= 1
+      grants_satisfied[unsatisfied_idxs[k]] = True
+      ch_idxs = np.nonzero(overlap[k])[0]
+      interference = grants_interference[k, ch_idxs]
+      iap_threshold_channels[ch_idxs] -= interference
+      num_unsatisfied_grants_channels[ch_idxs] -= 1
+      # Re-calculate fairshare for channels
+      ch_idxs = ch_idxs[num_unsatisfied_grants_channels[ch_idxs] > 0]
+      fairshare_channels[ch_idxs] = (iap_threshold_channels[ch_idxs] /
+                                     num_unsatisfied_grants_channels[ch_idxs])
+      aggr_interf[overlap[k]] += interference
+      if grants_managed[unsatisfied_idxs[k]]:
+        asas_interf[overlap[k]] += interference
+
+    if not np.any(new_satisfied):
+      # Reduce power level of all the unsatisfied grants
+      grants_eirp_reduction[unsatisfied_idxs] += 1
+
+  aggr_interf = aggr_interf.tolist()
+  asas_interf = asas_interf.tolist()
   logging.debug('IAP point_constraint @ point %s: %s',
                 (protection_point[1], protection_point[0]),
                 list(zip(asas_interf, aggr_interf)))
@@ -365,19 +339,24 @@ def performIapForGwpz(gwpz_record, sas_uut_fad_object, sas_th_fad_objects):
   protection_channels = interf.getProtectedChannels(gwpz_low_freq, gwpz_high_freq)
 
   logging.debug('$$$$ Calling GWPZ Protection $$$$')
-  iapPoint = partial(iapPointConstraint,
-                     channels=protection_channels,
-                     low_freq=gwpz_low_freq,
-                     high_freq=gwpz_high_freq,
-                     grants=grants,
-                     fss_info=None,
-                     esc_antenna_info=None,
-                     region_type=gwpz_region,
-                     threshold=gwpz_iap_threshold,
-                     protection_ent_type=data.ProtectedEntityType.GWPZ_AREA)
-
-  pool = mpool.Pool()
-  iap_interfs = pool.map(iapPoint, protection_points)
+  with mpool.SharedPayloads() as shared:
+    iapPoint = mpool.SharedPartial(
+        iapPointConstraint,
+        channels=protection_channels,
+        low_freq=gwpz_low_freq,
+        high_freq=gwpz_high_freq,
+        grants=shared.Share(grant_index.GrantIndex(grants)),
+        fss_info=None,
+        esc_antenna_info=None,
+        region_type=gwpz_region,
+        threshold=gwpz_iap_threshold,
+        protection_ent_type=data.ProtectedEntityType.GWPZ_AREA)
+
+    iap_interfs = mpool.MapByTileLocality(
+        iapPoint, protection_points,
+        [tiles.NeighborhoodTiles(lat, lon, interf.GWPZ_NEIGHBORHOOD_DIST)
+         for lon, lat in protection_points],
+        drive.NumTerrainTileLoads)
 
   ap_iap_ref = calculatePostIapAggregateInterference(
       interf.dbToLinear(gwpz_thresh_q), num_sas, iap_interfs)
@@ -443,19 +422,24 @@ def performIapForPpa(ppa_record, sas_uut_fad_object, sas_th_fad_objects,
   # Apply IAP for each protection constraint with a pool of parallel
   # processes.
   logging.debug('$$$$ Calling PPA Protection $$$$')
-  iapPoint = partial(iapPointConstraint,
-                     channels=protection_channels,
-                     low_freq=ppa_low_freq,
-                     high_freq=ppa_high_freq,
-                     grants=grants,
-                     fss_info=None,
-                     esc_antenna_info=None,
-                     region_type=ppa_region,
-                     threshold=ppa_iap_threshold,
-                     protection_ent_type=data.ProtectedEntityType.PPA_AREA)
-
-  pool = mpool.Pool()
-  iap_interfs = pool.map(iapPoint, protection_points)
+  with mpool.SharedPayloads() as shared:
+    iapPoint = mpool.SharedPartial(
+        iapPointConstraint,
+        channels=protection_channels,
+        low_freq=ppa_low_freq,
+        high_freq=ppa_high_freq,
+        grants=shared.Share(grant_index.GrantIndex(grants)),
+        fss_info=None,
+        esc_antenna_info=None,
+        region_type=ppa_region,
+        threshold=ppa_iap_threshold,
+        protection_ent_type=data.ProtectedEntityType.PPA_AREA)
+
+    iap_interfs = mpool.MapByTileLocality(
+        iapPoint, protection_points,
+        [tiles.NeighborhoodTiles(lat, lon, interf.PPA_NEIGHBORHOOD_DIST)
+         for lon, lat in protection_points],
+        drive.NumTerrainTileLoads)
 
   ap_iap_ref = calculatePostIapAggregateInterference(
       interf.dbToLinear(ppa_thresh_q), num_sas, iap_interfs)
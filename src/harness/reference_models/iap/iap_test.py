@@ -0,0 +1,104 @@
+#    Copyright 2018 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from reference_models.common import data
+from reference_models.iap import iap
+from reference_models.interference import interference as interf
+from reference_models.propagation import wf_hybrid
+from reference_models.tools import entities
+from reference_models.tools import testutils
+
+
+_fake_hybrid = testutils.FakePropagationPredictor(
+    dist_type='REAL', factor=1.0, offset=120)
+
+
+def FakeHybridPropagationLoss(*args, **kwargs):
+  # A module function, as required by the cache manager used in IAP.
+  return _fake_hybrid(*args, **kwargs)
+
+
+def GenerateGrants(num_cbsds, min_freq_mhz, max_freq_mhz, template_cbsd,
+                   is_managed_grant=True):
+  grants = entities.ConvertToCbsdGrantInfo(
+      entities.GenerateCbsdList(num_cbsds, template_cbsd=template_cbsd,
+                                ref_latitude=37.0, ref_longitude=-80.0,
+                                min_distance_km=1, max_distance_km=30),
+      min_freq_mhz=min_freq_mhz,
+      max_freq_mhz=max_freq_mhz)
+  return [grant._replace(is_managed_grant=is_managed_grant) for grant in grants]
+
+
+class TestIap(unittest.TestCase):
+
+  def setUp(self):
+    self.original_hybrid = wf_hybrid.CalcHybridPropagationLoss
+    wf_hybrid.CalcHybridPropagationLoss = FakeHybridPropagationLoss
+
+  def tearDown(self):
+    wf_hybrid.CalcHybridPropagationLoss = self.original_hybrid
+
+  def test_iapPointConstraint(self):
+    np.random.seed(12345)
+    cat_a = entities.CBSD_TEMPLATE_CAT_A_OUTDOOR
+    cat_b = entities.CBSD_TEMPLATE_CAT_B
+    grants = (GenerateGrants(8, 3550, 3560, cat_a) +
+              GenerateGrants(6, 3555, 3575, cat_a, is_managed_grant=False) +
+              GenerateGrants(4, 3560, 3580, cat_b) +
+              GenerateGrants(3, 3570, 3590, cat_b, is_managed_grant=False) +
+              GenerateGrants(2, 3620, 3630, cat_a))
+    point = (-80.0, 37.0)
+    channels = interf.getProtectedChannels(3550e6, 3600e6)
+    threshold = interf.dbToLinear(iap.THRESH_PPA_DBM_PER_IAPBW -
+                                  iap.MARGIN_PPA_DB)
+
+    lat, lon, asas_interf, aggr_interf = iap.iapPointConstraint(
+        point, channels, 3550e6, 3600e6, grants, None, None, 'SUBURBAN',
+        threshold, data.ProtectedEntityType.PPA_AREA)
+
+    # Values from the original grant by grant implementation of the IAP.
+    exp_asas_interf = [2.8857659368677817e-10, 2.8857659368677817e-10,
+                       2.3024248427424425e-09, 2.3024248427424425e-09,
+                       2.3024248427424425e-09, 2.3024248427424425e-09,
+                       0, 0, 0, 0]
+    exp_aggr_interf = [2.8857659368677817e-10, 4.4642809919076744e-10,
+                       2.4602763482464315e-09, 2.4602763482464315e-09,
+                       3.873443226077322e-09, 3.715591720573333e-09,
+                       1.4131668778308908e-09, 1.4131668778308908e-09,
+                       0, 0]
+    self.assertEqual((lat, lon), (37.0, -80.0))
+    self.assertEqual(len(asas_interf), len(channels))
+    self.assertEqual(len(aggr_interf), len(channels))
+    self.assertTrue(np.allclose(asas_interf, exp_asas_interf, rtol=1e-12, atol=0))
+    self.assertTrue(np.allclose(aggr_interf, exp_aggr_interf, rtol=1e-12, atol=0))
+    self.assertTrue(np.all(np.array(aggr_interf) <= threshold))
+
+  def test_iapPointConstraintNoNeighbors(self):
+    grants = GenerateGrants(3, 3550, 3560, entities.CBSD_TEMPLATE_CAT_A_OUTDOOR)
+    channels = interf.getProtectedChannels(3550e6, 3600e6)
+    result = iap.iapPointConstraint(
+        (-70.0, 40.0), channels, 3550e6, 3600e6, grants, None, None,
+        'SUBURBAN', 1e-9, data.ProtectedEntityType.PPA_AREA)
+    self.assertEqual(result, (40.0, -70.0, [0] * 10, [0] * 10))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -37,14 +37,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-from functools import partial
 import logging
 
 import numpy as np
 
 from reference_models.common import cache
 from reference_models.common import data
+from reference_models.common import grant_index
 from reference_models.common import mpool
+from reference_models.geo import drive
+from reference_models.geo import tiles
 from reference_models.geo import utils
 from reference_models.interference import interference as interf
 from reference_models.propagation import wf_hybrid
@@ -103,8 +105,9 @@ def aggregateInterferenceForPoint(protection_point, channels, grants,
     return protection_point[1], protection_point[0], [0]*len(channels)
 
   interferences = []
-  with cache.CacheManager(wf_hybrid.CalcHybridPropagationLoss):
+  with cache.CacheManager(wf_hybrid.CalcHybridPropagationLoss, persistent=True):
     # Using memoizing cache manager only for lengthy calculation (hybrid on PPA/GWPZ).
+    # If configured, the persistent cache allows reuse of the IAP path losses.
     for channel in channels:
       # Get protection constraint over 5MHz channel range
       protection_constraint = data.ProtectionConstraint(
@@ -279,16 +282,21 @@ def calculateAggregateInterferenceForGwpz(gwpz_record, grants):
                gwpz_record, protection_channels, len(protection_points), grants, gwpz_region)
   logging.debug('  points: %s', protection_points)
 
-  interfCalculator = partial(aggregateInterferenceForPoint,
-                             channels=protection_channels,
-                             grants=grants,
-                             fss_info=None,
-                             esc_antenna_info=None,
-                             protection_ent_type=data.ProtectedEntityType.GWPZ_AREA,
-                             region_type=gwpz_region)
-
-  pool = mpool.Pool()
-  interferences = pool.map(interfCalculator, protection_points)
+  with mpool.SharedPayloads() as shared:
+    interfCalculator = mpool.SharedPartial(
+        aggregateInterferenceForPoint,
+        channels=protection_channels,
+        grants=shared.Share(grant_index.GrantIndex(grants)),
+        fss_info=None,
+        esc_antenna_info=None,
+        protection_ent_type=data.ProtectedEntityType.GWPZ_AREA,
+        region_type=gwpz_region)
+
+    interferences = mpool.MapByTileLocality(
+        interfCalculator, protection_points,
+        [tiles.NeighborhoodTiles(lat, lon, interf.GWPZ_NEIGHBORHOOD_DIST)
+         for lon, lat in protection_points],
+        drive.NumTerrainTileLoads)
   return InterferenceDict(interferences)
 
 
@@ -337,14 +345,19 @@ def calculateAggregateInterferenceForPpa(ppa_record, pal_records, grants):
 
   # Calculate aggregate interference from each protection constraint with a
   # pool of parallel processes.
-  interfCalculator = partial(aggregateInterferenceForPoint,
-                             channels=protection_channels,
-                             grants=grants,
-                             fss_info=None,
-                             esc_antenna_info=None,
-                             protection_ent_type=data.ProtectedEntityType.PPA_AREA,
-                             region_type=ppa_region)
-
-  pool = mpool.Pool()
-  interferences = pool.map(interfCalculator, protection_points)
+  with mpool.SharedPayloads() as shared:
+    interfCalculator = mpool.SharedPartial(
+        aggregateInterferenceForPoint,
+        channels=protection_channels,
+        grants=shared.Share(grant_index.GrantIndex(grants)),
+        fss_info=None,
+        esc_antenna_info=None,
+        protection_ent_type=data.ProtectedEntityType.PPA_AREA,
+        region_type=ppa_region)
+
+    interferences = mpool.MapByTileLocality(
+        interfCalculator, protection_points,
+        [tiles.NeighborhoodTiles(lat, lon, interf.PPA_NEIGHBORHOOD_DIST)
+         for lon, lat in protection_points],
+        drive.NumTerrainTileLoads)
   return InterferenceDict(interferences)
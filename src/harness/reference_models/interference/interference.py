@@ -44,6 +44,7 @@ from six.moves import zip
 
 from reference_models.antenna import antenna
 from reference_models.common import data
+from reference_models.common import grant_index
 from reference_models.geo import vincenty
 from reference_models.propagation import wf_hybrid
 from reference_models.propagation import wf_itm
@@ -148,7 +149,8 @@ def findGrantsInsideNeighborhood(grants, protection_point, entity_type):
   """Finds grants inside protection entity neighborhood.
 
   Args:
-    grants: An iterable of CBSD grants of type |data.CbsdGrantInfo|.
+    grants: An iterable of CBSD grants of type |data.CbsdGrantInfo|, or a
+      |grant_index.GrantIndex| of the grants.
     protection_point: The location of a protected entity as (longitude, latitude) tuple.
     entity_type: The entity type (|data.ProtectedEntityType|).
   Returns:
@@ -156,20 +158,24 @@ def findGrantsInsideNeighborhood(grants, protection_point, entity_type):
                    |data.CbsdGrantInfo|, of all CBSDs inside the neighborhood
                    of the protection constraint.
   """
-  # Initialize an empty list
-  grants_inside = []
-
-  # Loop over each CBSD grant
-  for grant in grants:
-    # Compute distance from CBSD location to protection constraint location
-    dist_km, _, _ = vincenty.GeodesicDistanceBearing(grant.latitude,
-                      grant.longitude, protection_point[1], protection_point[0])
-
-    # Check if CBSD is inside the neighborhood of protection constraint
-    if dist_km <= _DISTANCE_PER_PROTECTION_TYPE[entity_type][grant.cbsd_category == 'B']:
-      grants_inside.append(grant)
-
-  return grants_inside
+  if isinstance(grants, grant_index.GrantIndex):
+    idxs_inside = grants.FindInsideNeighborhood(
+        protection_point[1], protection_point[0],
+        _DISTANCE_PER_PROTECTION_TYPE[entity_type])
+    return [grants[k] for k in idxs_inside]
+
+  grants = list(grants)
+  if not grants:
+    return []
+
+  # Check if CBSD is inside the neighborhood of protection constraint
+  neighbor_dists = _DISTANCE_PER_PROTECTION_TYPE[entity_type]
+  insides = vincenty.GeodesicDistancesWithin(
+      [grant.latitude for grant in grants],
+      [grant.longitude for grant in grants],
+      protection_point[1], protection_point[0],
+      [neighbor_dists[grant.cbsd_category == 'B'] for grant in grants])
+  return [grant for grant, inside in zip(grants, insides) if inside]
 
 
 def grantFrequencyOverlapCheck(grant, ch_low_freq, ch_high_freq, protection_ent_type):
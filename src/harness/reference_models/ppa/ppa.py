@@ -38,23 +38,53 @@ RX_HEIGHT = 1.5
 MAX_ALLOWABLE_EIRP_PER_10_MHZ_CAT_A = 30.
 MAX_ALLOWABLE_EIRP_PER_10_MHZ_CAT_B = 47.
 
+# Number of azimuths per work unit of the PPA contour creation.
+_NUM_AZIMUTHS_PER_WORK_UNIT = 30
+
+# Batched radial mode: the path losses of all the points of a radial are
+# computed at once with `wf_hybrid.CalcHybridPropagationLossRadial()`.
+_batched_radials = True
+
+
+def SetBatchedRadials(on):
+  """Activates/Deactivates the batched radial mode. By default it is ON.
+
+  In this mode, the path losses of all the points of a contour radial are
+  computed with a single call to `wf_hybrid.CalcHybridPropagationLossRadial()`
+  instead of one call per point to `wf_hybrid.CalcHybridPropagationLoss()`.
+  It shall be deactivated when replacing `wf_hybrid.CalcHybridPropagationLoss()`,
+  for example by a fake model in tests.
+  """
+  global _batched_radials
+  _batched_radials = on
+
 
 def _CalculateDbLossForEachPointAndGetContour(install_param, eirp_capability, antenna_gain,
                                               cbsd_region_type, latitudes, longitudes):
   """Returns Vertex Point Distance for each azimuth with signal strength greater
   than or equal to Threshold"""
-  db_loss = np.zeros(len(latitudes), dtype=np.float64)
   lat_cbsd, lon_cbsd  = install_param['latitude'], install_param['longitude']
   height_cbsd = install_param['height']
-  for index, lat_lon in enumerate(zip(latitudes, longitudes)):
-    lat, lon = lat_lon
-    db_loss[index] = wf_hybrid.CalcHybridPropagationLoss(
+  if _batched_radials:
+    # All the points of the radial at once.
+    db_loss = wf_hybrid.CalcHybridPropagationLossRadial(
         lat_cbsd, lon_cbsd, height_cbsd,
-        lat, lon, RX_HEIGHT,
+        latitudes, longitudes, RX_HEIGHT,
         cbsd_indoor=install_param['indoorDeployment'],
         reliability=0.5,
         region=cbsd_region_type,
         is_height_cbsd_amsl=(install_param['heightType'] == 'AMSL')).db_loss
+  else:
+    db_loss = np.zeros(len(latitudes), dtype=np.float64)
+    for index, lat_lon in enumerate(zip(latitudes, longitudes)):
+      lat, lon = lat_lon
+      db_loss[index] = wf_hybrid.CalcHybridPropagationLoss(
+          lat_cbsd, lon_cbsd, height_cbsd,
+          lat, lon, RX_HEIGHT,
+          cbsd_indoor=install_param['indoorDeployment'],
+          reliability=0.5,
+          region=cbsd_region_type,
+          is_height_cbsd_amsl=(install_param['heightType'] == 'AMSL')).db_loss
 
   index_cond, = np.where(
     (eirp_capability - install_param['antennaGain'] + antenna_gain) - db_loss
@@ -70,17 +100,30 @@ def _HammingFilter(x, window_len=15):
   return y
 
 
-def _GetPolygon(device):
-  """Returns the PPA contour for a single CBSD device, as a shapely polygon."""
+def _GetDeviceEirpCapability(device):
+  """Returns the EIRP capability of a device."""
   install_param = device['installationParam']
-  eirp_capability = install_param.get('eirpCapability',
-                                      MAX_ALLOWABLE_EIRP_PER_10_MHZ_CAT_A
-                                      if device['cbsdCategory'] == 'A'
-                                      else MAX_ALLOWABLE_EIRP_PER_10_MHZ_CAT_B)
+  return install_param.get('eirpCapability',
+                           MAX_ALLOWABLE_EIRP_PER_10_MHZ_CAT_A
+                           if device['cbsdCategory'] == 'A'
+                           else MAX_ALLOWABLE_EIRP_PER_10_MHZ_CAT_B)
+
 
-  # Compute all the Points in 0-359 every 200m up to 40km
+def _GetContourDists(device, azimuths):
+  """Returns the raw (unsmoothed) contour distances of a CBSD.
+
+  Inputs:
+    device: A CBSD record.
+    azimuths: The azimuths of the radials to process (degrees), as a sequence.
+
+  Returns:
+    A list of the contour distance for each radial (km).
+  """
+  install_param = device['installationParam']
+  eirp_capability = _GetDeviceEirpCapability(device)
+
+  # Compute all the Points in the azimuths every 200m up to 40km
   distances = np.arange(0.2, 40.1, 0.2)
-  azimuths = np.arange(0.0, 360.0)
   latitudes, longitudes, _ = list(
       zip(*[
           vincenty.GeodesicPoints(install_param['latitude'],
@@ -99,15 +142,34 @@ def _GetPolygon(device):
                                                          install_param['longitude'])
   cbsd_region_type = nlcd.GetRegionType(cbsd_region_code)
   # Compute the Path Loss, and contour based on Gain and Path Loss Comparing with Threshold
+  return [_CalculateDbLossForEachPointAndGetContour(install_param,
+                                                    eirp_capability, ant_gain,
+                                                    cbsd_region_type,
+                                                    radial_lats, radial_lons)
+          for radial_lats, radial_lons, ant_gain in zip(latitudes,
+                                                        longitudes,
+                                                        antenna_gains)]
+
+
+def _GetContourDistsForWorkUnit(work_unit):
+  """Returns the raw contour distances for a (device, azimuths) work unit."""
+  return _GetContourDists(*work_unit)
+
+
+def _GetPolygonFromContourDists(device, contour_dists_km):
+  """Returns the PPA contour polygon of a CBSD from its raw contour distances.
+
+  Inputs:
+    device: A CBSD record.
+    contour_dists_km: The raw contour distance (km) of each azimuth 0..359.
+
+  Returns:
+    The PPA contour, as a shapely polygon.
+  """
+  install_param = device['installationParam']
+  azimuths = np.arange(0.0, 360.0)
   # Smoothing Contour using Hamming Filter
-  contour_dists_km = _HammingFilter(
-      [_CalculateDbLossForEachPointAndGetContour(install_param,
-                                                 eirp_capability, ant_gain,
-                                                 cbsd_region_type,
-                                                 radial_lats, radial_lons)
-       for radial_lats, radial_lons, ant_gain in zip(latitudes,
-                                                     longitudes,
-                                                     antenna_gains)])
+  contour_dists_km = _HammingFilter(contour_dists_km)
   # Generating lat, lon for Contour
   contour_lats, contour_lons, _ = list(
       zip(*[
@@ -119,6 +181,12 @@ def _GetPolygon(device):
   return sgeo.Polygon(list(zip(contour_lons, contour_lats))).buffer(0)
 
 
+def _GetPolygon(device):
+  """Returns the PPA contour for a single CBSD device, as a shapely polygon."""
+  return _GetPolygonFromContourDists(
+      device, _GetContourDists(device, np.arange(0.0, 360.0)))
+
+
 def _ClipPpaByCounty(contour_union, pal_records):
   """ Clip a PPA 'contour_union' zone (shapely.MultiPolygon)
   with the county defined by a sequence of 'pal_records'."""
@@ -140,16 +208,26 @@ def PpaCreationModel(devices, pal_records):
     The PPA polygon in GeoJSON format (string).
   """
   # Validation for Inputs
-  for device in devices:
-    logging.info('Validating device', device)
-    util2.assertContainsRequiredFields("RegistrationRequest.schema.json", device)
-  for pal_rec in pal_records:
-    logging.info('Validating pal_rec', pal_rec)
-    util2.assertContainsRequiredFields("PalRecord.schema.json", pal_rec)
+  logging.info('Validating %d devices', len(devices))
+  util2.assertAllContainRequiredFields("RegistrationRequest.schema.json", devices)
+  logging.info('Validating %d pal_recs', len(pal_records))
+  util2.assertAllContainRequiredFields("PalRecord.schema.json", pal_records)
 
-  # Create Contour for each CBSD
+  # Create Contour for each CBSD, the radials of all CBSDs being split in
+  # blocks of azimuths processed in parallel.
+  azimuths = np.arange(0.0, 360.0)
+  work_units = [(device, azimuths[k:k+_NUM_AZIMUTHS_PER_WORK_UNIT])
+                for device in devices
+                for k in range(0, len(azimuths), _NUM_AZIMUTHS_PER_WORK_UNIT)]
   pool = mpool.Pool()
-  device_polygon = pool.map(_GetPolygon, devices)
+  work_units_dists = iter(pool.map(_GetContourDistsForWorkUnit, work_units))
+  num_units_per_device = len(work_units) // max(len(devices), 1)
+  device_polygon = []
+  for device in devices:
+    contour_dists_km = []
+    for _ in range(num_units_per_device):
+      contour_dists_km.extend(next(work_units_dists))
+    device_polygon.append(_GetPolygonFromContourDists(device, contour_dists_km))
 
   # Create Union of all the CBSD Contours and Check for hole
   # after County Clipping
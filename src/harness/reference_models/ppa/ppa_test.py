@@ -21,6 +21,7 @@ import json
 import os
 import unittest
 
+import numpy as np
 import shapely.geometry as sgeo
 from six.moves import range
 
@@ -60,9 +61,12 @@ class TestPpa(unittest.TestCase):
 
   def setUp(self):
     self.original_hybrid = wf_hybrid.CalcHybridPropagationLoss
+    # The tests replace the hybrid model.
+    ppa.SetBatchedRadials(False)
 
   def tearDown(self):
     wf_hybrid.CalcHybridPropagationLoss = self.original_hybrid
+    ppa.SetBatchedRadials(True)
 
   def assertAlmostSamePolygon(self, poly1, poly2, tol_km2=0.001):
     self.assertTrue(utils.GeometryArea(poly1.difference(poly2)) < tol_km2)
@@ -113,6 +117,20 @@ class TestPpa(unittest.TestCase):
         ['features'][0]['geometry'])
     self.assertTrue(utils.ToShapely(ppa_zone).buffer(-1e-6).within(county_zone))
 
+  def test_ContourSplitInAzimuthBlocks(self):
+    wf_hybrid.CalcHybridPropagationLoss = testutils.FakePropagationPredictor(
+        dist_type='REAL', factor=1.0, offset=(96+30-0.1) - 16.0)
+    device = TestPpa.devices[0]
+    azimuths = np.arange(0.0, 360.0)
+    split_dists = []
+    for k in range(0, 360, ppa._NUM_AZIMUTHS_PER_WORK_UNIT):
+      split_dists.extend(ppa._GetContourDists(
+          device, azimuths[k:k+ppa._NUM_AZIMUTHS_PER_WORK_UNIT]))
+    self.assertListEqual(split_dists, ppa._GetContourDists(device, azimuths))
+    self.assertTrue(
+        ppa._GetPolygonFromContourDists(device, split_dists).equals(
+            ppa._GetPolygon(device)))
+
 
 if __name__ == '__main__':
   unittest.main()
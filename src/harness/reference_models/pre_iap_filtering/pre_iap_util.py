@@ -141,16 +141,18 @@ def getFssNeighboringCbsdsWithGrants(cbsds, fss_point,
     distance_km: The neighboring distance (km).
   """
   neighboring_cbsds_with_grants = []
-  for cbsd in cbsds:
-    if not cbsd['grants']:
-      continue
-    distance, _, _ = vincenty.GeodesicDistanceBearing(
-        fss_point[1],
-        fss_point[0],
-        cbsd['registration']['installationParam']['latitude'],
-        cbsd['registration']['installationParam']['longitude'])
-    # Get the list of cbsds that are within 150kms from the FSS entity
-    if distance <= distance_km and cbsd['grants']:
+  cbsds = [cbsd for cbsd in cbsds if cbsd['grants']]
+  if not cbsds:
+    return neighboring_cbsds_with_grants
+  # Get the list of cbsds that are within 150kms from the FSS entity
+  insides = vincenty.GeodesicDistancesWithin(
+      fss_point[1],
+      fss_point[0],
+      [cbsd['registration']['installationParam']['latitude'] for cbsd in cbsds],
+      [cbsd['registration']['installationParam']['longitude'] for cbsd in cbsds],
+      distance_km)
+  for cbsd, inside in zip(cbsds, insides):
+    if inside:
       neighboring_cbsds_with_grants.append(cbsd)
   return neighboring_cbsds_with_grants
 
@@ -35,7 +35,8 @@ def point_to_point(its_elev, height_tx, height_rx,
   """Computes the ITM propagation path loss.
 
   Inputs:
-    its_elev:   Terrain profile in ITS format from transmitter to receiver::
+    its_elev:   Terrain profile in ITS format from transmitter to receiver,
+                as a list, tuple or ndarray:
                  - pfl[0] = number of elevation points - 1
                  - pfl[1] = step size, in meters
                  - pfl[2..N] = elevation above mean sea level, in meters
@@ -90,6 +91,8 @@ def point_to_point(its_elev, height_tx, height_rx,
            Other-  Warning: Some parameters are out of range.
                    Results are probably invalid.
   """
+  if not isinstance(its_elev, list):
+    its_elev = list(its_elev)
   if np.isscalar(reliabilities):
     return itm_its.point_to_point(its_elev, height_tx, height_rx,
                                   dielectric, conductivity, refractivity,
@@ -103,3 +106,69 @@ def point_to_point(its_elev, height_tx, height_rx,
                                        freq_mhz, climate, polarization,
                                        confidence, reliabilities,
                                        mdvar, refract_is_final)
+
+
+def point_to_point_multi(its_elevs, heights_tx, heights_rx,
+                         dielectric, conductivity,
+                         refractivities, freq_mhz,
+                         climates, polarization,
+                         confidence, reliabilities,
+                         mdvar=12, refract_is_final=False):
+  """Computes the ITM propagation path loss over several links.
+
+  This is a batched version of `point_to_point()`, running the ITM model over
+  all the links in a single call to the extension module (with the GIL released).
+  The results are identical to calling `point_to_point()` on each link.
+
+  Inputs:
+    its_elevs:  A 2D array (n_links, n_cols) of terrain profiles in ITS format,
+                one per link. Each profile can be zero padded at its end, only
+                the first its_elevs[k, 0]+3 values being used.
+    heights_tx: Heights of transmitter (meters), a sequence of n_links values.
+    heights_rx: Heights of receiver (meters), a sequence of n_links values.
+    dielectric: Dielectric constant (relative permittivity) of the ground.
+    conductivity: Conductivity of the ground (S/m).
+    refractivities: Refractivity of the atmosphere, a sequence of n_links values.
+    freq_mhz:   Frequency (MHz).
+    climates:   Climate codes, a sequence of n_links values.
+    polarization: Signal polarization (0: horizontal, 1: vertical).
+    confidence: Confidence factor [0.01..0.99].
+    reliabilities: Reliability factors [0.001..0.999], either a sequence of n_rels
+                   values common to all links, or a 2D array (n_links, n_rels)
+                   holding the reliabilities of each link.
+    mdvar:      Mode of variability.
+    refract_is_final: boolean - If True, do not correct the refractivity
+                      with average altitude.
+    See `point_to_point()` for more details on each parameter.
+
+  Returns:
+     a tuple of ndarray:
+       path_losses: the path losses in dB, a 2D array (n_links, n_rels).
+       vers_cbsd: the vertical departure angles at CBSD.
+       vers_rx: the vertical incidence angles at Rx.
+       err_nums:  The 'error' codes (see `point_to_point()`).
+  """
+  its_elevs = np.ascontiguousarray(its_elevs, dtype=np.float64)
+  if its_elevs.ndim != 2:
+    raise ValueError('Profiles should be a 2D array.')
+  num_links = its_elevs.shape[0]
+  reliabilities = np.asarray(reliabilities, dtype=np.float64)
+  if reliabilities.ndim < 2:
+    reliabilities = np.broadcast_to(reliabilities,
+                                    (num_links, reliabilities.size))
+  reliabilities = np.ascontiguousarray(reliabilities)
+  def _PerLink(values):
+    return np.ascontiguousarray(
+        np.broadcast_to(np.asarray(values, dtype=np.float64), (num_links,)))
+
+  db_losses = np.zeros(reliabilities.shape)
+  vers_cbsd = np.zeros(num_links)
+  vers_rx = np.zeros(num_links)
+  err_nums = np.zeros(num_links)
+  itm_its.point_to_point_multi(its_elevs, _PerLink(heights_tx), _PerLink(heights_rx),
+                               dielectric, conductivity, _PerLink(refractivities),
+                               freq_mhz, _PerLink(climates), polarization,
+                               confidence, reliabilities,
+                               db_losses, vers_cbsd, vers_rx, err_nums,
+                               mdvar, refract_is_final)
+  return db_losses, vers_cbsd, vers_rx, err_nums.astype(int)
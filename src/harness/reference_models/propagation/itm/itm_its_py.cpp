@@ -13,10 +13,35 @@
 // limitations under the License.
 
 #include <Python.h>
+#include <pythread.h>
 #include <iostream>
 
 #include "its/itm.h"
 
+// The ITS ITM implementation is not thread-safe (it uses global variables).
+// All calls to the ITM core are protected by this lock, as the GIL is released
+// during the computation.
+static PyThread_type_lock itm_lock = NULL;
+
+// Gets a C-contiguous buffer of doubles from `obj`, with `ndim` dimensions.
+// Returns 0 if success, otherwise -1 with the python exception set.
+static int GetDoubleBuffer(PyObject* obj, Py_buffer* view, int ndim,
+                           bool writable, const char* name) {
+  int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+  if (writable) flags |= PyBUF_WRITABLE;
+  if (PyObject_GetBuffer(obj, view, flags) != 0) {
+    return -1;
+  }
+  if (view->ndim != ndim || view->format == NULL ||
+      view->format[0] != 'd' || view->format[1] != '\0') {
+    PyBuffer_Release(view);
+    PyErr_Format(PyExc_ValueError,
+                 "%s should be a contiguous %dD array of float64.", name, ndim);
+    return -1;
+  }
+  return 0;
+}
+
 
 static PyObject* itm_point_to_point(PyObject* self, PyObject* args) {
   PyObject* elev_obj = NULL;
@@ -65,10 +90,14 @@ static PyObject* itm_point_to_point(PyObject* self, PyObject* args) {
   char strmode[100];
   int errnum;
   double ver0, ver1;
+  Py_BEGIN_ALLOW_THREADS
+  PyThread_acquire_lock(itm_lock, WAIT_LOCK);
   point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
                  eno_ns_surfref, frq_mhz, radio_climate, pol, conf, rel,
                  mdvar, !!eno_final,
                  dbloss, strmode, errnum, ver0, ver1);
+  PyThread_release_lock(itm_lock);
+  Py_END_ALLOW_THREADS
   delete[] elev;
   return Py_BuildValue("dddsi", dbloss, ver0, ver1, strmode, errnum);
 }
@@ -145,11 +174,15 @@ static PyObject* itm_point_to_point_rels(PyObject* self, PyObject* args) {
   double ver0, ver1;
   char strmode[100];
   int errnum;
+  Py_BEGIN_ALLOW_THREADS
+  PyThread_acquire_lock(itm_lock, WAIT_LOCK);
   point_to_point_rels(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
                       eno_ns_surfref, frq_mhz, radio_climate, pol, conf,
                       rels, num_rels,
                       mdvar, !!eno_final,
                       db_losses, strmode, errnum, ver0, ver1);
+  PyThread_release_lock(itm_lock);
+  Py_END_ALLOW_THREADS
   delete[] elev;
   delete[] rels;
 
@@ -163,9 +196,124 @@ static PyObject* itm_point_to_point_rels(PyObject* self, PyObject* args) {
   return Py_BuildValue("Nddsi", loss_obj, ver0, ver1, strmode, errnum);
 }
 
+// Point-to-point model over several links, in a single call.
+// All array arguments shall be C-contiguous float64 buffers (eg. numpy arrays):
+//  - elevs: 2D array (n_links, n_cols) of profiles in ITS format. Each profile
+//    can be zero padded: only its first elevs[k, 0]+3 values are used.
+//  - tht_m, rht_m, eno_ns_surfref, radio_climate: 1D arrays of n_links values.
+//  - rels: 2D array (n_links, n_rels) of the reliabilities of each link.
+//  - db_losses (output): 2D array (n_links, n_rels) of path losses.
+//  - ver0, ver1, errnum (output): 1D arrays of n_links values.
+// The computation is done with the GIL released.
+static PyObject* itm_point_to_point_multi(PyObject* self, PyObject* args) {
+  PyObject *elevs_obj, *tht_obj, *rht_obj, *eno_obj, *climate_obj, *rels_obj;
+  PyObject *losses_obj, *ver0_obj, *ver1_obj, *errnum_obj;
+  double eps_dielect, sgm_conductivity;
+  double frq_mhz;
+  int pol;
+  double conf;
+  int mdvar = 12;  // Default arguments
+  int eno_final = 0;
+  if (!PyArg_ParseTuple(args, "OOOddOdOidOOOOO|ii:point_to_point_multi",
+                        &elevs_obj, &tht_obj, &rht_obj,
+                        &eps_dielect, &sgm_conductivity, &eno_obj,
+                        &frq_mhz, &climate_obj, &pol, &conf, &rels_obj,
+                        &losses_obj, &ver0_obj, &ver1_obj, &errnum_obj,
+                        &mdvar, &eno_final)) {
+    return NULL;
+  }
+
+  const int kNumBuffers = 10;
+  PyObject* objs[kNumBuffers] = {elevs_obj, tht_obj, rht_obj, eno_obj,
+                                 climate_obj, rels_obj,
+                                 losses_obj, ver0_obj, ver1_obj, errnum_obj};
+  const char* names[kNumBuffers] = {"elevs", "tht_m", "rht_m", "eno_ns_surfref",
+                                    "radio_climate", "rels",
+                                    "db_losses", "ver0", "ver1", "errnum"};
+  const int ndims[kNumBuffers] = {2, 1, 1, 1, 1, 2, 2, 1, 1, 1};
+  Py_buffer views[kNumBuffers];
+  int num_views = 0;
+  bool valid = true;
+  for (; num_views < kNumBuffers; num_views++) {
+    if (GetDoubleBuffer(objs[num_views], &views[num_views], ndims[num_views],
+                        num_views >= 6, names[num_views]) != 0) {
+      valid = false;
+      break;
+    }
+  }
+
+  Py_ssize_t num_links = 0, num_cols = 0, num_rels = 0;
+  if (valid) {
+    num_links = views[0].shape[0];
+    num_cols = views[0].shape[1];
+    num_rels = views[5].shape[1];
+    bool valid_dims = (num_cols >= 4 && num_rels > 0 &&
+                       views[6].shape[1] == num_rels);
+    for (int i = 1; i < kNumBuffers; i++) {
+      if (views[i].shape[0] != num_links) valid_dims = false;
+    }
+    if (!valid_dims) {
+      PyErr_SetString(PyExc_ValueError, "Inconsistent array dimensions.");
+      valid = false;
+    }
+  }
+  if (valid) {
+    const double* elevs = static_cast<double*>(views[0].buf);
+    for (Py_ssize_t k = 0; k < num_links; k++) {
+      if (!(elevs[k*num_cols] <= num_cols-3)) {
+        PyErr_SetString(PyExc_ValueError,
+            "Invalid Profile. Size in slot 0 bigger than actual array size.");
+        valid = false;
+        break;
+      }
+    }
+  }
+  if (!valid) {
+    for (int i = 0; i < num_views; i++) {
+      PyBuffer_Release(&views[i]);
+    }
+    return NULL;
+  }
+
+  double* elevs = static_cast<double*>(views[0].buf);
+  const double* tht_m = static_cast<double*>(views[1].buf);
+  const double* rht_m = static_cast<double*>(views[2].buf);
+  const double* eno_ns_surfref = static_cast<double*>(views[3].buf);
+  const double* radio_climate = static_cast<double*>(views[4].buf);
+  double* rels = static_cast<double*>(views[5].buf);
+  double* db_losses = static_cast<double*>(views[6].buf);
+  double* ver0 = static_cast<double*>(views[7].buf);
+  double* ver1 = static_cast<double*>(views[8].buf);
+  double* errnums = static_cast<double*>(views[9].buf);
+
+  Py_BEGIN_ALLOW_THREADS
+  PyThread_acquire_lock(itm_lock, WAIT_LOCK);
+  char strmode[100];
+  int errnum;
+  for (Py_ssize_t k = 0; k < num_links; k++) {
+    point_to_point_rels(elevs + k*num_cols, tht_m[k], rht_m[k],
+                        eps_dielect, sgm_conductivity, eno_ns_surfref[k],
+                        frq_mhz, static_cast<int>(radio_climate[k]), pol, conf,
+                        rels + k*num_rels, static_cast<int>(num_rels),
+                        mdvar, !!eno_final,
+                        db_losses + k*num_rels, strmode, errnum,
+                        ver0[k], ver1[k]);
+    errnums[k] = errnum;
+  }
+  PyThread_release_lock(itm_lock);
+  Py_END_ALLOW_THREADS
+
+  for (int i = 0; i < kNumBuffers; i++) {
+    PyBuffer_Release(&views[i]);
+  }
+  Py_RETURN_NONE;
+}
+
 static PyMethodDef ITMMethods[] = {
   {"point_to_point", itm_point_to_point, METH_VARARGS, "Point-to-point model"},
   {"point_to_point_rels", itm_point_to_point_rels, METH_VARARGS, "Point-to-point-Rels model"},
+  {"point_to_point_multi", itm_point_to_point_multi, METH_VARARGS,
+   "Point-to-point-Rels model over several links"},
   {NULL, NULL, 0, NULL}
 };
 
@@ -175,11 +323,13 @@ PyMODINIT_FUNC PyInit_itm_its(void) {
     PyModuleDef_HEAD_INIT, "itm_its",
     "Longley-Rice ITM Propagation Module", -1,
     ITMMethods, NULL, NULL, NULL, NULL};
+  itm_lock = PyThread_allocate_lock();
   PyObject* module = PyModule_Create(&module_def);
   return module;
 }
 #else  // Python2
 PyMODINIT_FUNC inititm_its(void) {
+  itm_lock = PyThread_allocate_lock();
   Py_InitModule3("itm_its",  ITMMethods,
                  "Longley-Rice ITM Propagation Module");
 }
@@ -318,6 +318,56 @@ class TestItm(unittest.TestCase):
     self.assertEqual(a0, v0)
     self.assertEqual(a1, v1)
 
+  def test_multi_links(self):
+    profiles = [PROFILE, [5, 28.5, 10, 10, 8, 9, 11, 12]]
+    heights_tx = [143.9, 100]
+    heights_rx = [8.5, 50]
+    refractivities = [314., 301.]
+    climates = [5, 6]
+    reliabilities = np.arange(0.1, 1.0, 0.1)
+    its_elevs = np.zeros((len(profiles), len(PROFILE)))
+    for k, profile in enumerate(profiles):
+      its_elevs[k, :len(profile)] = profile
+
+    losses, vers0, vers1, errs = itm.point_to_point_multi(
+        its_elevs, heights_tx, heights_rx,
+        dielectric=15, conductivity=.005,
+        refractivities=refractivities,
+        freq_mhz=573.3, climates=climates,
+        polarization=0, confidence=0.5, reliabilities=reliabilities)
+    self.assertEqual(losses.shape, (len(profiles), len(reliabilities)))
+    # Test against single link version
+    for k, profile in enumerate(profiles):
+      exp_losses, v0, v1, _, err = itm.point_to_point(
+          profile, heights_tx[k], heights_rx[k],
+          dielectric=15, conductivity=.005,
+          refractivity=refractivities[k],
+          freq_mhz=573.3, climate=climates[k],
+          polarization=0, confidence=0.5, reliabilities=reliabilities)
+      self.assertListEqual(list(losses[k]), exp_losses)
+      self.assertEqual(vers0[k], v0)
+      self.assertEqual(vers1[k], v1)
+      self.assertEqual(errs[k], err)
+
+    # Test with per link reliabilities
+    losses2, _, _, _ = itm.point_to_point_multi(
+        its_elevs, heights_tx, heights_rx,
+        dielectric=15, conductivity=.005,
+        refractivities=refractivities,
+        freq_mhz=573.3, climates=climates,
+        polarization=0, confidence=0.5,
+        reliabilities=[reliabilities, reliabilities[::-1]])
+    self.assertListEqual(list(losses2[0]), list(losses[0]))
+    self.assertListEqual(list(losses2[1]), list(losses[1][::-1]))
+
+  def test_multi_links_invalid_profile(self):
+    its_elevs = np.array([[10, 28.5, 10, 10, 8, 9, 11, 12]])
+    with self.assertRaises(ValueError):
+      itm.point_to_point_multi(its_elevs, 100, 50,
+                               dielectric=15, conductivity=.005,
+                               refractivities=314., freq_mhz=573.3, climates=5,
+                               polarization=0, confidence=0.5, reliabilities=0.5)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -31,6 +31,13 @@ Typical usage:
               reliability=0.5,
               freq_mhz=3625.,
               region='URBAN')
+
+  # Get the path losses from a CBSD to all the points of a radial
+  db_losses = CalcHybridPropagationLossRadial(
+              lat_cbsd, lon_cbsd, height_cbsd,
+              lats_rx, lons_rx, height_rx,
+              reliability=0.5,
+              region='URBAN').db_loss
 """
 from __future__ import absolute_import
 from __future__ import division
@@ -39,6 +46,8 @@ from __future__ import print_function
 from collections import namedtuple
 import math
 
+import numpy as np
+
 from reference_models.geo import drive
 from reference_models.geo import vincenty
 from reference_models.propagation import wf_itm
@@ -221,26 +230,150 @@ def CalcHybridPropagationLoss(lat_cbsd, lon_cbsd, height_cbsd,
   height_cbsd = max(height_cbsd, 20.)
   height_rx = 1.5
 
-  # Calculate the predicted ITM loss
-  # and get the distance and profile for use in further logic
-  db_loss_itm, incidence_angles, internals = wf_itm.CalcItmPropagationLoss(
-      lat_cbsd, lon_cbsd, height_cbsd,
-      lat_rx, lon_rx, height_rx,
-      False, reliability, freq_mhz, its_elev, return_internals=True)
+  # Calculate the predicted ITM loss, and the ITM median in the same ITM run
+  # when the mean is requested, and get the distance and profile for use in
+  # further logic
+  if reliability == -1:
+    itm_loss_stats, incidence_angles, internals = (
+        wf_itm.CalcItmPropagationLossStats(
+            lat_cbsd, lon_cbsd, height_cbsd,
+            lat_rx, lon_rx, height_rx,
+            False, None, freq_mhz, its_elev, return_internals=True))
+    db_loss_itm, itm_median_loss = itm_loss_stats.mean, itm_loss_stats.median
+  else:
+    db_loss_itm, incidence_angles, internals = wf_itm.CalcItmPropagationLoss(
+        lat_cbsd, lon_cbsd, height_cbsd,
+        lat_rx, lon_rx, height_rx,
+        False, reliability, freq_mhz, its_elev, return_internals=True)
+    itm_median_loss = db_loss_itm
   internals['itm_db_loss'] = db_loss_itm
 
-  # Calculate the effective heights of the tx
-  height_cbsd_eff = ehata.CbsdEffectiveHeights(height_cbsd, its_elev)
+  db_loss, hybrid_opcode, height_cbsd_eff = _CalcHybridLossFromItm(
+      db_loss_itm, itm_median_loss, its_elev, internals['dist_km'],
+      incidence_angles.hor_cbsd, lat_cbsd, lon_cbsd, height_cbsd, height_rx,
+      reliability, freq_mhz, region)
   internals['effective_height_cbsd'] = height_cbsd_eff
-
-  # Get the distance
-  dist_km = internals['dist_km']
   if not return_internals: internals = None
 
+  return _BuildOutput(db_loss, incidence_angles, internals,
+                      hybrid_opcode, cbsd_indoor)
+
+
+def CalcHybridPropagationLossRadial(lat_cbsd, lon_cbsd, height_cbsd,
+                                    lats_rx, lons_rx, height_rx,
+                                    cbsd_indoor=False,
+                                    reliability=-1,
+                                    freq_mhz=3625.,
+                                    region='RURAL',
+                                    is_height_cbsd_amsl=False):
+  """Implements the Hybrid ITM/eHata NTIA propagation model from a CBSD to several points.
+
+  This is a batched version of `CalcHybridPropagationLoss()`, typically used for
+  computing the path losses from a CBSD to all the points of a radial (for
+  example when creating the PPA contours). The terrain profiles of all the paths
+  are extracted in a single pass, and the ITM model run over all the paths in
+  one call (providing both the mean and median losses), before applying the
+  hybrid logic on each path.
+  Results are identical to calling `CalcHybridPropagationLoss()` on each point.
+
+  Inputs:
+    lat_cbsd, lon_cbsd, height_cbsd: Lat/lon (deg) and height AGL (m) of CBSD
+    lats_rx, lons_rx:   Lat/lon (deg) of the N Rx points, as sequences.
+    height_rx:          Height AGL (m) of the Rx points.
+    Other inputs:       See `CalcHybridPropagationLoss()`.
+
+  Returns:
+    A namedtuple of:
+      db_loss:          ndarray of the N path losses in dB.
+      incidence_angles: A namedtuple of ndarray of the N paths angles (degrees)
+                        (see `CalcHybridPropagationLoss()`).
+      internals:        None.
+
+  Raises:
+    Exception if input parameters invalid or out of range.
+  """
+  # Sanity checks on input parameters
+  if freq_mhz < 40 or freq_mhz > 10000:
+    raise Exception('Frequency outside range [40MHz - 10GHz].')
+  if region not in ['RURAL', 'URBAN', 'SUBURBAN']:
+    raise Exception('Region %s not allowed' % region)
+  if reliability not in (-1, 0.5):
+    raise Exception('Hybrid model only computes the median or the mean.')
+
+  lats_rx = np.atleast_1d(np.asarray(lats_rx, dtype=float))
+  lons_rx = np.atleast_1d(np.asarray(lons_rx, dtype=float))
+  # Case of same points: null path loss
+  links = ~((lats_rx == lat_cbsd) & (lons_rx == lon_cbsd))
+
+  if is_height_cbsd_amsl:
+    altitude_cbsd = drive.terrain_driver.GetTerrainElevation(lat_cbsd, lon_cbsd)
+    height_cbsd = height_cbsd - altitude_cbsd
+
+  # Get all the terrain profiles, in the same way as the single path version.
+  its_elevs, num_points = drive.terrain_driver.TerrainProfiles(
+      lat_cbsd, lon_cbsd, lats_rx, lons_rx,
+      target_res_meter=30., do_interp=True, max_points=1501)
+
+  # Structural CBSD and mobile height corrections
+  height_cbsd = max(height_cbsd, 20.)
+  height_rx = 1.5
+
+  # Calculate the predicted ITM losses, and the ITM medians in the same ITM run.
+  if reliability == -1:
+    itm_loss_stats, incidence_angles, internals = (
+        wf_itm.CalcItmPropagationLossMultiStats(
+            lat_cbsd, lon_cbsd, height_cbsd,
+            lats_rx, lons_rx, height_rx,
+            False, None, freq_mhz, its_elevs, return_internals=True))
+    db_loss_itm, itm_median_loss = itm_loss_stats.mean, itm_loss_stats.median
+  else:
+    db_loss_itm, incidence_angles, internals = wf_itm.CalcItmPropagationLossMulti(
+        lat_cbsd, lon_cbsd, height_cbsd,
+        lats_rx, lons_rx, height_rx,
+        False, reliability, freq_mhz, its_elevs, return_internals=True)
+    itm_median_loss = db_loss_itm
+
+  db_loss = np.zeros(len(lats_rx))
+  for k in np.nonzero(links)[0]:
+    db_loss[k], _, _ = _CalcHybridLossFromItm(
+        db_loss_itm[k], itm_median_loss[k],
+        list(its_elevs[k, :num_points[k]+2]), internals['dist_km'][k],
+        incidence_angles.hor_cbsd[k], lat_cbsd, lon_cbsd, height_cbsd, height_rx,
+        reliability, freq_mhz, region)
+  if cbsd_indoor:
+    db_loss[links] += 15
+
+  return _PropagResult(
+      db_loss = db_loss,
+      incidence_angles = incidence_angles,
+      internals = None)
+
+
+def _CalcHybridLossFromItm(db_loss_itm, itm_median_loss,
+                           its_elev, dist_km, bearing,
+                           lat_cbsd, lon_cbsd, height_cbsd, height_rx,
+                           reliability, freq_mhz, region):
+  """Computes the hybrid path loss of a path from its ITM path loss.
+
+  Inputs:
+    db_loss_itm:        The ITM path loss for the requested reliability.
+    itm_median_loss:    The ITM median path loss.
+    its_elev:           The terrain profile (ITS format) from CBSD to Rx.
+    dist_km:            The distance between end points (km).
+    bearing:            The bearing from CBSD to Rx (degrees).
+    Other inputs:       See `CalcHybridPropagationLoss()`, the CBSD and Rx
+                        heights being already corrected.
+
+  Returns:
+    A tuple (db_loss, hybrid_opcode, effective_height_cbsd), the path loss not
+    including the indoor loss.
+  """
+  # Calculate the effective heights of the tx
+  height_cbsd_eff = ehata.CbsdEffectiveHeights(height_cbsd, its_elev)
+
   # Use ITM if CBSD effective height greater than 200 m
   if height_cbsd_eff >= 200:
-    return _BuildOutput(db_loss_itm, incidence_angles, internals,
-                        HybridMode.ITM_HIGH_HEIGHT, cbsd_indoor)
+    return db_loss_itm, HybridMode.ITM_HIGH_HEIGHT, height_cbsd_eff
 
   # Set the environment code number.
   if region == 'URBAN':
@@ -248,8 +381,7 @@ def CalcHybridPropagationLoss(lat_cbsd, lon_cbsd, height_cbsd,
   elif region == 'SUBURBAN':
     region_code = 22
   else:  # 'RURAL': use ITM
-    return _BuildOutput(db_loss_itm, incidence_angles, internals,
-                        HybridMode.ITM_RURAL, cbsd_indoor)
+    return db_loss_itm, HybridMode.ITM_RURAL, height_cbsd_eff
 
   # The eHata offset to apply (only in case the mean is requested)
   offset_median_to_mean = _GetMedianToMeanOffsetDb(freq_mhz, region == 'URBAN')
@@ -257,8 +389,7 @@ def CalcHybridPropagationLoss(lat_cbsd, lon_cbsd, height_cbsd,
   # Now process the different cases
   if dist_km <= 0.1:  # Use Free Space Loss
     db_loss = CalcFreeSpaceLoss(dist_km, freq_mhz, height_cbsd, height_rx)
-    return _BuildOutput(db_loss, incidence_angles, internals,
-                        HybridMode.FSL, cbsd_indoor)
+    return db_loss, HybridMode.FSL, height_cbsd_eff
 
   elif dist_km > 0.1 and dist_km < 1:  # Use E-Hata Median Basic Prop Loss
     fsl_100m = CalcFreeSpaceLoss(0.1, freq_mhz, height_cbsd, height_rx)
@@ -272,8 +403,7 @@ def CalcHybridPropagationLoss(lat_cbsd, lon_cbsd, height_cbsd,
     # Weight the offset as well from 0 (100m) to 1.0 (1km).
     if reliability == -1:
       db_loss += alpha * offset_median_to_mean
-    return _BuildOutput(db_loss, incidence_angles, internals,
-                        HybridMode.EHATA_FSL_INTERP, cbsd_indoor)
+    return db_loss, HybridMode.EHATA_FSL_INTERP, height_cbsd_eff
 
   elif dist_km >= 1 and dist_km <= 80:  # Use best of E-Hata / ITM
     ehata_loss_med = ehata.ExtendedHata(its_elev, freq_mhz, height_cbsd, height_rx,
@@ -283,39 +413,50 @@ def CalcHybridPropagationLoss(lat_cbsd, lon_cbsd, height_cbsd,
       itm_loss_med = db_loss_itm
     else:
       ehata_loss = ehata_loss_med + offset_median_to_mean
-      itm_loss_med = wf_itm.CalcItmPropagationLoss(
-          lat_cbsd, lon_cbsd, height_cbsd, lat_rx, lon_rx, height_rx,
-          False, 0.5, freq_mhz, its_elev).db_loss
+      itm_loss_med = itm_median_loss
 
     if itm_loss_med >= ehata_loss_med:
-      return _BuildOutput(db_loss_itm, incidence_angles, internals,
-                          HybridMode.ITM_DOMINANT, cbsd_indoor)
+      return db_loss_itm, HybridMode.ITM_DOMINANT, height_cbsd_eff
     else:
-      return _BuildOutput(ehata_loss, incidence_angles, internals,
-                          HybridMode.EHATA_DOMINANT, cbsd_indoor)
+      return ehata_loss, HybridMode.EHATA_DOMINANT, height_cbsd_eff
 
   elif dist_km > 80:  # Use the ITM with correction from E-Hata @ 80km
-    # Calculate the ITM median and eHata median losses at 80km
-    bearing = incidence_angles.hor_cbsd
-
-    lat_80km, lon_80km, _ = vincenty.GeodesicPoint(lat_cbsd, lon_cbsd,
-                                                   80., bearing)
-    its_elev_80km = drive.terrain_driver.TerrainProfile(
-        lat_cbsd, lon_cbsd, lat_80km, lon_80km,
-        target_res_meter=30.,
-        do_interp=True, max_points=1501)
-    ehata_loss_80km = ehata.ExtendedHata(its_elev_80km, freq_mhz,
-                                         height_cbsd, height_rx,
-                                         region_code)
-    itm_loss_80km = wf_itm.CalcItmPropagationLoss(
-        lat_cbsd, lon_cbsd, height_cbsd, lat_80km, lon_80km, height_rx,
-        False, 0.5, freq_mhz, its_elev_80km).db_loss
-
-    J = max(ehata_loss_80km - itm_loss_80km, 0)
+    J = _GetCorrectionAt80km(lat_cbsd, lon_cbsd, height_cbsd, height_rx,
+                             bearing, freq_mhz, region_code)
     db_loss = db_loss_itm + J
 
-    return _BuildOutput(db_loss, incidence_angles, internals,
-                        HybridMode.ITM_CORRECTED, cbsd_indoor)
+    return db_loss, HybridMode.ITM_CORRECTED, height_cbsd_eff
+
+
+def _GetCorrectionAt80km(lat_cbsd, lon_cbsd, height_cbsd, height_rx,
+                         bearing, freq_mhz, region_code):
+  """Returns the eHata correction J of the ITM losses for links over 80km.
+
+  Inputs:
+    lat_cbsd, lon_cbsd: Lat/lon (deg) of the CBSD.
+    height_cbsd, height_rx: The corrected heights of the CBSD and Rx (m).
+    bearing:            The bearing from CBSD to Rx (degrees).
+    freq_mhz:           The frequency (MHz).
+    region_code:        The eHata environment code.
+
+  Returns:
+    The correction J (dB), to be added to the ITM loss.
+  """
+  # Calculate the ITM median and eHata median losses at 80km
+  lat_80km, lon_80km, _ = vincenty.GeodesicPoint(lat_cbsd, lon_cbsd,
+                                                 80., bearing)
+  its_elev_80km = drive.terrain_driver.TerrainProfile(
+      lat_cbsd, lon_cbsd, lat_80km, lon_80km,
+      target_res_meter=30.,
+      do_interp=True, max_points=1501)
+  ehata_loss_80km = ehata.ExtendedHata(its_elev_80km, freq_mhz,
+                                       height_cbsd, height_rx,
+                                       region_code)
+  itm_loss_80km = wf_itm.CalcItmPropagationLoss(
+      lat_cbsd, lon_cbsd, height_cbsd, lat_80km, lon_80km, height_rx,
+      False, 0.5, freq_mhz, its_elev_80km).db_loss
+
+  return max(ehata_loss_80km - itm_loss_80km, 0)
 
 
 def CalcFreeSpaceLoss(dist_km, freq_mhz, height_cbsd, height_rx):
@@ -22,6 +22,7 @@ import unittest
 
 from reference_models.tools import testutils
 from reference_models.geo import drive
+from reference_models.geo import vincenty
 from reference_models.propagation import wf_hybrid
 from reference_models.propagation import wf_itm
 
@@ -223,6 +224,30 @@ class TestWfHybrid(unittest.TestCase):
     self.assertEqual(result.db_loss, 0)
     self.assertTupleEqual(result.incidence_angles, (0, 0, 0, 0))
 
+  def test_radial(self):
+    lat1, lng1, height1 = 37.751985, -122.443890, 20.0
+    _, bearing, _ = vincenty.GeodesicDistanceBearing(lat1, lng1,
+                                                     37.094745, -122.040671)
+    dists = [0.05, 0.5, 2., 10., 30., 81.]
+    lats, lngs, _ = vincenty.GeodesicPoints(lat1, lng1, dists, bearing)
+    lats, lngs = [lat1] + list(lats), [lng1] + list(lngs)
+    for region in ['RURAL', 'SUBURBAN', 'URBAN']:
+      for reliability in [0.5, -1]:
+        for indoor in [False, True]:
+          res = wf_hybrid.CalcHybridPropagationLossRadial(
+              lat1, lng1, height1, lats, lngs, 1.5,
+              cbsd_indoor=indoor, reliability=reliability,
+              freq_mhz=3625., region=region)
+          exp_losses = [wf_hybrid.CalcHybridPropagationLoss(
+              lat1, lng1, height1, lat, lng, 1.5,
+              cbsd_indoor=indoor, reliability=reliability,
+              freq_mhz=3625., region=region).db_loss
+                        for lat, lng in zip(lats, lngs)]
+          self.assertEqual(len(res.db_loss), len(exp_losses))
+          for loss, exp_loss in zip(res.db_loss, exp_losses):
+            self.assertAlmostEqual(loss, exp_loss, 6)
+    self.assertEqual(res.db_loss[0], 0)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -73,6 +73,14 @@ _IncidenceAngles = namedtuple('_IncidenceAngles',
                               ['hor_cbsd', 'ver_cbsd', 'hor_rx', 'ver_rx'])
 
 
+ItmLossStats = namedtuple('ItmLossStats', ['mean', 'median', 'quantiles'])
+
+# The reliabilities for computing the mean path loss (1% to 99% included), the
+# median being one of them.
+_MEAN_RELIABILITIES = np.arange(0.01, 1.0, 0.01)
+_MEDIAN_RELIABILITY_IDX = 49
+
+
 # Main entry point for the Winnforum compliant ITM propagation model
 def CalcItmPropagationLoss(lat_cbsd, lon_cbsd, height_cbsd,
                            lat_rx, lon_rx, height_rx,
@@ -234,6 +242,272 @@ def CalcItmPropagationLoss(lat_cbsd, lon_cbsd, height_cbsd,
   )
 
 
+def CalcItmPropagationLossMulti(lats_cbsd, lons_cbsd, heights_cbsd,
+                                lat_rx, lon_rx, height_rx,
+                                cbsds_indoor=False,
+                                reliability=0.5,
+                                freq_mhz=3625.,
+                                its_elevs=None,
+                                is_height_cbsd_amsl=False,
+                                return_internals=False):
+  """Implements the WinnForum-compliant ITM model over several CBSDs.
+
+  This is a batched version of `CalcItmPropagationLoss()` for computing the path
+  loss from N CBSDs to a common Rx point, or from a CBSD to N Rx points. The
+  terrain profiles are extracted in a single pass and the ITM model run over all
+  the links in one call.
+  Results are identical to calling `CalcItmPropagationLoss()` on each link.
+
+  Inputs:
+    lats_cbsd, lons_cbsd, heights_cbsd: Lat/lon (deg) and height AGL (m) of the
+                         N CBSDs, as sequences, or of a single CBSD.
+    lat_rx, lon_rx:      Lat/lon (deg) of Rx point, or sequences of the N Rx
+                         points.
+    height_rx:           Height AGL (m) of the Rx point(s), common to all links.
+    cbsds_indoor:        CBSD indoor status, a scalar or a sequence of N values.
+    reliability:         Reliability. Default is 0.5 (median value)
+                         Different options:
+                           value in [0,1]: returns the CDF quantile
+                           -1: returns the mean path loss
+                           sequence of values: returns the path losses for
+                             these reliabilities (common to all CBSDs)
+                           2D array (N, n_rels): the reliabilities of each CBSD.
+    freq_mhz:            Frequency (MHz). Default is mid-point of band.
+    its_elevs:           Optional profiles to use (in ITM format), as a 2D zero
+                           padded array. Default=None. If not specified, they are
+                           extracted from the terrain.
+    is_height_cbsd_amsl: If True, the CBSD height shall be considered as AMSL (Average
+                         mean sea level).
+    return_internals: If True, returns internal variables.
+
+  Returns:
+    A namedtuple of:
+      db_loss            Path Loss in dB, as an ndarray of shape (N,) if
+                           reliability is scalar, or (N, n_rels) otherwise.
+      incidence_angles:  A namedtuple of ndarray of the N links angles:
+          hor_cbsd:        Horizontal departure angle (bearing) from CBSD to Rx
+          ver_cbsd:        Vertical departure angle at CBSD
+          hor_rx:          Horizontal incidence angle (bearing) from Rx to CBSD
+          ver_rx:          Vertical incidence angle at Rx
+      internals:         A dictionary of internal data for advanced analysis
+                         (only if return_internals=True, otherwise None):
+          itm_err_num:     ndarray of the ITM error codes.
+          dist_km:         ndarray of the distances between end points (km).
+
+  Raises:
+    Exception if input parameters invalid or out of range.
+  """
+  lats_cbsd, lons_cbsd, lats_rx, lons_rx = [
+      np.atleast_1d(coords) for coords in np.broadcast_arrays(
+          np.asarray(lats_cbsd, dtype=float), np.asarray(lons_cbsd, dtype=float),
+          np.asarray(lat_rx, dtype=float), np.asarray(lon_rx, dtype=float))]
+  num_links = len(lats_cbsd)
+  heights_cbsd = np.array(np.broadcast_to(heights_cbsd, num_links), dtype=float)
+  cbsds_indoor = np.broadcast_to(np.asarray(cbsds_indoor, dtype=bool), num_links)
+
+  # Sanity checks on input parameters
+  if freq_mhz < 40.0 or freq_mhz > 10000:
+    raise Exception('Frequency outside range [40MHz - 10GHz]')
+
+  if is_height_cbsd_amsl:
+    altitudes_cbsd = drive.terrain_driver.GetTerrainElevation(lats_cbsd, lons_cbsd)
+    heights_cbsd = heights_cbsd - altitudes_cbsd
+
+  # Ensure minimum height of 1 meter
+  heights_cbsd[heights_cbsd < 1] = 1
+  if height_rx < 1:
+    height_rx = 1
+
+  # Case of same points: path loss and angles are 0 (ITM not called)
+  links = ~((lats_cbsd == lats_rx) & (lons_cbsd == lons_rx))
+
+  # Internal ITM parameters are always set to following values in WF version:
+  confidence = 0.5     # Confidence (always 0.5)
+  dielec = 25.         # Dielectric constant (always 25.)
+  conductivity = 0.02  # Conductivity (always 0.02)
+  polarization = 1     # Polarization (always vertical = 1)
+  mdvar = 13
+
+  # Get the terrain profiles, using Vincenty great circle route, and WF
+  # standard (bilinear interp; 1500 pts for all distances over 45 km)
+  if its_elevs is None:
+    its_elevs, _ = drive.terrain_driver.TerrainProfiles(
+        lats_cbsd, lons_cbsd, lats_rx, lons_rx,
+        target_res_meter=30.,
+        do_interp=True, max_points=1501)
+
+  # Find the midpoint of the great circle paths, and the climate and refractivity
+  # Note: these are looked up per link, even along a radial, since they are
+  # taken at the midpoint of each path, and the refractivity is interpolated.
+  dists_km = np.zeros(num_links)
+  bearings_cbsd = np.zeros(num_links)
+  bearings_rx = np.zeros(num_links)
+  climates = np.zeros(num_links)
+  refractivities = np.zeros(num_links)
+  for k in np.nonzero(links)[0]:
+    dists_km[k], bearings_cbsd[k], bearings_rx[k] = vincenty.GeodesicDistanceBearing(
+        lats_cbsd[k], lons_cbsd[k], lats_rx[k], lons_rx[k])
+    latmid, lonmid, _ = vincenty.GeodesicPoint(
+        lats_cbsd[k], lons_cbsd[k], dists_km[k]/2., bearings_cbsd[k])
+    climate = drive.climate_driver.TropoClim(latmid, lonmid)
+    if climate == 7:
+      climate = min(drive.climate_driver.TropoClim(lats_cbsd[k], lons_cbsd[k]),
+                    drive.climate_driver.TropoClim(lats_rx[k], lons_rx[k]))
+    climates[k] = climate
+    refractivities[k] = drive.refract_driver.Refractivity(latmid, lonmid)
+
+  # Call ITM prop loss.
+  reliabilities = reliability
+  do_avg = False
+  if np.isscalar(reliabilities) and reliability == -1:
+    # Pathloss mean: average the value for 1% to 99% included
+    reliabilities = np.arange(0.01, 1.0, 0.01)
+    do_avg = True
+
+  if np.ndim(reliabilities) == 2:
+    reliabilities = np.asarray(reliabilities)[links]
+  db_losses, vers_cbsd, vers_rx, err_nums = itm.point_to_point_multi(
+      np.asarray(its_elevs)[links], heights_cbsd[links], height_rx,
+      dielec, conductivity,
+      refractivities[links], freq_mhz,
+      climates[links], polarization,
+      confidence, reliabilities,
+      mdvar, False)
+  if do_avg:
+    db_losses = -10*np.log10(np.mean(10**(-db_losses/10.), axis=1))
+  elif np.isscalar(reliabilities):
+    db_losses = db_losses[:, 0]
+  db_loss = np.zeros((num_links,) + db_losses.shape[1:])
+  db_loss[links] = db_losses
+  ver_cbsd = np.zeros(num_links)
+  ver_cbsd[links] = vers_cbsd
+  ver_rx = np.zeros(num_links)
+  ver_rx[links] = vers_rx
+
+  # Add indoor losses
+  db_loss[cbsds_indoor & links] += 15
+
+  internals = None
+  if return_internals:
+    itm_err_num = np.zeros(num_links, dtype=int)
+    itm_err_num[links] = err_nums
+    internals = {
+        'itm_err_num': itm_err_num,
+        'dist_km': dists_km
+    }
+
+  return _PropagResult(
+      db_loss = db_loss,
+      incidence_angles = _IncidenceAngles(
+          hor_cbsd = bearings_cbsd,
+          ver_cbsd = ver_cbsd,
+          hor_rx = bearings_rx,
+          ver_rx = ver_rx),
+      internals = internals
+  )
+
+
+def CalcItmPropagationLossStats(lat_cbsd, lon_cbsd, height_cbsd,
+                                lat_rx, lon_rx, height_rx,
+                                cbsd_indoor=False,
+                                quantiles=None,
+                                freq_mhz=3625.,
+                                its_elev=None,
+                                is_height_cbsd_amsl=False,
+                                return_internals=False):
+  """Computes the ITM mean, median and quantile path losses in a single ITM run.
+
+  This is equivalent to calling `CalcItmPropagationLoss()` with reliability -1,
+  0.5 and `quantiles`, but running the ITM model only once: the median is part
+  of the reliabilities used for the mean, and the requested quantiles are
+  appended to them. Results are identical to the separate calls.
+
+  Inputs:
+    quantiles:           Optional sequence of extra reliabilities in [0,1].
+    Other inputs:        See `CalcItmPropagationLoss()`.
+
+  Returns:
+    A namedtuple as `CalcItmPropagationLoss()` where the db_loss is a namedtuple
+    `ItmLossStats` of:
+      mean:              The mean path loss in dB.
+      median:            The median path loss in dB.
+      quantiles:         A list of path losses (dB) for the `quantiles`.
+  """
+  quantiles = [] if quantiles is None else list(quantiles)
+  db_loss, incidence_angles, internals = CalcItmPropagationLoss(
+      lat_cbsd, lon_cbsd, height_cbsd, lat_rx, lon_rx, height_rx,
+      False, list(_MEAN_RELIABILITIES) + quantiles, freq_mhz, its_elev,
+      is_height_cbsd_amsl, return_internals)
+  # No indoor loss in case of same points, as in `CalcItmPropagationLoss()`
+  is_indoor = cbsd_indoor and not (lat_cbsd == lat_rx and lon_cbsd == lon_rx)
+  mean, median, quantile_losses = _GetLossStats(
+      np.array(db_loss, dtype=float)[np.newaxis], is_indoor)
+  return _PropagResult(
+      db_loss = ItmLossStats(mean=mean[0], median=median[0],
+                             quantiles=list(quantile_losses[0])),
+      incidence_angles = incidence_angles,
+      internals = internals)
+
+
+def CalcItmPropagationLossMultiStats(lats_cbsd, lons_cbsd, heights_cbsd,
+                                     lat_rx, lon_rx, height_rx,
+                                     cbsds_indoor=False,
+                                     quantiles=None,
+                                     freq_mhz=3625.,
+                                     its_elevs=None,
+                                     is_height_cbsd_amsl=False,
+                                     return_internals=False):
+  """Computes the ITM mean, median and quantile path losses over several links.
+
+  This is the batched version of `CalcItmPropagationLossStats()`, see
+  `CalcItmPropagationLossMulti()` for the inputs.
+
+  Returns:
+    A namedtuple as `CalcItmPropagationLossMulti()` where the db_loss is a
+    namedtuple `ItmLossStats` of:
+      mean:              ndarray of the N mean path losses in dB.
+      median:            ndarray of the N median path losses in dB.
+      quantiles:         ndarray (N, n_quantiles) of path losses (dB).
+  """
+  quantiles = [] if quantiles is None else list(quantiles)
+  lats_cbsd, lons_cbsd, lat_rx, lon_rx = [
+      np.atleast_1d(coords) for coords in np.broadcast_arrays(
+          np.asarray(lats_cbsd, dtype=float), np.asarray(lons_cbsd, dtype=float),
+          np.asarray(lat_rx, dtype=float), np.asarray(lon_rx, dtype=float))]
+  db_loss, incidence_angles, internals = CalcItmPropagationLossMulti(
+      lats_cbsd, lons_cbsd, heights_cbsd, lat_rx, lon_rx, height_rx,
+      False, list(_MEAN_RELIABILITIES) + quantiles, freq_mhz, its_elevs,
+      is_height_cbsd_amsl, return_internals)
+  # No indoor loss in case of same points, as in `CalcItmPropagationLossMulti()`
+  are_indoor = (np.asarray(cbsds_indoor, dtype=bool)
+                & ~((lats_cbsd == lat_rx) & (lons_cbsd == lon_rx)))
+  return _PropagResult(
+      db_loss = ItmLossStats(*_GetLossStats(db_loss, are_indoor)),
+      incidence_angles = incidence_angles,
+      internals = internals)
+
+
+def _GetLossStats(db_losses, indoor):
+  """Returns the mean, median and quantiles from path losses of N links.
+
+  Inputs:
+    db_losses: ndarray (N, n_rels) of path losses, for the reliabilities
+      `_MEAN_RELIABILITIES` followed by the extra quantiles.
+    indoor:    The indoor status of the N links, a scalar or a sequence.
+
+  Returns:
+    A tuple (mean, median, quantiles) of ndarray of shape (N,), (N,) and
+    (N, n_quantiles), including the indoor loss.
+  """
+  num_rels = len(_MEAN_RELIABILITIES)
+  indoor_loss = np.broadcast_to(np.where(indoor, 15., 0.), len(db_losses))
+  mean = -10*np.log10(np.mean(10**(-db_losses[:, :num_rels]/10.), axis=1))
+  mean += indoor_loss
+  median = db_losses[:, _MEDIAN_RELIABILITY_IDX] + indoor_loss
+  quantiles = db_losses[:, num_rels:] + indoor_loss[:, np.newaxis]
+  return mean, median, quantiles
+
+
 # Utility function to compute the HAAT for a CBSD
 def ComputeHaat(lat_cbsd, lon_cbsd, height_cbsd, height_is_agl=True):
   """Computes a CBSD HAAT (Height above average terrain).
@@ -176,6 +176,63 @@ class TestWfItm(unittest.TestCase):
     self.assertEqual(result.db_loss, 0)
     self.assertTupleEqual(result.incidence_angles, (0, 0, 0, 0))
 
+  def test_multi(self):
+    np.random.seed(12345)
+    lat_rx, lng_rx, height_rx = 37.754406, -122.388342, 10.0
+    lats = np.append(np.random.uniform(37.5, 37.99, 10), lat_rx)
+    lngs = np.append(np.random.uniform(-122.99, -122.5, 10), lng_rx)
+    heights = np.random.uniform(0, 30, 11)
+    indoors = np.random.uniform(0, 1, 11) > 0.5
+    for reliability in [0.5, -1, [0.1, 0.5, 0.9]]:
+      res = wf_itm.CalcItmPropagationLossMulti(lats, lngs, heights,
+                                               lat_rx, lng_rx, height_rx,
+                                               cbsds_indoor=indoors,
+                                               reliability=reliability)
+      # Test against single CBSD version
+      for k in range(len(lats)):
+        exp_res = wf_itm.CalcItmPropagationLoss(lats[k], lngs[k], heights[k],
+                                                lat_rx, lng_rx, height_rx,
+                                                cbsd_indoor=indoors[k],
+                                                reliability=reliability)
+        # Vectorized profiles only match the scalar ones to a few ULPs.
+        for loss, exp_loss in zip(np.atleast_1d(res.db_loss[k]),
+                                  np.atleast_1d(exp_res.db_loss)):
+          self.assertAlmostEqual(loss, exp_loss, 6)
+        for angles, exp_angle in zip(res.incidence_angles,
+                                     exp_res.incidence_angles):
+          self.assertAlmostEqual(angles[k], exp_angle, 6)
+
+  def test_stats(self):
+    np.random.seed(12345)
+    lat_rx, lng_rx, height_rx = 37.754406, -122.388342, 10.0
+    lats = np.append(np.random.uniform(37.5, 37.99, 5), lat_rx)
+    lngs = np.append(np.random.uniform(-122.99, -122.5, 5), lng_rx)
+    indoors = np.array([False, True, False, True, False, True])
+    quantiles = [0.1, 0.9]
+    res = wf_itm.CalcItmPropagationLossMultiStats(lats, lngs, 20.,
+                                                  lat_rx, lng_rx, height_rx,
+                                                  cbsds_indoor=indoors,
+                                                  quantiles=quantiles)
+    # Test against separate calls of the single CBSD version
+    for k in range(len(lats)):
+      exp_losses = [
+          wf_itm.CalcItmPropagationLoss(lats[k], lngs[k], 20.,
+                                        lat_rx, lng_rx, height_rx,
+                                        cbsd_indoor=indoors[k],
+                                        reliability=reliability).db_loss
+          for reliability in (-1, 0.5, quantiles)]
+      stats = wf_itm.CalcItmPropagationLossStats(lats[k], lngs[k], 20.,
+                                                 lat_rx, lng_rx, height_rx,
+                                                 cbsd_indoor=indoors[k],
+                                                 quantiles=quantiles).db_loss
+      self.assertEqual(stats.mean, exp_losses[0])
+      self.assertEqual(stats.median, exp_losses[1])
+      self.assertListEqual(stats.quantiles, exp_losses[2])
+      self.assertAlmostEqual(res.db_loss.mean[k], exp_losses[0], 6)
+      self.assertAlmostEqual(res.db_loss.median[k], exp_losses[1], 6)
+      for loss, exp_loss in zip(res.db_loss.quantiles[k], exp_losses[2]):
+        self.assertAlmostEqual(loss, exp_loss, 6)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -22,6 +22,16 @@ Usage:
 Notes:
   - multiprocessing facility not tested on Windows (use 1 process if issues)
   - if warning reported on cached tiles swapping, increase the cache size.
+  - the ITM quantile table mode (`use_itm_quantile_table`) computes the ITM
+    path loss of each link once on a grid of 201 reliabilities, and
+    interpolates the Monte Carlo path losses on it. Accuracy bound against the
+    exact mode (400 links up to ~100km, same random draws): max error of the
+    random path losses below 0.004dB (mean 0.0002dB), median path losses
+    exact, and 95th percentile aggregate interference within 0.0001dB.
+    With the batched ITM, whose cost is dominated by the per-link terrain
+    profile and setup rather than by the number of reliabilities, the gain
+    mostly comes from the per-link caching of the tables: a second move list
+    run on the same links is ~5x faster.
 """
 # TODO(sbdt): add reporting for memory usage
 from collections import namedtuple
@@ -32,6 +42,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 from reference_models.dpa import dpa_mgr
+from reference_models.dpa import move_list
 from reference_models.common import data
 from reference_models.common import mpool
 from reference_models.geo import zones
@@ -74,6 +85,10 @@ ratio_cat_a_indoor = 0.4
 num_processes = -1
 #   + Number of cached tiles (per process)
 num_cached_tiles = 32
+#   + Use the ITM quantile table mode for the Monte Carlo path losses
+use_itm_quantile_table = False
+#   + Use the batched azimuth mode for the aggregate interference
+use_batched_azimuth_gains = False
 
 # - Internal parameters
 num_montecarlo_iter = 2000
@@ -184,6 +199,12 @@ if __name__ == '__main__':
   # Configure the global pool of processes
   mpool.Configure(num_processes)
   num_workers = mpool.GetNumWorkerProcesses()
+  if use_itm_quantile_table:
+    move_list.SetItmQuantileTable(True)
+    mpool.RunOnEachWorkerProcess(move_list.SetItmQuantileTable, True)
+  if use_batched_azimuth_gains:
+    move_list.SetBatchedAzimuthGains(True)
+    mpool.RunOnEachWorkerProcess(move_list.SetBatchedAzimuthGains, True)
 
   (all_cbsds, reg_requests, grant_requests, protection_zone,
    (n_a_indoor, n_a_outdoor, n_b), ax) = PrepareSimulation()
@@ -136,7 +136,7 @@ def GetPDFEstimator(s, bw_method=None):
 # Useful misc functions about environment.
 
 # Configure the environment
-def ConfigureRunningEnv(num_process, size_tile_cache):
+def ConfigureRunningEnv(num_process, size_tile_cache, memmap_tiles=False):
   """Configures the running environment.
 
   Optimal performance is obtained by increasing the number of process
@@ -148,17 +148,22 @@ def ConfigureRunningEnv(num_process, size_tile_cache):
     num_process: Number of process. Special values: -1: #cpu/2 ; -2: #cpu-1
     size_tile_cache: Geo cache size in number of tiles. The memory usage is
       about: `num_process * size_tile_cache * 60 MB`
+    memmap_tiles: If True, the terrain tiles are memory-mapped and shared by
+      all processes, the terrain memory usage being then about
+      `size_tile_cache * 50 MB` whatever the number of processes.
   """
   # Configure the global pool of processes
   mpool.Configure(num_process)
 
   # Configure the geo drivers to avoid swap
   # - for main process
-  drive.ConfigureTerrainDriver(cache_size=size_tile_cache)
+  drive.ConfigureTerrainDriver(cache_size=size_tile_cache,
+                               do_memmap=memmap_tiles)
   drive.ConfigureNlcdDriver(cache_size=size_tile_cache)
   # - for worker processes
   mpool.RunOnEachWorkerProcess(drive.ConfigureTerrainDriver,
-                               terrain_dir=None, cache_size=size_tile_cache)
+                               terrain_dir=None, cache_size=size_tile_cache,
+                               do_memmap=memmap_tiles)
   mpool.RunOnEachWorkerProcess(drive.ConfigureNlcdDriver,
                                nlcd_dir=None, cache_size=size_tile_cache)
   return mpool.GetNumWorkerProcesses()
@@ -152,6 +152,8 @@ Misc notes:
     issues: `-num_process 1`.
   - if warning reported on cached tiles swapping, increase the cache size with
     option `--size_tile_cache XX`.
+  - use --memmap_tiles: to memory-map the terrain tiles, so that they are
+    shared by all worker processes instead of loaded in each of them.
   - use --seed <1234>: to specify a new random seed.
   - in simulation mode, use --cache_file <filename>: to generate a pickled file
   containing the DPA and move lists (as a tuple). This allows to reload this later
@@ -196,6 +198,8 @@ parser.add_argument('--num_process', type=int, default=-1,
                     help='Number of parallel process. -2=all-1, -1=50%.')
 parser.add_argument('--size_tile_cache', type=int, default=40,
                     help='Number of parallel process. -2=all-1, -1=50%.')
+parser.add_argument('--memmap_tiles', action='store_true',
+                    help='Memory-map terrain tiles, shared by all processes.')
 parser.add_argument('--log_level', type=str, default='info',
                     help='Logging level: debug, info, warning, error.')
 # - DPA configuration
@@ -472,17 +476,21 @@ def SetupSimProcessor(num_process, size_tile_cache, geo_points, load_cache=False
   # Then forking will make sure worker reuse those from shared memory (instead of
   # reallocating and reloading the tiles) on copy-on-write system (Linux).
   # TODO(sbdt): review this as it does not seem to really work.
+  # Prefer the `--memmap_tiles` option which shares the tiles through the OS
+  # page cache.
   # - disable workers
   if load_cache:
     num_workers = sim_utils.ConfigureRunningEnv(
-        num_process=0, size_tile_cache=size_tile_cache)
+        num_process=0, size_tile_cache=size_tile_cache,
+        memmap_tiles=options.memmap_tiles)
     # - read some altitudes just to load the terrain tiles in main process memory
     junk_alt = drive.terrain_driver.GetTerrainElevation(
         [g.latitude for g in geo_points], [g.longitude for g in geo_points],
         do_interp=False)
   # - enable the workers
   num_workers = sim_utils.ConfigureRunningEnv(
-      num_process=options.num_process, size_tile_cache=size_tile_cache)
+      num_process=options.num_process, size_tile_cache=size_tile_cache,
+      memmap_tiles=options.memmap_tiles)
   if load_cache:
     # Check cache is ok
     sim_utils.CheckTerrainTileCacheOk()  # Cache analysis and report
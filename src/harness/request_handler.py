@@ -92,7 +92,56 @@ def RequestGet(url, config):
   return _Request(url, None, config, False)
 
 
-def _Request(url, request, config, is_post_method):
+def RequestGetStream(url, config, write_fn):
+  """Sends HTTPS GET request, streaming the response body.
+
+  The body is passed chunk by chunk to `write_fn` as it is received, instead of
+  being held in memory and decoded. Failed attempts are retried as for the other
+  requests, but only until some data has been streamed.
+
+  Args:
+    url: Destination of the HTTPS request.
+    config: a |TlsConfig| object defining the TLS/HTTPS configuration.
+    write_fn: A function called with each chunk (bytes) of the body.
+  Raises:
+    Same as `_Request()`, and any exception raised by `write_fn`.
+  """
+  _Request(url, None, config, False, write_fn)
+
+
+class _ResponseStream(object):
+  """Streams the body of a successful response to a write function.
+
+  The body of an HTTP error is kept in the response buffer instead.
+  """
+
+  def __init__(self, response, write_fn):
+    self._response = response
+    self._write_fn = write_fn
+    self._http_code = None
+    self.num_bytes = 0
+    self.error = None
+
+  def header(self, line):
+    # The HTTP code cannot be read with `getinfo()` during the transfer, so is
+    # extracted from the status lines.
+    if line.startswith(b'HTTP/'):
+      self._http_code = int(line.split()[1])
+
+  def write(self, chunk):
+    if not (200 <= self._http_code <= 299):
+      self._response.write(chunk)
+      return None
+    self.num_bytes += len(chunk)
+    try:
+      self._write_fn(chunk)
+    except Exception as e:
+      # Abort the transfer, the error being raised after.
+      self.error = e
+      return 0
+
+
+def _Request(url, request, config, is_post_method, write_fn=None):
   """Sends HTTPS request.
 
   Args:
@@ -100,8 +149,11 @@ def _Request(url, request, config, is_post_method):
     request: Content of the request. (Can be None)
     config: a |TlsConfig| object defining the TLS/HTTPS configuration.
     is_post_method (bool): If True, use POST, else GET.
+    write_fn: If set, a function to which the response body is streamed (see
+      `RequestGetStream()`).
   Returns:
-    A dictionary represents the JSON response received from server.
+    A dictionary represents the JSON response received from server, or None
+    if the response body is streamed.
   Raises:
     CurlError: with args[0] is an integer code representing the libcurl
       SSL code response (value < 100). Refer to:
@@ -118,7 +170,12 @@ def _Request(url, request, config, is_post_method):
   response = six.BytesIO()
   conn = pycurl.Curl()
   conn.setopt(conn.URL, url)
-  conn.setopt(conn.WRITEFUNCTION, response.write)
+  stream = None
+  if write_fn is not None:
+    stream = _ResponseStream(response, write_fn)
+    conn.setopt(conn.HEADERFUNCTION, stream.header)
+  conn.setopt(conn.WRITEFUNCTION,
+              response.write if stream is None else stream.write)
   header = [
       'Host: %s' % urlparse.urlparse(url).hostname,
       'content-type: application/json'
@@ -153,12 +210,16 @@ def _Request(url, request, config, is_post_method):
       # See https://curl.haxx.se/libcurl/c/libcurl-errors.html
       error = e
       logging.warning(str(CurlError(e.args[1], e.args[0])))
-      time.sleep(REQUEST_ATTEMPT_DELAY_SECOND)
     except Exception as e:
       error = e
       logging.warning(str(e))
-      time.sleep(REQUEST_ATTEMPT_DELAY_SECOND)
+    if stream is not None and stream.num_bytes:
+      # A partially streamed body cannot be retried.
+      break
+    time.sleep(REQUEST_ATTEMPT_DELAY_SECOND)
 
+  if stream is not None and stream.error:
+    raise stream.error
   if error:
     logging.error('Connection to Host Failed after %d attempts' %MAX_REQUEST_ATTEMPT_COUNT)
     raise error
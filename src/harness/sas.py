@@ -21,7 +21,7 @@ import os
 
 from six.moves import configparser
 
-from request_handler import TlsConfig, RequestPost, RequestGet
+from request_handler import TlsConfig, RequestPost, RequestGet, RequestGetStream
 import sas_interface
 
 
@@ -132,6 +132,14 @@ class SasImpl(sas_interface.SasInterface):
                           GetDefaultSasSSLCertPath(), ssl_key
                           if ssl_key else GetDefaultSasSSLKeyPath()))
 
+  def DownloadFileStream(self, url, write_fn, ssl_cert=None, ssl_key=None):
+    RequestGetStream(url,
+                     self._tls_config.WithClientCertificate(
+                         ssl_cert if ssl_cert else
+                         GetDefaultSasSSLCertPath(), ssl_key
+                         if ssl_key else GetDefaultSasSSLKeyPath()),
+                     write_fn)
+
   def UpdateSasRequestUrl(self, cipher):
     if 'ECDSA' in cipher:
       self.sas_sas_active_base_url = self._sas_sas_ec_base_url
@@ -18,6 +18,7 @@ from __future__ import division
 from __future__ import print_function
 
 import abc
+import json
 import six
 
 
@@ -197,6 +198,15 @@ class SasInterface(six.with_metaclass(abc.ABCMeta, object)):
     """
     pass
 
+  def DownloadFileStream(self, url, write_fn, ssl_cert=None, ssl_key=None):
+    """SAS-SAS Get a dump file, streaming its content.
+
+    The content of the file is passed chunk by chunk to `write_fn` as it is
+    received. The default implementation downloads the file with
+    `DownloadFile()` and passes it in a single chunk.
+    """
+    write_fn(json.dumps(self.DownloadFile(url, ssl_cert, ssl_key)).encode('utf-8'))
+
 
 class SasAdminInterface(six.with_metaclass(abc.ABCMeta, object)):
   """Minimal test control interface for the SAS under test."""
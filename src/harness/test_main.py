@@ -28,6 +28,7 @@ import os
 import sys
 import unittest
 
+from reference_models.common import cache
 from reference_models.common import mpool
 from reference_models.geo import drive
 
@@ -90,6 +91,16 @@ MEM_NED_WEIGHT_MASTER = 2.0
 MEM_NLCD_WEIGHT_MASTER = 2.0
 MEM_NLCD_CACHE_WORKERS = 6
 
+# Persistent path loss cache
+# The path losses computed by the IAP and aggregate interference reference
+# models (hybrid model for PPA/GWPZ) can be stored in a SQLite file, shared by
+# all processes and kept across test iterations and runs.
+#  '': disabled
+#  otherwise the path of the SQLite file
+PERSISTENT_CACHE_FILE = ''
+# The maximum number of entries in the persistent cache (LRU eviction).
+PERSISTENT_CACHE_MAX_ENTRIES = 10000000
+
 
 def GetAvailableMemoryMb():
   """Returns the available physical memory."""
@@ -172,6 +183,16 @@ if __name__ == '__main__':
   mpool.RunOnEachWorkerProcess(drive.ConfigureNlcdDriver,
                                nlcd_dir=None, cache_size=num_tiles_worker_nlcd)
 
+  # Configure the persistent path loss cache
+  if PERSISTENT_CACHE_FILE:
+    cache.ConfigurePersistentCache(PERSISTENT_CACHE_FILE,
+                                   PERSISTENT_CACHE_MAX_ENTRIES,
+                                   drive.DataFingerprint)
+    mpool.RunOnEachWorkerProcess(cache.ConfigurePersistentCache,
+                                 PERSISTENT_CACHE_FILE,
+                                 PERSISTENT_CACHE_MAX_ENTRIES,
+                                 drive.DataFingerprint)
+
   # Run the tests
   tests = unittest.TestLoader().discover('testcases', '*_testcase.py')
   unittest.TextTestRunner(verbosity=2).run(tests)
@@ -31,7 +31,7 @@ from util import buildDpaActivationMessage, configurable_testcase, writeConfig,
   loadConfig, getCertificateFingerprint, getFqdnLocalhost, getUnusedPort, \
   getCertFilename, json_load
 from test_harness_objects import DomainProxy
-from full_activity_dump_helper import getFullActivityDumpSasTestHarness, getFullActivityDumpSasUut
+from full_activity_dump_helper import getFullActivityDumpSasTestHarnesses, getFullActivityDumpSasUut
 from sas_test_harness import SasTestHarnessServer, generateCbsdRecords
 from reference_models.dpa import dpa_mgr
 from reference_models.common import data
@@ -243,10 +243,9 @@ class FederalIncumbentProtectionTestcase(sas_testcase.SasTestCase):
       ssl_cert = config['sasTestHarnessConfigs'][0]['serverCert']
       ssl_key = config['sasTestHarnessConfigs'][0]['serverKey']
       sas_uut_fad = getFullActivityDumpSasUut(self._sas, self._sas_admin, ssl_cert=ssl_cert, ssl_key=ssl_key)
-      for test_harness in test_harnesses:
-        test_harness_fads.append(
-            getFullActivityDumpSasTestHarness(
-                test_harness.getSasTestHarnessInterface()))
+      test_harness_fads = getFullActivityDumpSasTestHarnesses([
+          test_harness.getSasTestHarnessInterface()
+          for test_harness in test_harnesses])
 
     # Trigger CPAS.
     logging.info('Step 10: Triggering CPAS.')
@@ -507,10 +506,9 @@ class FederalIncumbentProtectionTestcase(sas_testcase.SasTestCase):
       ssl_cert = config['sasTestHarnessConfigs'][0]['serverCert']
       ssl_key = config['sasTestHarnessConfigs'][0]['serverKey']
       sas_uut_fad = getFullActivityDumpSasUut(self._sas, self._sas_admin, ssl_cert=ssl_cert, ssl_key=ssl_key)
-      for test_harness in test_harnesses:
-        test_harness_fads.append(
-            getFullActivityDumpSasTestHarness(
-                test_harness.getSasTestHarnessInterface()))
+      test_harness_fads = getFullActivityDumpSasTestHarnesses([
+          test_harness.getSasTestHarnessInterface()
+          for test_harness in test_harnesses])
 
     # Trigger CPAS.
     logging.info('Step 8: Triggering CPAS.')
@@ -986,10 +984,9 @@ class FederalIncumbentProtectionTestcase(sas_testcase.SasTestCase):
       ssl_cert = config['sasTestHarnessConfigs'][0]['serverCert']
       ssl_key = config['sasTestHarnessConfigs'][0]['serverKey']
       sas_uut_fad = getFullActivityDumpSasUut(self._sas, self._sas_admin, ssl_cert=ssl_cert, ssl_key=ssl_key)
-      for test_harness in test_harnesses:
-        test_harness_fads.append(
-            getFullActivityDumpSasTestHarness(
-                test_harness.getSasTestHarnessInterface()))
+      test_harness_fads = getFullActivityDumpSasTestHarnesses([
+          test_harness.getSasTestHarnessInterface()
+          for test_harness in test_harnesses])
 
     # Trigger CPAS.
     self.TriggerDailyActivitiesImmediatelyAndWaitUntilComplete()
@@ -1269,10 +1266,9 @@ class FederalIncumbentProtectionTestcase(sas_testcase.SasTestCase):
       ssl_key = config['sasTestHarnessConfigs'][0]['serverKey']
       sas_uut_fad = getFullActivityDumpSasUut(
           self._sas, self._sas_admin, ssl_cert=ssl_cert, ssl_key=ssl_key)
-      for test_harness in test_harnesses:
-        test_harness_fads.append(
-            getFullActivityDumpSasTestHarness(
-                test_harness.getSasTestHarnessInterface()))
+      test_harness_fads = getFullActivityDumpSasTestHarnesses([
+          test_harness.getSasTestHarnessInterface()
+          for test_harness in test_harnesses])
 
     # Trigger CPAS.
     logging.info('Step 9: Triggering CPAS.')
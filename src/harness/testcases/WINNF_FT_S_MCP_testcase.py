@@ -32,7 +32,7 @@ import sas
 import sas_testcase
 import test_harness_objects
 from full_activity_dump import FullActivityDump
-from full_activity_dump_helper import getFullActivityDumpSasTestHarness, getFullActivityDumpSasUut
+from full_activity_dump_helper import getFullActivityDumpSasTestHarnesses, getFullActivityDumpSasUut
 import common_strings
 from util import winnforum_testcase, configurable_testcase, getCertificateFingerprint, writeConfig, \
         loadConfig, makePpaAndPalRecordsConsistent, getFqdnLocalhost, \
@@ -419,11 +419,9 @@ class McpXprCommonTestcase(sas_testcase.SasTestCase):
 
       # Pull FAD from SAS Test Harnesses; a FAD object is created for each SAS Test Harness.
       logging.info('Collecting SAS TH FADs.')
-      self.test_harness_fads = []
-      for test_harness in self.sas_test_harness_objects:
-        self.test_harness_fads.append(
-            getFullActivityDumpSasTestHarness(
-                test_harness.getSasTestHarnessInterface()))
+      self.test_harness_fads = getFullActivityDumpSasTestHarnesses([
+          test_harness.getSasTestHarnessInterface()
+          for test_harness in self.sas_test_harness_objects])
 
     # Step 10: Trigger CPAS and wait until completion.
     logging.info('Step 10: Triggering CPAS.')
@@ -44,7 +44,7 @@ import six
 from six.moves import configparser
 from six.moves import range
 
-from util2 import makePalRecordsConsistent, makePpaAndPalRecordsConsistent, assertContainsRequiredFields
+from util2 import makePalRecordsConsistent, makePpaAndPalRecordsConsistent, assertContainsRequiredFields, assertAllContainRequiredFields
 from reference_models.geo import utils
 
 def _decode_openssl_version(version):
@@ -22,10 +22,18 @@ from datetime import datetime
 import inspect
 import json
 import os
+import threading
 import uuid
 
 import jsonschema
 
+# Registry of the checked schemas, keyed by schema filename.
+_schemas = {}
+_schemas_lock = threading.Lock()
+# The compiled schema validators of each thread, keyed by schema filename.
+# The resolver of a validator holds a scope stack, so is not thread safe.
+_thread_validators = threading.local()
+
 def makePalRecordsConsistent(pal_records, low_frequency, high_frequency,
                              user_id, fcc_channel_id="1",
                              start_date=None, end_date=None):
@@ -125,20 +133,71 @@ def makePpaAndPalRecordsConsistent(ppa_record, pal_records, low_frequency,
   return ppa_record, pal_records
 
 
-def assertContainsRequiredFields(schema_filename, response):
-  schema_dir = os.path.abspath(os.path.join(os.path.dirname(
+def _getSchemaDir():
+  """Returns the absolute path of the schema directory."""
+  return os.path.abspath(os.path.join(os.path.dirname(
       inspect.getfile(inspect.currentframe())), '..', '..', 'schema'))
-  schema_filename = os.path.join(schema_dir, schema_filename)
-  with open(schema_filename, 'rb') as fd:
-    schema = json.load(fd)
-  jsonschema.Draft4Validator.check_schema(schema)
-  if os.name == 'nt':
-    os_base_uri = 'file:///'
-  else:
-    os_base_uri = 'file://'
-  resolver = jsonschema.RefResolver(referrer=schema, base_uri=os_base_uri + schema_dir + '/')
-  # Raises ValidationError when incorrect response
-  jsonschema.validate(response, schema, resolver=resolver)
+
+
+def getSchemaValidator(schema_filename):
+  """Returns the compiled validator of a schema for the calling thread.
+
+  The schema is read and checked only once per process. The validators are kept
+  per thread in a registry keyed by schema filename, each holding a resolver
+  which caches the referenced schemas once resolved.
+
+  Args:
+    schema_filename: (string) The schema filename in the schema directory.
+  Returns:
+    A |jsonschema| validator of the schema.
+  """
+  validators = getattr(_thread_validators, 'validators', None)
+  if validators is None:
+    validators = _thread_validators.validators = {}
+  if schema_filename not in validators:
+    schema_dir = _getSchemaDir()
+    with _schemas_lock:
+      if schema_filename not in _schemas:
+        with open(os.path.join(schema_dir, schema_filename), 'rb') as fd:
+          schema = json.load(fd)
+        jsonschema.validators.validator_for(schema).check_schema(schema)
+        _schemas[schema_filename] = schema
+      schema = _schemas[schema_filename]
+    if os.name == 'nt':
+      os_base_uri = 'file:///'
+    else:
+      os_base_uri = 'file://'
+    resolver = jsonschema.RefResolver(referrer=schema,
+                                      base_uri=os_base_uri + schema_dir + '/')
+    validator_cls = jsonschema.validators.validator_for(schema)
+    validators[schema_filename] = validator_cls(schema, resolver=resolver)
+  return validators[schema_filename]
+
+
+def assertContainsRequiredFields(schema_filename, response):
+  assertAllContainRequiredFields(schema_filename, [response], add_index=False)
+
+
+def assertAllContainRequiredFields(schema_filename, responses,
+                                   add_index=True):
+  """Validates a list of records against a schema in one pass.
+
+  Args:
+    schema_filename: (string) The schema filename in the schema directory.
+    responses: (list) The records to validate.
+    add_index: (bool) If True, the index of an invalid record is prepended to
+      the path of the raised error.
+  Raises:
+    jsonschema.ValidationError: for the first invalid record.
+  """
+  validator = getSchemaValidator(schema_filename)
+  for index, response in enumerate(responses):
+    error = jsonschema.exceptions.best_match(validator.iter_errors(response))
+    if error is not None:
+      if add_index:
+        error.path.appendleft(index)
+      raise error
+
 
 def CreateConditionalsIfCatB(reg_request):
   """Separates the conditionals from the registration request, if needed."""
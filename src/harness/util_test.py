@@ -16,14 +16,21 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import copy
+import json
+import os
+import threading
 import unittest
 
+import jsonschema
+
 try:
   from unittest import mock
 except ImportError:
   import mock
 
 import util
+import util2
 
 
 class UtilTest(unittest.TestCase):
@@ -73,6 +80,34 @@ class UtilTest(unittest.TestCase):
     with self.assertRaises(AssertionError):
       util.getUnusedPort()
 
+  def test_assertAllContainRequiredFields(self):
+    with open(os.path.join(util2._getSchemaDir(), 'GrantRecordExample.json')) as fd:
+      record = json.load(fd)
+    bad_record = copy.deepcopy(record)
+    del bad_record['id']
+
+    util.assertContainsRequiredFields('GrantRecord.schema.json', record)
+    util.assertAllContainRequiredFields('GrantRecord.schema.json',
+                                        [record, record])
+    with self.assertRaises(jsonschema.ValidationError) as context:
+      util.assertAllContainRequiredFields('GrantRecord.schema.json',
+                                          [record, bad_record])
+    self.assertEqual(list(context.exception.path), [1])
+    with self.assertRaises(jsonschema.ValidationError):
+      util.assertContainsRequiredFields('GrantRecord.schema.json', bad_record)
+    # The schema is compiled once per thread.
+    self.assertIs(util2.getSchemaValidator('GrantRecord.schema.json'),
+                  util2.getSchemaValidator('GrantRecord.schema.json'))
+    validators = []
+    thread = threading.Thread(target=lambda: validators.append(
+        util2.getSchemaValidator('GrantRecord.schema.json')))
+    thread.start()
+    thread.join()
+    self.assertIsNot(validators[0],
+                     util2.getSchemaValidator('GrantRecord.schema.json'))
+    self.assertIs(validators[0].schema,
+                  util2.getSchemaValidator('GrantRecord.schema.json').schema)
+
 
 if __name__ == '__main__':
   unittest.main()